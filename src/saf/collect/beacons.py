@@ -15,6 +15,7 @@ from typing import Any
 from typing import AsyncIterator
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Type
 from typing import TypeVar
 from typing import Union
@@ -38,6 +39,9 @@ class BeaconsConfig(CollectConfigBase):
     """
 
     beacons: List[str]
+    # Include the full event payload, which shares structure with the event data,
+    # in the collected events
+    raw_data: bool = True
 
 
 class BeaconCollectedEvent(CollectedEvent):
@@ -48,7 +52,7 @@ class BeaconCollectedEvent(CollectedEvent):
     beacon: str
     tag: str
     stamp: datetime
-    raw_data: Dict[str, Any]
+    raw_data: Optional[Dict[str, Any]] = None
 
     @staticmethod
     def _convert_stamp(stamp: str) -> datetime:
@@ -83,11 +87,14 @@ async def collect(*, ctx: PipelineRunContext[BeaconsConfig]) -> AsyncIterator[Be
     salt_event: SaltEvent
     tags = {f"salt/beacon/*/{beacon}/*" for beacon in config.beacons}
     log.info("The beacons collect plugin is configured to listen to tags: %s", tags)
-    async for salt_event in eventbus.iter_events(opts=ctx.salt_config.copy(), tags=tags):
+    async for salt_event in eventbus.iter_events(
+        opts=ctx.salt_config.copy(), tags=tags, client=config.parent.eventbus_client
+    ):
+        raw_data: Dict[str, Any] = salt_event.raw_data or {}
         yield BeaconCollectedEvent(
-            beacon=salt_event.raw_data["beacon_name"],
+            beacon=raw_data["beacon_name"],
             tag=salt_event.tag,
             stamp=salt_event.stamp,
             data=salt_event.data,
-            raw_data=salt_event.raw_data,
+            raw_data=raw_data if config.raw_data else None,
         )
@@ -6,21 +6,44 @@ A file collector plugin.
 from __future__ import annotations
 
 import asyncio
+import collections
+import contextlib
+import enum
+import functools
 import glob
+import io
+import itertools
 import logging
+import mmap
 import os
 import pathlib
 import sys
-from typing import AsyncIterator
+import time
+import weakref
+from stat import S_ISREG
+from typing import Any
+from typing import AsyncGenerator
+from typing import Dict
 from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Pattern
 from typing import Type
+from typing import TypeVar
+from typing import cast
 
-import aiofiles
-import aiostream.stream
+from pydantic import Field
+from pydantic import PrivateAttr
+from pydantic import model_validator
 
 from saf.models import CollectConfigBase
 from saf.models import CollectedEvent
 from saf.models import PipelineRunContext
+from saf.utils import inotify
+from saf.utils.aio import wait_event
+from saf.utils.checkpoints import FileKey
+from saf.utils.checkpoints import OffsetCheckpoints
+from saf.utils.checkpoints import get_file_key
 
 if sys.version_info < (3, 12):
     from typing_extensions import TypedDict
@@ -30,6 +53,50 @@ else:
 log = logging.getLogger(__name__)
 
 
+class _Checkpoint(NamedTuple):
+    """
+    Which read of a file the event carrying it comes from.
+    """
+
+    # The ``_FileTailer`` which read the file, see ``_TAILERS``
+    tailer: int
+    path: pathlib.Path
+    key: FileKey
+    # The ``_TailedFile.generation`` the file was read in
+    generation: int
+    # The read, see ``_TailedFile.reads``
+    read: int
+
+
+# The running file tailers, by their ``id``, for the forwarded events to find them, even
+# when they went through another process
+_TAILERS: weakref.WeakValueDictionary[int, _FileTailer] = weakref.WeakValueDictionary()
+_TAILER_IDS = itertools.count()
+
+CCE = TypeVar("CCE", bound="_CheckpointedEvent")
+
+
+class _CheckpointedEvent(CollectedEvent):
+    """
+    Collected event which may carry how far its file was read.
+
+    The file offsets are only checkpointed once the pipeline is done with all of the events
+    read up to them, so that what was still on its way through it is read again when resuming.
+    """
+
+    _checkpoint: Optional[_Checkpoint] = PrivateAttr(None)
+
+    def forwarded(self: CCE) -> None:
+        """
+        Acknowledge the event to the file tailer which read it, if checkpointing.
+        """
+        if self._checkpoint is None:
+            return
+        tailer = _TAILERS.get(self._checkpoint.tailer)
+        if tailer is not None:
+            tailer.acknowledge(self._checkpoint)
+
+
 class CollectedLineData(TypedDict):
     """
     Collected event line data definition.
@@ -39,7 +106,7 @@ class CollectedLineData(TypedDict):
     source: pathlib.Path
 
 
-class CollectedLineEvent(CollectedEvent):
+class CollectedLineEvent(_CheckpointedEvent):
     """
     Collected line event definition.
     """
@@ -48,6 +115,53 @@ class CollectedLineEvent(CollectedEvent):
     backfill: bool = False
 
 
+class CollectedLinesData(TypedDict):
+    """
+    Collected event lines data definition.
+    """
+
+    lines: List[str]
+    source: pathlib.Path
+
+
+CLE = TypeVar("CLE", bound="CollectedLinesEvent")
+
+
+class CollectedLinesEvent(_CheckpointedEvent):
+    """
+    Collected event with several lines, see the ``lines_per_event`` configuration.
+    """
+
+    data: CollectedLinesData
+    backfill: bool = False
+
+    def expand(self: CLE) -> List[CollectedLineEvent]:
+        """
+        Return an event per line, as if the lines were not batched together.
+        """
+        source = self.data["source"]
+        return [
+            CollectedLineEvent.model_construct(
+                data=CollectedLineData(line=line, source=source),
+                timestamp=self.timestamp,
+                backfill=self.backfill,
+            )
+            for line in self.data["lines"]
+        ]
+
+
+class FileWatchMode(enum.Enum):
+    """
+    How the file collect plugin notices that a file has new lines.
+    """
+
+    # Wait for the kernel to report the file changes. Only available on Linux, falls
+    # back to ``poll`` elsewhere.
+    INOTIFY = "inotify"
+    # Check the file every ``poll_interval`` seconds
+    POLL = "poll"
+
+
 class FileCollectConfig(CollectConfigBase):
     """
     Configuration schema for the file collect plugin.
@@ -56,6 +170,55 @@ class FileCollectConfig(CollectConfigBase):
     paths: List[pathlib.Path]
     # If true, starts at the beginning of a file, else at the end
     backfill: bool = False
+    watch: FileWatchMode = FileWatchMode.INOTIFY
+    # How long, in seconds, to wait before checking a file again, when polling
+    poll_interval: float = Field(0.5, gt=0)
+    # How many bytes to read from a file at once
+    read_size: int = Field(65536, gt=0)
+    # How many lines to put in each event. More than one line generates ``CollectedLinesEvent``
+    # events, which the ``expand_lines`` process plugin expands back to an event per line.
+    # If ``null``, all lines read at once, at most ``read_size`` bytes, go in a single event.
+    lines_per_event: Optional[int] = Field(1, gt=0)
+    # Where to persist how far each file was read, to resume reading the files from there
+    # when restarting, instead of from the start, or the end. Nothing is persisted if not set.
+    # Only the lines forwarded by the pipeline count as read, the lines still on their way
+    # through it when stopping are read again.
+    checkpoints: Optional[pathlib.Path] = None
+    # Persist how far each file was read every ``checkpoint_lines`` forwarded lines, or
+    # ``checkpoint_interval`` seconds, whichever comes first
+    checkpoint_lines: int = Field(1000, gt=0)
+    checkpoint_interval: float = Field(5, gt=0)
+    # How often, in seconds, to look for new files matching ``paths``. Only on start if ``null``.
+    rescan_interval: Optional[float] = Field(10, gt=0)
+    # How many files to keep open at most. When reached, the least recently read file is closed,
+    # and opened again once it changes.
+    max_open_files: int = Field(256, gt=0)
+    # Backfill the files by mapping them in memory, instead of reading them, which is only
+    # slightly faster, when putting more than one line in each event. The files are checked for
+    # truncation before each access, however, a file truncated in place at the same time, for
+    # example by ``copytruncate`` log rotation, kills the whole process with ``SIGBUS``. Only
+    # enable it if the backfilled files are never truncated.
+    mmap_backfill: bool = False
+    # Join the lines of multi-line records, like tracebacks, into a single collected line.
+    # With ``multiline_start``, the lines matching it start a new record, and the other lines
+    # are part of the previous record. With ``multiline_continuation``, the lines matching it
+    # are part of the previous record, and the other lines start a new record.
+    multiline_start: Optional[Pattern[str]] = None
+    multiline_continuation: Optional[Pattern[str]] = None
+    # How long, in seconds, to wait for more lines of a record before collecting it as is
+    multiline_timeout: float = Field(1, gt=0)
+    # How many lines to join into a record at most, the next line starts a new record
+    multiline_max_lines: int = Field(500, gt=0)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _check_mutually_exclusive_parameters(
+        cls: Type[FileCollectConfig], values: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        if values.get("multiline_start") and values.get("multiline_continuation"):
+            msg = "The 'multiline_start' and 'multiline_continuation' are mutually exclusive"
+            raise ValueError(msg)
+        return values
 
 
 def get_config_schema() -> Type[FileCollectConfig]:
@@ -65,54 +228,824 @@ def get_config_schema() -> Type[FileCollectConfig]:
     return FileCollectConfig
 
 
-async def _process_file(
-    *, path: pathlib.Path, backfill: bool = False
-) -> AsyncIterator[CollectedLineEvent]:
+def _get_inotify(config: FileCollectConfig) -> inotify.Inotify | None:
+    if config.watch is not FileWatchMode.INOTIFY:
+        return None
+    if not inotify.HAS_INOTIFY:
+        log.info("inotify is not available, polling the files for changes")
+        return None
+    try:
+        return inotify.Inotify()
+    except OSError as exc:
+        # For example, too many inotify instances
+        log.warning("Failed to use inotify, polling the files for changes: %s", exc)
+        return None
+
+
+def _split_lines(data: bytes) -> tuple[list[str], bytes]:
+    """
+    Split the complete lines out of what was read, returning them and the incomplete last line.
+    """
+    end = data.rfind(b"\n") + 1
+    if not end:
+        return [], data
+    text = str(memoryview(data)[:end], "utf-8", "replace")
+    # Universal newlines, the same lines reading the file in text mode returns
+    return io.StringIO(text, newline=None).readlines(), data[end:]
+
+
+def _line_offsets(data: bytes | memoryview, start: int) -> list[int]:
+    """
+    Return the offsets of the lines in ``data``, read from ``start``.
+
+    The lines are split at the same universal newlines ``_split_lines`` splits them at.
+    """
+    offsets = []
+    for line in bytes(data).splitlines(keepends=True):
+        offsets.append(start)
+        start += len(line)
+    return offsets
+
+
+def _make_events(
+    lines: list[str],
+    *,
+    path: pathlib.Path,
+    backfill: bool,
+    lines_per_event: int | None,
+) -> list[CollectedLineEvent | CollectedLinesEvent]:
+    """
+    Return the events for the given lines, which are trusted, the events are not validated.
+    """
+    if lines_per_event == 1:
+        return [
+            CollectedLineEvent.model_construct(
+                data=CollectedLineData(line=line, source=path), backfill=backfill
+            )
+            for line in lines
+        ]
+    step = lines_per_event or len(lines)
+    return [
+        CollectedLinesEvent.model_construct(
+            data=CollectedLinesData(lines=lines[idx : idx + step], source=path), backfill=backfill
+        )
+        for idx in range(0, len(lines), step)
+    ]
+
+
+MA = TypeVar("MA", bound="_MultilineAssembler")
+
+
+class _MultilineAssembler:
+    """
+    Join the lines of a file's multi-line records, see the ``multiline_*`` configuration.
+    """
+
+    __slots__ = ("start", "continuation", "max_lines", "lines", "offset", "updated")
+
+    def __init__(self: MA, config: FileCollectConfig) -> None:
+        self.start = config.multiline_start
+        self.continuation = config.multiline_continuation
+        self.max_lines = config.multiline_max_lines
+        # The lines of the incomplete record
+        self.lines: list[str] = []
+        # The offset of the start of the incomplete record
+        self.offset = 0
+        # When the last line was added to the incomplete record
+        self.updated = 0.0
+
+    def _starts_record(self: MA, line: str) -> bool:
+        if self.start is not None:
+            return self.start.search(line) is not None
+        return self.continuation is None or self.continuation.search(line) is None
+
+    def feed(self: MA, lines: list[str], offsets: list[int]) -> list[str]:
+        """
+        Add the lines, read from the given ``offsets``, and return the records they complete.
+        """
+        records = []
+        for line, offset in zip(lines, offsets):
+            if self.lines and (self._starts_record(line) or len(self.lines) >= self.max_lines):
+                records.append("".join(self.lines))
+                self.lines = []
+            if not self.lines:
+                self.offset = offset
+            self.lines.append(line)
+        self.updated = time.monotonic()
+        return records
+
+    def flush(self: MA) -> list[str]:
+        """
+        Return the incomplete record, if any, as is.
+        """
+        if not self.lines:
+            return []
+        record = "".join(self.lines)
+        self.lines = []
+        return [record]
+
+
+# How many bytes to backfill at once, when backfilling a file mapped in memory
+MMAP_READ_SIZE = 1024 * 1024
+
+PR = TypeVar("PR", bound="_PendingRead")
+TF = TypeVar("TF", bound="_TailedFile")
+FT = TypeVar("FT", bound="_FileTailer")
+
+
+class _PendingRead:
     """
-    Process the given file and `yield` an even per read line.
+    A read of a file whose events the pipeline is not done with yet.
     """
-    async with aiofiles.open(path) as rfh:
-        if backfill:
-            async for line in rfh:
-                yield CollectedLineEvent(
-                    data=CollectedLineData(line=line, source=path), backfill=True
+
+    __slots__ = ("offset", "lines", "events")
+
+    def __init__(self: PR, offset: int, lines: int, events: int) -> None:
+        # How far the file is read once the read is done with
+        self.offset = offset
+        self.lines = lines
+        # The events not acknowledged yet
+        self.events = events
+
+
+class _TailedFile:
+    """
+    A file being tailed, and how far it was read.
+    """
+
+    __slots__ = (
+        "path",
+        "rfh",
+        "mapped",
+        "watch",
+        "key",
+        "position",
+        "pending",
+        "backfill",
+        "rotated",
+        "created",
+        "draining",
+        "assembler",
+        "generation",
+        "reads",
+    )
+
+    def __init__(
+        self: TF, path: pathlib.Path, assembler: _MultilineAssembler | None = None
+    ) -> None:
+        self.path = path
+        # ``None`` while the file is closed
+        self.rfh: io.FileIO | None = None
+        # The file mapped in memory while backfilling it
+        self.mapped: mmap.mmap | None = None
+        self.watch: inotify.InotifyWatch | None = None
+        # The device and inode of the file being read, ``None`` until it's first opened
+        self.key: FileKey | None = None
+        self.position = 0
+        self.pending = b""
+        self.backfill = False
+        self.rotated = False
+        # Found after the tailing started, so all of it was written since
+        self.created = False
+        # Reading the rest of a rotated file
+        self.draining = False
+        self.assembler = assembler
+        # Changes whenever the file is started, or truncated, so that the offsets read before
+        # are no longer checkpointed
+        self.generation = 0
+        # The reads not done with yet, in order, keyed by their number
+        self.reads: Dict[int, _PendingRead] = {}
+
+
+class _FileTailer:
+    """
+    Read the lines of many files as they're written, from a single task.
+
+    The files are read when inotify reports that they changed or, when polling, every
+    ``poll_interval`` seconds. Reads are at most ``read_size`` bytes, taking turns with the other
+    changed files, and are done from the event loop, instead of tying up a thread of the default
+    executor per file. Only the backfills, mostly reading from the disk, and the rescans of the
+    configured paths, run on the default executor, one at a time.
+
+    At most ``max_open_files`` files are kept open. The least recently read ones are closed, and
+    opened again once they change.
+
+    When a file is rotated, by renaming it, the rest of it is read, and the new file at
+    its path is read from the start. When a file is truncated, it's read from the start. A rotated
+    file the configured paths still match is only read again past where it was left, and the
+    files no longer matched are no longer tailed.
+    """
+
+    def __init__(
+        self: FT,
+        config: FileCollectConfig,
+        watcher: inotify.Inotify | None = None,
+        checkpoints: OffsetCheckpoints | None = None,
+    ) -> None:
+        self.config = config
+        self.watcher = watcher
+        self.checkpoints = checkpoints
+        self.id = next(_TAILER_IDS)
+        _TAILERS[self.id] = self
+        self._read_ids = itertools.count()
+        self.files: Dict[pathlib.Path, _TailedFile] = {}
+        # The files being read, or drained, by their device and inode
+        self.keys: Dict[FileKey, _TailedFile] = {}
+        # How far the rotated files, no longer read, were read, by their device and inode. In
+        # case a rescan matches them at their new path
+        self.finished: Dict[FileKey, int] = {}
+        # The open files, the least recently read first
+        self.open_files: collections.OrderedDict[
+            pathlib.Path, _TailedFile
+        ] = collections.OrderedDict()
+        # The files to read, in order, used as an ordered set
+        self.ready: Dict[pathlib.Path, _TailedFile] = {}
+        # The files which inotify can't report changes for
+        self.polled: Dict[pathlib.Path, _TailedFile] = {}
+        # The files with an incomplete multi-line record
+        self.assembling: Dict[pathlib.Path, _TailedFile] = {}
+        self.multiline = (
+            config.multiline_start is not None or config.multiline_continuation is not None
+        )
+        self._ready_event = asyncio.Event()
+
+    def add(self: FT, path: pathlib.Path, *, created: bool = False) -> None:
+        """
+        Start tailing ``path``, unless already tailed.
+
+        A ``created`` file, found after the tailing started, is read from the start.
+        """
+        if path in self.files:
+            return
+        assembler = _MultilineAssembler(self.config) if self.multiline else None
+        tailed = self.files[path] = _TailedFile(path, assembler)
+        tailed.created = created
+        self._mark_ready(tailed)
+
+    def rescan(
+        self: FT, matched: Dict[pathlib.Path, FileKey], *, created: bool = False
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Tail the newly ``matched`` files, and stop tailing the ones no longer matched.
+
+        Return the events for what was left of the files no longer tailed.
+        """
+        events = []
+        for tailed in list(self.files.values()):
+            # The rest of a rotated file is read before letting go of it
+            if tailed.path not in matched and not tailed.draining:
+                events.extend(self._remove(tailed))
+        keys = set(matched.values())
+        for key in list(self.finished):
+            if key not in keys:
+                # Deleted, its inode might be reused
+                del self.finished[key]
+        for path, key in matched.items():
+            tailing = self.keys.get(key)
+            if tailing is not None and tailing.path != path:
+                # Rotated to this path, and still read from its previous one
+                continue
+            self.add(path, created=created)
+        return events
+
+    def _remove(self: FT, tailed: _TailedFile) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Stop tailing the file, no longer found at its path.
+        """
+        log.debug("The file %s is gone, no longer tailing it", tailed.path)
+        events = self._finish_rotation(tailed)
+        del self.files[tailed.path]
+        self.ready.pop(tailed.path, None)
+        self._set_polled(tailed, polled=False)
+        return events
+
+    def close(self: FT) -> None:
+        """
+        Close all the files, and stop watching them.
+        """
+        for tailed in self.files.values():
+            self._close_file(tailed)
+            if tailed.watch is not None:
+                tailed.watch.close()
+                tailed.watch = None
+
+    def _mark_ready(self: FT, tailed: _TailedFile) -> None:
+        self.ready[tailed.path] = tailed
+        self._ready_event.set()
+
+    def _set_polled(self: FT, tailed: _TailedFile, *, polled: bool) -> None:
+        if polled:
+            self.polled[tailed.path] = tailed
+        else:
+            self.polled.pop(tailed.path, None)
+
+    def _wait_for_changes(self: FT, tailed: _TailedFile) -> None:
+        """
+        Poll the file, unless inotify reports its changes.
+        """
+        self._set_polled(tailed, polled=tailed.watch is None or not tailed.watch.active)
+
+    def _close_file(self: FT, tailed: _TailedFile) -> None:
+        self._unmap(tailed)
+        if tailed.rfh is not None:
+            tailed.rfh.close()
+            tailed.rfh = None
+        self.open_files.pop(tailed.path, None)
+
+    def _start(self: FT, tailed: _TailedFile, stat: os.stat_result) -> None:
+        """
+        Decide where to start reading the just opened file.
+        """
+        tailed.key = get_file_key(stat)
+        self.keys[tailed.key] = tailed
+        tailed.pending = b""
+        tailed.generation += 1
+        tailed.reads.clear()
+        if self.watcher is not None:
+            if tailed.watch is not None:
+                tailed.watch.close()
+            tailed.watch = None
+            try:
+                # Start watching before reading, so that no change goes unnoticed
+                tailed.watch = self.watcher.add_watch(
+                    tailed.path, callback=functools.partial(self._mark_ready, tailed)
                 )
+            except OSError as exc:
+                # For example, too many inotify watches
+                log.warning("Failed to watch %s, polling it for changes: %s", tailed.path, exc)
+        position = self.finished.pop(tailed.key, None)
+        if position is not None and position <= stat.st_size:
+            # A rotated file, matched at its new path, the rest of it is read
+            tailed.backfill = False
+            tailed.position = position
+            return
+        position = self.checkpoints.get(stat) if self.checkpoints is not None else None
+        if position is not None and position <= stat.st_size:
+            # Catching up with what was written while not running is also a backfill
+            tailed.backfill = position < stat.st_size
+            tailed.position = position
+            return
+        # A rotated, or created, file is new, all of it is read
+        new = tailed.rotated or tailed.created
+        tailed.backfill = self.config.backfill and not new
+        tailed.position = 0 if tailed.backfill or new else stat.st_size
+
+    def _open(self: FT, tailed: _TailedFile) -> bool:
+        """
+        Open the file, unless it didn't change since it was closed. Return ``True`` if opened.
+        """
+        if tailed.key is not None:
+            # Closed to not have too many files open, don't open it again to find nothing new
+            try:
+                stat = tailed.path.stat()
+            except FileNotFoundError:
+                self._set_polled(tailed, polled=True)
+                return False
+            if get_file_key(stat) == tailed.key and stat.st_size == tailed.position:
+                self._wait_for_changes(tailed)
+                return False
+        try:
+            rfh = tailed.path.open("rb", buffering=0)
+        except OSError as exc:
+            if not isinstance(exc, FileNotFoundError):
+                log.warning("Failed to open %s: %s", tailed.path, exc)
+            # Rotated, and not created yet, or can't be opened yet
+            self._set_polled(tailed, polled=True)
+            return False
+        while len(self.open_files) >= self.config.max_open_files:
+            _, least_recent = self.open_files.popitem(last=False)
+            log.debug("Too many open files, closing %s until it changes", least_recent.path)
+            self._close_file(least_recent)
+        stat = os.fstat(rfh.fileno())
+        if tailed.key is None:
+            self._start(tailed, stat)
+        elif get_file_key(stat) != tailed.key:
+            log.warning("The file %s was rotated while closed, reading the new file", tailed.path)
+            self._forget_file(tailed)
+            tailed.rotated = True
+            self._start(tailed, stat)
+        elif stat.st_size < tailed.position:
+            log.info("The file %s was truncated, reading it from the start", tailed.path)
+            self._truncated(tailed)
+        rfh.seek(tailed.position)
+        tailed.rfh = rfh
+        self.open_files[tailed.path] = tailed
+        if self.config.mmap_backfill and tailed.backfill and not tailed.pending:
+            self._map(tailed, rfh, stat.st_size)
+        return True
+
+    def _map(self: FT, tailed: _TailedFile, rfh: io.FileIO, size: int) -> None:
+        """
+        Map the file in memory, up to ``size`` bytes, to backfill it.
+        """
+        if tailed.position >= size:
+            return
+        try:
+            tailed.mapped = mmap.mmap(rfh.fileno(), size, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as exc:
+            log.debug("Failed to map %s in memory, reading it instead: %s", tailed.path, exc)
+
+    def _unmap(self: FT, tailed: _TailedFile) -> None:
+        if tailed.mapped is not None:
+            tailed.mapped.close()
+            tailed.mapped = None
+
+    def _truncated(self: FT, tailed: _TailedFile) -> None:
+        """
+        Read the truncated file from the start.
+        """
+        tailed.position = 0
+        tailed.pending = b""
+        tailed.generation += 1
+        tailed.reads.clear()
+        if self.checkpoints is not None and tailed.key is not None:
+            self.checkpoints.update(tailed.key, tailed.path, 0, 0)
+
+    def acknowledge(self: FT, checkpoint: _Checkpoint) -> None:
+        """
+        Acknowledge one of the events of a read.
+
+        Once all of the events of the read, and of the reads before it, are acknowledged,
+        checkpoint how far the file was read. Unless the file was rotated, or truncated, since.
+        """
+        if self.checkpoints is None:
+            return
+        tailed = self.files.get(checkpoint.path)
+        if tailed is None or tailed.key != checkpoint.key:
+            return
+        if tailed.generation != checkpoint.generation:
+            return
+        pending = tailed.reads.get(checkpoint.read)
+        if pending is None:
+            return
+        pending.events -= 1
+        offset = None
+        lines = 0
+        # The events are not necessarily acknowledged in the order they were read
+        for read, pending in list(tailed.reads.items()):
+            if pending.events > 0:
+                break
+            del tailed.reads[read]
+            offset = pending.offset
+            lines += pending.lines
+        if offset is not None:
+            self.checkpoints.advance(checkpoint.key, checkpoint.path, offset, lines)
+
+    def _carry_checkpoint(
+        self: FT,
+        tailed: _TailedFile,
+        events: list[CollectedLineEvent | CollectedLinesEvent],
+        offset: int,
+        lines: int,
+    ) -> None:
+        """
+        Checkpoint ``offset`` once all of the events are acknowledged.
+        """
+        if self.checkpoints is None or tailed.key is None or not events:
+            return
+        read = next(self._read_ids)
+        tailed.reads[read] = _PendingRead(offset, lines, len(events))
+        checkpoint = _Checkpoint(self.id, tailed.path, tailed.key, tailed.generation, read)
+        for event in events:
+            event._checkpoint = checkpoint  # noqa: SLF001
+
+    def _process_lines(
+        self: FT, tailed: _TailedFile, chunk: bytes
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        start = tailed.position - len(tailed.pending)
+        tailed.position += len(chunk)
+        data = tailed.pending + chunk if tailed.pending else chunk
+        lines, tailed.pending = _split_lines(data)
+        return self._line_events(tailed, lines, data, start)
+
+    def _line_events(
+        self: FT, tailed: _TailedFile, lines: list[str], data: bytes | memoryview, start: int
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Return the events for the lines, decoded from ``data``, read from ``start``.
+        """
+        if not lines:
+            return []
+        # Up to the last line, the incomplete line is read again when resuming
+        offset = tailed.position - len(tailed.pending)
+        if tailed.assembler is not None:
+            lines = tailed.assembler.feed(lines, _line_offsets(data, start))
+            if tailed.assembler.lines:
+                self.assembling[tailed.path] = tailed
+                # And so is the incomplete record
+                offset = tailed.assembler.offset
+            else:
+                self.assembling.pop(tailed.path, None)
+        if not lines:
+            return []
+        events = self._to_events(tailed, lines)
+        self._carry_checkpoint(tailed, events, offset, len(lines))
+        return events
+
+    def _to_events(
+        self: FT, tailed: _TailedFile, lines: list[str]
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        return _make_events(
+            lines,
+            path=tailed.path,
+            backfill=tailed.backfill,
+            lines_per_event=self.config.lines_per_event,
+        )
+
+    def _flush_record(
+        self: FT, tailed: _TailedFile
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Return the event for the incomplete multi-line record, if any.
+        """
+        if tailed.assembler is None or self.assembling.pop(tailed.path, None) is None:
+            return []
+        records = tailed.assembler.flush()
+        events = self._to_events(tailed, records)
+        self._carry_checkpoint(tailed, events, tailed.position - len(tailed.pending), len(records))
+        return events
+
+    def _check_file(self: FT, tailed: _TailedFile, fd: int) -> str | None:
+        """
+        Return ``rotated``, ``truncated`` or ``missing``, if the file is any of those.
+        """
+        try:
+            current = tailed.path.stat()
+        except FileNotFoundError:
+            return "missing"
+        if get_file_key(current) != tailed.key:
+            return "rotated"
+        if os.fstat(fd).st_size < tailed.position:
+            return "truncated"
+        return None
+
+    def _finish_rotation(
+        self: FT, tailed: _TailedFile
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Stop reading the rotated file, and get ready to read the new one.
+        """
+        events = []
+        if tailed.pending:
+            # The rotated file won't get the rest of its last line
+            events = self._process_lines(tailed, b"\n")
+        events.extend(self._flush_record(tailed))
+        self._forget_file(tailed)
+        self._close_file(tailed)
+        if tailed.watch is not None:
+            tailed.watch.close()
+            tailed.watch = None
+        tailed.rotated = True
+        tailed.draining = False
+        return events
+
+    def _forget_file(self: FT, tailed: _TailedFile) -> None:
+        """
+        Stop reading the file which was at the tailed path, but remember how far it was read.
+        """
+        if tailed.key is None:
+            return
+        if self.checkpoints is not None:
+            self.checkpoints.remove(tailed.key)
+        if self.keys.get(tailed.key) is tailed:
+            del self.keys[tailed.key]
+        self.finished[tailed.key] = tailed.position
+        tailed.key = None
+
+    def _read(
+        self: FT, tailed: _TailedFile, chunk: bytes | None = None
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Read, at most ``read_size`` bytes, from the file and return the events for its lines.
+
+        Unless ``chunk``, already read from the file, is passed.
+        """
+        if tailed.rfh is None and not self._open(tailed):
+            return []
+        rfh = cast(io.FileIO, tailed.rfh)
+        self.open_files.move_to_end(tailed.path)
+        if tailed.mapped is not None:
+            return self._read_mapped(tailed, tailed.mapped, rfh)
+        if chunk is None:
+            chunk = rfh.read(self.config.read_size)
+        if chunk:
+            # There might be more to read, once the other files had their turn
+            self._mark_ready(tailed)
+            return self._process_lines(tailed, chunk)
+        # Once at the end of the file, it's no longer a backfill
+        tailed.backfill = False
+        if tailed.draining:
+            self._mark_ready(tailed)
+            return self._finish_rotation(tailed)
+        state = self._check_file(tailed, rfh.fileno())
+        if state == "rotated":
+            log.info("The file %s was rotated, reading the rest of it", tailed.path)
+            # Something might have been written between the last read and the rotation
+            tailed.draining = True
+            self._mark_ready(tailed)
+        elif state == "truncated":
+            log.info("The file %s was truncated, reading it from the start", tailed.path)
+            events = self._flush_record(tailed)
+            rfh.seek(0)
+            self._truncated(tailed)
+            self._mark_ready(tailed)
+            return events
+        elif state == "missing":
+            # Poll until the rotated file is created
+            self._set_polled(tailed, polled=True)
         else:
-            await rfh.seek(0, os.SEEK_END)
+            self._wait_for_changes(tailed)
+        return []
+
+    async def _read_next(
+        self: FT, tailed: _TailedFile
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Like ``_read``, but backfills read the file on the default executor.
+
+        Backfills read whole ``read_size`` chunks of what is likely not in the page cache, which
+        would block the event loop until read from the disk.
+        """
+        if tailed.rfh is None and not self._open(tailed):
+            return []
+        if not tailed.backfill or tailed.mapped is not None:
+            return self._read(tailed)
+        loop = asyncio.get_running_loop()
+        chunk = await loop.run_in_executor(
+            None, cast(io.FileIO, tailed.rfh).read, self.config.read_size
+        )
+        return self._read(tailed, chunk)
+
+    def _read_mapped(
+        self: FT, tailed: _TailedFile, mapped: mmap.mmap, rfh: io.FileIO
+    ) -> list[CollectedLineEvent | CollectedLinesEvent]:
+        """
+        Backfill the lines in, about, the next ``MMAP_READ_SIZE`` bytes of the mapped file.
+
+        Once there are no complete lines left, the file is unmapped, and read from the offset
+        where the backfill stopped.
+        """
+        start = tailed.position
+        end = 0
+        # Accessing the mapped pages past the end of a truncated file would crash the process
+        if os.fstat(rfh.fileno()).st_size >= len(mapped):
+            end = mapped.rfind(b"\n", start, start + MMAP_READ_SIZE) + 1
+            if not end:
+                # A line longer than ``MMAP_READ_SIZE``
+                end = mapped.find(b"\n", start + MMAP_READ_SIZE) + 1
+        self._mark_ready(tailed)
+        if not end:
+            self._unmap(tailed)
+            rfh.seek(start)
+            return []
+        tailed.position = end
+        with memoryview(mapped)[start:end] as view:
+            text = str(view, "utf-8", "replace")
+            # Universal newlines, the same lines reading the file in text mode returns
+            lines = io.StringIO(text, newline=None).readlines()
+            return self._line_events(tailed, lines, view, start)
+
+    def _flush_records(
+        self: FT, now: float
+    ) -> tuple[list[CollectedLineEvent | CollectedLinesEvent], float | None]:
+        """
+        Return the events for the records which waited ``multiline_timeout`` seconds for more lines.
+
+        Also return when the next incomplete record times out, if any.
+        """
+        events: list[CollectedLineEvent | CollectedLinesEvent] = []
+        next_flush: float | None = None
+        for tailed in list(self.assembling.values()):
+            flush_at = cast(_MultilineAssembler, tailed.assembler).updated
+            flush_at += self.config.multiline_timeout
+            if flush_at <= now:
+                events.extend(self._flush_record(tailed))
+            elif next_flush is None or flush_at < next_flush:
+                next_flush = flush_at
+        return events, next_flush
+
+    async def events(self: FT) -> AsyncGenerator[CollectedLineEvent | CollectedLinesEvent, None]:
+        """
+        Generate the events for the lines read from the files, forever.
+
+        The configured paths are matched every ``rescan_interval`` seconds, to pick up new files.
+        """
+        loop = asyncio.get_running_loop()
+        level = logging.ERROR
+        created = False
+        next_rescan: float | None = 0.0
+        next_poll = 0.0
+        next_flush: float | None = None
         while True:
-            line = await rfh.readline()
-            if not line:
-                await asyncio.sleep(0.5)
+            now = time.monotonic()
+            if next_rescan is not None and now >= next_rescan:
+                # Matching recursive globs walks the directories, off the event loop
+                matched = await loop.run_in_executor(None, _match_paths, self.config.paths, level)
+                events = self.rescan(matched, created=created)
+                # Don't repeat the errors on every rescan, and read the files found by the next
+                # ones from the start
+                level = logging.DEBUG
+                created = True
+                next_rescan = None
+                if self.config.rescan_interval is not None:
+                    next_rescan = now + self.config.rescan_interval
+                if events:
+                    for event in events:
+                        yield event
+                    continue
+            if now >= next_poll:
+                for tailed in self.polled.values():
+                    self._mark_ready(tailed)
+                next_poll = now + self.config.poll_interval
+            if self.assembling and (next_flush is None or now >= next_flush):
+                events, next_flush = self._flush_records(now)
+                if events:
+                    for event in events:
+                        yield event
+                    continue
+            if not self.ready:
+                deadlines = [next_poll] if self.polled else []
+                if next_rescan is not None:
+                    deadlines.append(next_rescan)
+                if self.assembling and next_flush is not None:
+                    deadlines.append(next_flush)
+                timeout = max(0.0, min(deadlines) - now) if deadlines else None
+                await wait_event(self._ready_event, timeout)
+                self._ready_event.clear()
                 continue
-            yield CollectedLineEvent(data=CollectedLineData(line=line, source=path))
+            path = next(iter(self.ready))
+            events = await self._read_next(self.ready.pop(path))
+            if events:
+                for event in events:
+                    yield event
+                # Let the other tasks run, most reads never wait
+                await asyncio.sleep(0)
 
 
-async def collect(
-    *, ctx: PipelineRunContext[FileCollectConfig]
-) -> AsyncIterator[CollectedLineEvent]:
+def _match_paths(
+    entries: List[pathlib.Path], level: int = logging.ERROR
+) -> Dict[pathlib.Path, FileKey]:
     """
-    Method called to collect file contents.
+    Return the files matching the given glob patterns, and their device and inode.
     """
-    config = ctx.config
-    streams = []
-    for entry in config.paths:
-        glob_matches = glob.glob(str(entry))
+    paths = {}
+    for entry in entries:
+        glob_matches = glob.glob(str(entry), recursive=True)
         if not glob_matches:
-            log.error(
+            log.log(
+                level,
                 "The glob matching for provided path '%s' did not return any results. Ignoring.",
                 entry,
             )
             continue
         for match in glob_matches:
             path = pathlib.Path(match)
-            if not path.is_file():
-                log.error(
+            try:
+                stat: os.stat_result | None = path.stat()
+            except OSError:
+                stat = None
+            if stat is None or not S_ISREG(stat.st_mode):
+                log.log(
+                    level,
                     "The provided path '%s' does not exist or is not a file. Ignoring.",
                     path,
                 )
                 continue
-        streams.append(_process_file(path=path, backfill=config.backfill))
-    combined = aiostream.stream.merge(*streams)
-    async with combined.stream() as stream:
-        async for event in stream:
+            paths[path] = get_file_key(stat)
+    return paths
+
+
+async def collect(
+    *, ctx: PipelineRunContext[FileCollectConfig]
+) -> AsyncGenerator[CollectedLineEvent | CollectedLinesEvent, None]:
+    """
+    Method called to collect file contents.
+    """
+    config = ctx.config
+    watcher = _get_inotify(config)
+    checkpoints = None
+    checkpoints_task = None
+    if config.checkpoints is not None:
+        checkpoints = OffsetCheckpoints(
+            config.checkpoints,
+            save_lines=config.checkpoint_lines,
+            save_interval=config.checkpoint_interval,
+        )
+        checkpoints.load()
+        checkpoints_task = asyncio.ensure_future(checkpoints.run())
+    tailer = _FileTailer(config, watcher=watcher, checkpoints=checkpoints)
+    events = tailer.events()
+    try:
+        async for event in events:
             yield event
+    finally:
+        await events.aclose()
+        tailer.close()
+        if checkpoints_task is not None:
+            checkpoints_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await checkpoints_task
+        if checkpoints is not None:
+            checkpoints.save()
+        if watcher is not None:
+            watcher.close()
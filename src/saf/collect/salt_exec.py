@@ -2,36 +2,93 @@
 # SPDX-License-Identifier: Apache-2.0
 """
 A collect plugin that simply collects the output of a salt execution module.
+
+The functions run on the default executor, so that slow functions don't block the event loop,
+every ``interval`` seconds, or as scheduled by a cron expression, in UTC. When several functions
+are configured, they run concurrently, each generating its own events.
 """
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
+import math
+import random
 from typing import Any
+from typing import AsyncGenerator
 from typing import AsyncIterator
+from typing import Callable
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Type
 
-import salt.loader
 from pydantic import Field
+from pydantic import field_validator
 
 from saf.models import CollectConfigBase
 from saf.models import CollectedEvent
+from saf.models import NonMutableModel
 from saf.models import PipelineRunContext
+from saf.models import TrustedCollectedEvent
+from saf.utils import dt
+from saf.utils.cron import CronExpression
+from saf.utils.salt import get_minion_mods
 
 log = logging.getLogger(__name__)
 
 
+class SaltExecFunction(NonMutableModel):
+    """
+    A salt execution module function to run, see the ``functions`` configuration.
+    """
+
+    fn: str
+    args: List[Any] = Field(default_factory=list)
+    kwargs: Dict[str, Any] = Field(default_factory=dict)
+
+
 class SaltExecConfig(CollectConfigBase):
     """
     Configuration schema for the salt_exec collect plugin.
     """
 
-    interval: float = 5
+    # Run the functions every ``interval`` seconds, unless ``schedule`` is set
+    interval: float = Field(5, gt=0)
+    # A cron expression, ``minute hour day-of-month month day-of-week``, of when to run the
+    # functions. It's in UTC, not local time, so that the runs don't depend on the timezone
+    # of the minion, and none are skipped, or repeated, when daylight saving time changes.
+    schedule: Optional[str] = None
+    # Also run the functions when the collector starts, not only when ``schedule`` matches
+    run_at_start: bool = False
+    # Delay each run by a random number of seconds, up to ``jitter``, so that the same
+    # functions, scheduled on many minions, don't all run at the same time
+    jitter: float = Field(0, ge=0)
+    # How long, in seconds, to wait for a function to return before giving up on that run.
+    # Until it returns, the function is not run again.
+    timeout: Optional[float] = Field(None, gt=0)
     fn: str = "test.ping"
     args: List[Any] = Field(default_factory=list)
     kwargs: Dict[str, Any] = Field(default_factory=dict)
+    # The functions to run concurrently, instead of the one given by ``fn``, ``args``
+    # and ``kwargs``
+    functions: List[SaltExecFunction] = Field(default_factory=list)
+
+    @field_validator("schedule")
+    @classmethod
+    def _validate_schedule(cls: Type[SaltExecConfig], value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            # Raises ValueError if invalid, or if it never matches
+            CronExpression(value).next_after(dt.utcnow())
+        return value
+
+    def get_functions(self: SaltExecConfig) -> List[SaltExecFunction]:
+        """
+        Return the functions to run.
+        """
+        if self.functions:
+            return self.functions
+        return [SaltExecFunction(fn=self.fn, args=self.args, kwargs=self.kwargs)]
 
 
 def get_config_schema() -> Type[SaltExecConfig]:
@@ -41,18 +98,107 @@ def get_config_schema() -> Type[SaltExecConfig]:
     return SaltExecConfig
 
 
-async def collect(*, ctx: PipelineRunContext[SaltExecConfig]) -> AsyncIterator[CollectedEvent]:
+async def _interval_schedule(interval: float, jitter: float) -> AsyncIterator[None]:
     """
-    Method called to collect events.
+    Generate when to run, right away, and then every ``interval`` seconds.
+
+    The runs don't drift by how long they take, and the runs missed while still running are
+    skipped.
     """
-    config = ctx.config
-    # Load salt functions and pick out the desired one
-    loaded_funcs = salt.loader.minion_mods(config.parent.salt_config)
-    loaded_fn = loaded_funcs[config.fn]
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    runs = 0
+    while True:
+        delay = max(0.0, start + runs * interval - loop.time())
+        await asyncio.sleep(delay + random.uniform(0, jitter))  # noqa: S311
+        yield
+        runs = max(runs + 1, math.ceil((loop.time() - start) / interval))
+
+
+async def _cron_schedule(
+    cron: CronExpression, jitter: float, *, run_at_start: bool
+) -> AsyncIterator[None]:
+    """
+    Generate when to run, every time the cron expression matches, in UTC.
 
+    Unless ``run_at_start`` is true, the first run is at the first match, not right away.
+    """
+    if run_at_start:
+        await asyncio.sleep(random.uniform(0, jitter))  # noqa: S311
+        yield
     while True:
-        ret = loaded_fn(*config.args, **config.kwargs)
-        event = CollectedEvent(data={"ret": ret})
+        now = dt.utcnow()
+        delay = (cron.next_after(now) - now).total_seconds()
+        await asyncio.sleep(delay + random.uniform(0, jitter))  # noqa: S311
+        yield
+
+
+def _schedule(config: SaltExecConfig) -> AsyncIterator[None]:
+    """
+    Generate when to run the functions, per ``interval``, or ``schedule``, and ``jitter``.
+    """
+    if config.schedule is None:
+        return _interval_schedule(config.interval, config.jitter)
+    return _cron_schedule(
+        CronExpression(config.schedule), config.jitter, run_at_start=config.run_at_start
+    )
+
+
+async def _run_function(
+    function: SaltExecFunction,
+    loaded_fn: Callable[..., Any],
+    config: SaltExecConfig,
+    queue: asyncio.Queue[CollectedEvent],
+) -> None:
+    """
+    Run the function as scheduled, and put an event with what it returned in ``queue``.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(loaded_fn, *function.args, **function.kwargs)
+    running: asyncio.Future[Any] | None = None
+    async for _ in _schedule(config):
+        if running is not None and not running.done():
+            log.warning("The function %s is still running, skipping this run", function.fn)
+            continue
+        running = loop.run_in_executor(None, call)
+        # Don't cancel the call on timeout, it would keep running on the executor anyway
+        done, _ = await asyncio.wait({running}, timeout=config.timeout)
+        if not done:
+            log.warning(
+                "The function %s did not return within %s seconds", function.fn, config.timeout
+            )
+            continue
+        try:
+            ret = running.result()
+        except Exception:
+            log.exception("Failed to run the function %s", function.fn)
+            continue
+        event = TrustedCollectedEvent(data={"fn": function.fn, "ret": ret})
         log.debug("CollectedEvent: %s", event)
-        yield event
-        await asyncio.sleep(config.interval)
+        await queue.put(event)
+
+
+async def collect(
+    *, ctx: PipelineRunContext[SaltExecConfig]
+) -> AsyncGenerator[CollectedEvent, None]:
+    """
+    Method called to collect events.
+    """
+    config = ctx.config
+    loop = asyncio.get_running_loop()
+    # Load salt functions, which takes a while the first time, and pick out the desired ones
+    loaded_funcs = await loop.run_in_executor(None, get_minion_mods, config.parent.salt_config)
+    functions = config.get_functions()
+    loaded_fns = [loaded_funcs[function.fn] for function in functions]
+    queue: asyncio.Queue[CollectedEvent] = asyncio.Queue()
+    tasks = [
+        asyncio.ensure_future(_run_function(function, loaded_fn, config, queue))
+        for function, loaded_fn in zip(functions, loaded_fns)
+    ]
+    try:
+        while True:
+            yield await queue.get()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,285 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+A collect plugin that aggregates Salt's job events into one event per job.
+
+It listens to Salt's event bus for the ``salt/job/<jid>/new`` and ``salt/job/<jid>/ret/<minion>``
+events, which are only published on the master's event bus, and, once all targeted minions
+returned, or after ``ttl`` seconds, generates a single event with the job's targets, returns,
+success ratio and duration. A job which targets no minions is aggregated right away, and,
+when the events stop, the jobs still waiting for returns are aggregated with what they got.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import fnmatch
+import logging
+import time
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import AsyncGenerator
+from typing import Dict
+from typing import List
+from typing import Type
+from typing import TypeVar
+
+from pydantic import Field
+
+from saf.models import CollectConfigBase
+from saf.models import CollectedEvent
+from saf.models import PipelineRunContext
+from saf.models import TrustedCollectedEvent
+from saf.utils import eventbus
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from saf.models import SaltEvent
+
+log = logging.getLogger(__name__)
+
+JOB_TAGS = {"salt/job/*/new", "salt/job/*/ret/*"}
+
+J = TypeVar("J", bound="Job")
+JI = TypeVar("JI", bound="JobIndex")
+
+
+class SaltJobsConfig(CollectConfigBase):
+    """
+    Configuration schema for the salt_jobs collect plugin.
+    """
+
+    # How long, in seconds, to wait for all targeted minions to return, after which the
+    # job is aggregated with the returns collected so far
+    ttl: float = Field(300, gt=0)
+    # The maximum number of jobs waiting for returns. When reached, the oldest job
+    # is aggregated with the returns collected so far
+    max_jobs: int = Field(10000, gt=0)
+    # Shell-style patterns of the job functions to ignore, by default, the jobs the salt
+    # CLI runs to check on the running jobs
+    exclude_functions: List[str] = Field(default_factory=lambda: ["saltutil.find_job"])
+    # Include what each minion returned in the aggregated events, and not just if it succeeded
+    include_returns: bool = True
+
+
+def get_config_schema() -> Type[SaltJobsConfig]:
+    """
+    Get the salt_jobs plugin configuration schema.
+    """
+    return SaltJobsConfig
+
+
+class Job:
+    """
+    A job waiting for its targets to return.
+    """
+
+    __slots__ = (
+        "jid",
+        "data",
+        "targets",
+        "targeted",
+        "returns",
+        "start_time",
+        "end_time",
+        "expires_at",
+    )
+
+    def __init__(self: J, jid: str, start_time: datetime, expires_at: float) -> None:
+        self.jid = jid
+        # The ``new`` event data, if seen
+        self.data: Dict[str, Any] = {}
+        self.targets: List[str] = []
+        # Whether the targeted minions are known, from the ``new`` event
+        self.targeted = False
+        self.returns: Dict[str, Dict[str, Any]] = {}
+        self.start_time = start_time
+        self.end_time = start_time
+        self.expires_at = expires_at
+
+    @property
+    def complete(self: J) -> bool:
+        """
+        Return ``True`` when all targeted minions returned, or when no minions were targeted.
+        """
+        return self.targeted and all(minion in self.returns for minion in self.targets)
+
+    def to_dict(self: J, *, include_returns: bool = True) -> Dict[str, Any]:
+        """
+        Return the aggregated job.
+        """
+        targets = self.targets or list(self.returns)
+        succeeded = sum(1 for ret in self.returns.values() if ret["success"])
+        returns = self.returns
+        if not include_returns:
+            returns = {
+                minion: {key: value for key, value in ret.items() if key != "return"}
+                for minion, ret in self.returns.items()
+            }
+        return {
+            "jid": self.jid,
+            "fun": self.data.get("fun"),
+            "arg": self.data.get("arg"),
+            "tgt": self.data.get("tgt"),
+            "tgt_type": self.data.get("tgt_type"),
+            "user": self.data.get("user"),
+            "targets": targets,
+            "missing": [minion for minion in targets if minion not in self.returns],
+            "returns": returns,
+            "complete": self.complete,
+            # The minions which did not return count as failed
+            "success_ratio": succeeded / len(targets) if targets else 0.0,
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat(),
+            "duration": (self.end_time - self.start_time).total_seconds(),
+        }
+
+
+class JobIndex:
+    """
+    In-memory index of the jobs waiting for their targets to return, keyed by JID.
+    """
+
+    def __init__(self: JI, ttl: float, max_jobs: int) -> None:
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        # Ordered by insertion, so, by expiry time
+        self.jobs: collections.OrderedDict[str, Job] = collections.OrderedDict()
+
+    def __len__(self: JI) -> int:
+        """
+        Return the number of jobs waiting for returns.
+        """
+        return len(self.jobs)
+
+    def add_event(self: JI, salt_event: SaltEvent) -> List[Job]:
+        """
+        Add a job ``new`` or ``ret`` event to the index.
+
+        Return the jobs which are done, either because all targets returned, or to make
+        room for the new job.
+        """
+        data = salt_event.data
+        jid = str(data.get("jid") or salt_event.tag.split("/")[2])
+        done = []
+        job = self.jobs.get(jid)
+        if job is None:
+            while len(self.jobs) >= self.max_jobs:
+                _, oldest = self.jobs.popitem(last=False)
+                log.debug("Too many jobs waiting for returns, aggregating job %s", oldest.jid)
+                done.append(oldest)
+            job = self.jobs[jid] = Job(jid, salt_event.stamp, time.monotonic() + self.ttl)
+        if salt_event.tag.endswith("/new"):
+            job.data = data
+            job.start_time = min(job.start_time, salt_event.stamp)
+            job.targeted = True
+            for minion in data.get("minions") or ():
+                if minion not in job.targets:
+                    job.targets.append(minion)
+        else:
+            minion = data.get("id") or salt_event.tag.rsplit("/", 1)[-1]
+            retcode = data.get("retcode", 0)
+            job.returns[minion] = {
+                "success": bool(data.get("success", True)) and not retcode,
+                "retcode": retcode,
+                "return": data.get("return"),
+            }
+            job.end_time = max(job.end_time, salt_event.stamp)
+            if not job.data:
+                # The ``new`` event was not seen, at least, keep the function
+                job.data = {"fun": data.get("fun"), "arg": data.get("fun_args")}
+        if job.complete:
+            done.append(self.jobs.pop(jid))
+        return done
+
+    def expire(self: JI, now: float | None = None) -> List[Job]:
+        """
+        Remove, and return, the jobs which waited for returns for longer than ``ttl`` seconds.
+        """
+        if now is None:
+            now = time.monotonic()
+        expired = []
+        while self.jobs:
+            job = next(iter(self.jobs.values()))
+            if job.expires_at > now:
+                break
+            expired.append(self.jobs.pop(job.jid))
+        return expired
+
+    def flush(self: JI) -> List[Job]:
+        """
+        Remove, and return, all the jobs, whether their targets returned or not.
+        """
+        jobs = list(self.jobs.values())
+        self.jobs.clear()
+        return jobs
+
+    def next_expiry(self: JI) -> float | None:
+        """
+        Return how long, in seconds, until the next job expires, or ``None`` without jobs.
+        """
+        if not self.jobs:
+            return None
+        return max(0.0, next(iter(self.jobs.values())).expires_at - time.monotonic())
+
+
+def _is_excluded(salt_event: SaltEvent, exclude_functions: List[str]) -> bool:
+    fun = salt_event.data.get("fun")
+    if not isinstance(fun, str):
+        return False
+    return any(fnmatch.fnmatchcase(fun, pattern) for pattern in exclude_functions)
+
+
+async def collect(
+    *, ctx: PipelineRunContext[SaltJobsConfig]
+) -> AsyncGenerator[CollectedEvent, None]:
+    """
+    Method called to collect events.
+    """
+    config = ctx.config
+    index = JobIndex(config.ttl, config.max_jobs)
+    log.info("The salt_jobs collect plugin is configured to listen to tags: %s", JOB_TAGS)
+    events = eventbus.iter_events(
+        opts=ctx.salt_config.copy(), tags=JOB_TAGS, client=config.parent.eventbus_client
+    )
+    next_event: asyncio.Future[SaltEvent] | None = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(events.__anext__())
+            # Don't cancel the pending event while waiting for the jobs to expire
+            await asyncio.wait({next_event}, timeout=index.next_expiry())
+            done = index.expire()
+            if next_event.done():
+                try:
+                    salt_event = next_event.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    next_event = None
+                if not _is_excluded(salt_event, config.exclude_functions):
+                    done.extend(index.add_event(salt_event))
+            for job in done:
+                log.debug("Aggregated job %s", job.jid)
+                yield TrustedCollectedEvent(
+                    data=job.to_dict(include_returns=config.include_returns)
+                )
+        # No more job events, aggregate the jobs still waiting for returns
+        for job in index.flush():
+            log.debug("Aggregated job %s, the event stream ended", job.jid)
+            yield TrustedCollectedEvent(data=job.to_dict(include_returns=config.include_returns))
+    finally:
+        if index:
+            # Closed, while stopping the pipeline, no more events can be generated
+            log.warning(
+                "Stopped with %d jobs still waiting for returns, which are not aggregated",
+                len(index),
+            )
+            index.flush()
+        if next_event is not None:
+            next_event.cancel()
+            with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_event
+        await events.aclose()
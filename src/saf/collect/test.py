@@ -19,6 +19,7 @@ from pydantic import Field
 from saf.models import CollectConfigBase
 from saf.models import CollectedEvent
 from saf.models import PipelineRunContext
+from saf.models import TrustedCollectedEvent
 
 log = logging.getLogger(__name__)
 
@@ -51,7 +52,7 @@ async def collect(
     counter = 1
     await asyncio.sleep(config.interval)
     while counter <= config.count:
-        yield CollectedEvent(
+        yield TrustedCollectedEvent(
             data={
                 "name": config.name,
                 "count": counter,
@@ -0,0 +1,334 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Salt Analytics Framework Plugin Executors.
+
+Run plugins outside of the pipelines event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import types
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import AsyncGenerator
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Generic
+from typing import Type
+from typing import TypeVar
+
+from saf.models import CollectedEvent
+from saf.models import PipelineRunContext
+from saf.models import PluginConfigMixin
+from saf.models import ProcessConfigBase
+
+if TYPE_CHECKING:
+    from types import ModuleType
+
+log = logging.getLogger(__name__)
+
+# The process plugin run context of the worker process, see ``_initialize_process_worker``
+_WORKER_CTX: PipelineRunContext[ProcessConfigBase] | None = None
+_WORKER_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+async def process_events(
+    plugin: ModuleType,
+    ctx: PipelineRunContext[ProcessConfigBase],
+    events: list[CollectedEvent],
+) -> AsyncIterator[CollectedEvent]:
+    """
+    Pass a batch of events through a process plugin, generating the processed events.
+
+    The processed events are generated as soon as the plugin yields them.
+    If the plugin does not provide ``process_batch``, it's called once per event.
+    It's up to the caller to allow other coroutines to run in between batches.
+    """
+    if hasattr(plugin, "process_batch"):
+        async for processed_event in plugin.process_batch(ctx=ctx, events=events):
+            if processed_event is not None:
+                yield processed_event
+        return
+    # The plugin does not support batches, process one event at a time
+    for event in events:
+        async for processed_event in plugin.process(ctx=ctx, event=event):
+            if processed_event is not None:
+                yield processed_event
+
+
+async def process_batch(
+    plugin: ModuleType,
+    ctx: PipelineRunContext[ProcessConfigBase],
+    events: list[CollectedEvent],
+) -> list[CollectedEvent]:
+    """
+    Pass a batch of events through a process plugin, and return all of the processed events.
+
+    Used where the events have to be handed back at once, like from an executor.
+    """
+    return [processed_event async for processed_event in process_events(plugin, ctx, events)]
+
+
+def _initialize_process_worker(
+    config_cls: Type[ProcessConfigBase], config_data: dict[str, Any], config_name: str
+) -> None:
+    global _WORKER_CTX, _WORKER_LOOP  # noqa: PLW0603
+    config = config_cls.model_validate(config_data)
+    config._name = config_name  # noqa: SLF001
+    _WORKER_CTX = PipelineRunContext.model_construct(config=config)
+    _WORKER_LOOP = asyncio.new_event_loop()
+    asyncio.set_event_loop(_WORKER_LOOP)
+
+
+def _process_batch_in_worker(events: list[CollectedEvent]) -> list[CollectedEvent]:
+    if TYPE_CHECKING:
+        assert _WORKER_CTX
+        assert _WORKER_LOOP
+    return _WORKER_LOOP.run_until_complete(
+        process_batch(_WORKER_CTX.config.loaded_plugin, _WORKER_CTX, events)
+    )
+
+
+T = TypeVar("T")
+PPE = TypeVar("PPE", bound="ProcessPoolPluginExecutor")
+PluginConfigType = TypeVar("PluginConfigType", bound=PluginConfigMixin)
+TPE = TypeVar("TPE", bound="ThreadPoolPluginExecutor[Any]")
+
+
+class ProcessPoolPluginExecutor:
+    """
+    Run a process plugin in a pool of worker processes.
+
+    Batches of events are pickled and shipped to the workers, which makes this executor
+    a good fit for CPU bound processors, since they no longer block the event loop and
+    can use more than one CPU.
+
+    Each worker process builds it's own plugin run context, so, ``ctx.cache`` is local to
+    the worker, ``ctx.shared_cache`` is not shared with the pipeline, and the salt
+    configuration is not available.
+    """
+
+    def __init__(self: PPE, config: ProcessConfigBase) -> None:
+        self.config = config
+        self.workers = config.executor_workers or os.cpu_count() or 1
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            # Forking a process running an event loop, and most likely salt's threads,
+            # is not safe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_process_worker,
+            initargs=(type(config), config.model_dump(), config.name),
+        )
+
+    async def process_batch(self: PPE, events: list[CollectedEvent]) -> list[CollectedEvent]:
+        """
+        Process a batch of events in one of the pool's workers.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._pool, _process_batch_in_worker, events)
+
+    def get_stats(self: PPE) -> dict[str, Any]:
+        """
+        Return the executor statistics, the number of worker processes.
+        """
+        return {"workers": self.workers}
+
+    def shutdown(self: PPE) -> None:
+        """
+        Shutdown the worker processes.
+        """
+        log.debug("Shutting down the process pool of %r", self.config.name)
+        self._pool.shutdown(wait=False)
+
+
+class ThreadPoolPluginExecutor(Generic[PluginConfigType]):
+    """
+    Run a plugin in a pool of threads.
+
+    Each thread runs the plugin on it's own event loop, which makes this executor a good
+    fit for plugins which call blocking code, since they no longer block the pipeline's
+    event loop. The plugin should not share asyncio primitives with the pipeline's
+    event loop.
+
+    The threads are named after the plugin configuration, and the executor keeps
+    track of the number of calls, errors and the time spent running the plugin.
+
+    Collecting holds one of the pool's threads for as long as the collector runs, which
+    is only accounted as a call, and as busy time, once the collector stops.
+    """
+
+    def __init__(self: TPE, ctx: PipelineRunContext[PluginConfigType]) -> None:
+        self.ctx = ctx
+        self.config = ctx.config
+        self.plugin = ctx.config.loaded_plugin
+        # The same default as concurrent.futures.ThreadPoolExecutor
+        self.workers = self.config.executor_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix=f"saf-{self.config.name}",
+        )
+        self._lock = threading.Lock()
+        # The event loops of the threads not running the plugin, keyed by thread ident.
+        # Each thread gets an event loop which is reused for all calls.
+        self._loops: dict[int, asyncio.AbstractEventLoop] = {}
+        self._shutdown = False
+        # Instrumentation
+        self.active = 0
+        self.calls = 0
+        self.errors = 0
+        self.busy_time = 0.0
+
+    def _run_in_thread(self: TPE, func: Callable[..., Awaitable[T]], kwargs: dict[str, Any]) -> T:
+        ident = threading.get_ident()
+        with self._lock:
+            loop = self._loops.pop(ident, None)
+            self.active += 1
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+        failed = False
+        start = time.perf_counter()
+        try:
+            return loop.run_until_complete(func(**kwargs))
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.active -= 1
+                self.calls += 1
+                self.busy_time += duration
+                if failed:
+                    self.errors += 1
+                shutdown = self._shutdown
+                if not shutdown:
+                    self._loops[ident] = loop
+            if shutdown:
+                # The executor was shutdown while the plugin ran, nothing else
+                # will use this loop
+                asyncio.set_event_loop(None)
+                loop.close()
+            log.debug("Ran %s for %r in %.6f seconds", func, self.config.name, duration)
+
+    async def _run(
+        self: TPE, func: Callable[..., Awaitable[T]], **kwargs: Any  # noqa: ANN401
+    ) -> T:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._pool, self._run_in_thread, func, kwargs)
+
+    async def collect(self: TPE) -> AsyncGenerator[CollectedEvent, None]:
+        """
+        Collect events from the plugin, running on one of the pool's threads.
+
+        The thread is held until the collector stops.
+        """
+        loop = asyncio.get_event_loop()
+        # A maximum size of 1 makes the thread wait for each event to be consumed
+        events: asyncio.Queue[CollectedEvent] = asyncio.Queue(maxsize=1)
+        state = types.SimpleNamespace(loop=None, task=None, cancelled=False)
+        state_lock = threading.Lock()
+
+        async def _collect() -> None:
+            with state_lock:
+                if state.cancelled:
+                    # Stopped before the thread got to run the collector
+                    return
+                state.loop = asyncio.get_event_loop()
+                state.task = asyncio.current_task()
+            async for event in self.plugin.collect(ctx=self.ctx):
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(events.put(event), loop))
+
+        collecting = asyncio.ensure_future(self._run(_collect))
+        next_event: asyncio.Future[CollectedEvent] | None = None
+        try:
+            while True:
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait(
+                    {next_event, collecting}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_event in done:
+                    yield next_event.result()
+                    continue
+                next_event.cancel()
+                # The plugin stopped collecting, pass along what's left and
+                # re-raise any exception
+                while not events.empty():
+                    yield events.get_nowait()
+                collecting.result()
+                break
+        finally:
+            if next_event is not None and not next_event.done():
+                # Closed, or cancelled, while waiting for the next event
+                next_event.cancel()
+            if not collecting.done():
+                with state_lock:
+                    state.cancelled = True
+                    if state.task is not None:
+                        state.loop.call_soon_threadsafe(state.task.cancel)
+                # Don't wait for the thread, the plugin might be blocked, but retrieve the
+                # result to not get warnings about exceptions never retrieved.
+                collecting.add_done_callback(_ignore_result)
+
+    async def process_batch(self: TPE, events: list[CollectedEvent]) -> list[CollectedEvent]:
+        """
+        Process a batch of events in one of the pool's threads.
+        """
+        return await self._run(process_batch, plugin=self.plugin, ctx=self.ctx, events=events)
+
+    async def forward(self: TPE, event: CollectedEvent) -> None:
+        """
+        Forward an event in one of the pool's threads.
+        """
+        await self._run(self.plugin.forward, ctx=self.ctx, event=event)
+
+    async def forward_batch(self: TPE, events: list[CollectedEvent]) -> None:
+        """
+        Forward a batch of events in one of the pool's threads.
+        """
+        await self._run(self.plugin.forward_batch, ctx=self.ctx, events=events)
+
+    def get_stats(self: TPE) -> dict[str, Any]:
+        """
+        Return the executor statistics.
+
+        The number of threads, how many of them are running the plugin, the number of
+        calls and errors, and the seconds spent running the plugin.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "calls": self.calls,
+                "errors": self.errors,
+                "busy_time": self.busy_time,
+            }
+
+    def shutdown(self: TPE) -> None:
+        """
+        Shutdown the pool's threads, and close their event loops.
+
+        The event loops of the threads still running the plugin are closed by those
+        threads, once the plugin returns.
+        """
+        log.debug("Shutting down the thread pool of %r", self.config.name)
+        self._pool.shutdown(wait=False)
+        with self._lock:
+            self._shutdown = True
+            loops = list(self._loops.values())
+            self._loops.clear()
+        for loop in loops:
+            loop.close()
+
+
+def _ignore_result(future: asyncio.Future[Any]) -> None:
+    if not future.cancelled():
+        future.exception()
@@ -9,6 +9,7 @@ from __future__ import annotations
 
 import logging
 import pathlib
+from typing import List
 from typing import Optional
 from typing import Type
 
@@ -20,6 +21,9 @@ from saf.models import PipelineRunContext
 
 log = logging.getLogger(__name__)
 
+# The forwarded events are not modified, they can be shared with other forwarders
+READ_ONLY = True
+
 
 class DiskConfig(ForwardConfigBase):
     """
@@ -63,3 +67,30 @@ async def forward(
         async with aiofiles.open(dest, "w", encoding="utf-8") as wfh:
             wrote = await wfh.write(event.model_dump_json(indent=indent))
     log.debug("Wrote %s bytes to %s", wrote, dest)
+
+
+async def forward_batch(
+    *,
+    ctx: PipelineRunContext[DiskConfig],
+    events: List[CollectedEvent],
+) -> None:
+    """
+    Method called to forward a batch of events.
+    """
+    config = ctx.config
+    if not config.filename:
+        # Each event is dumped to it's own file
+        for event in events:
+            await forward(ctx=ctx, event=event)
+        return
+    indent: Optional[int] = None
+    if config.pretty_print:
+        indent = 2
+    if not config.path.exists():
+        config.path.mkdir(parents=True)
+    dest = config.path / config.filename
+    dest.touch()
+    contents = "".join(f"{event.model_dump_json(indent=indent)}\n" for event in events)
+    async with aiofiles.open(dest, "a", encoding="utf-8") as wfh:
+        wrote = await wfh.write(contents)
+    log.debug("Wrote %s bytes(%s events) to %s", wrote, len(events), dest)
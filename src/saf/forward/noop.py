@@ -8,6 +8,7 @@ It doesn't really do anything to the collected event
 from __future__ import annotations
 
 import logging
+from typing import List
 from typing import Type
 
 from saf.models import CollectedEvent
@@ -16,6 +17,9 @@ from saf.models import PipelineRunContext
 
 log = logging.getLogger(__name__)
 
+# The forwarded events are not modified, they can be shared with other forwarders
+READ_ONLY = True
+
 
 def get_config_schema() -> Type[ForwardConfigBase]:
     """
@@ -33,3 +37,14 @@ async def forward(
     Method called to forward the event.
     """
     log.debug("Forwarding: %s", event)
+
+
+async def forward_batch(
+    *,
+    ctx: PipelineRunContext[ForwardConfigBase],  # noqa: ARG001
+    events: List[CollectedEvent],
+) -> None:
+    """
+    Method called to forward a batch of events.
+    """
+    log.debug("Forwarding %d events: %s", len(events), events)
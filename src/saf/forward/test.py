@@ -26,6 +26,9 @@ from saf.models import PipelineRunContext
 
 log = logging.getLogger(__name__)
 
+# The forwarded events are not modified, they can be shared with other forwarders
+READ_ONLY = True
+
 
 class TestForwardConfig(ForwardConfigBase):
     """
@@ -9,6 +9,7 @@ import asyncio
 import logging
 from asyncio import Task
 from typing import TYPE_CHECKING
+from typing import Any
 from typing import TypeVar
 
 import aiorun
@@ -104,3 +105,21 @@ class Manager:
         pipeline = self.pipelines[name]
         pipeline.__exit__()
         return None
+
+    def get_stats(self: MN, name: str | None = None) -> dict[str, dict[str, Any]]:
+        """
+        Return the statistics of all pipelines, or of a pipeline by name, keyed by pipeline name.
+
+        See :py:meth:`saf.pipeline.Pipeline.get_stats`.
+        """
+        if name is not None and name not in self.pipelines:
+            msg = f"Unknown pipeline {name!r}"
+            raise ValueError(msg)
+        stats: dict[str, dict[str, Any]] = {}
+        for pipeline_name, pipeline in self.pipelines.items():
+            if name is not None and pipeline_name != name:
+                continue
+            stats[pipeline_name] = pipeline.get_stats()
+            task = self.pipeline_tasks.get(pipeline_name)
+            stats[pipeline_name]["running"] = task is not None and not task.done()
+        return stats
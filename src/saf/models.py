@@ -5,6 +5,7 @@ Salt Analytics Framework Models.
 """
 from __future__ import annotations
 
+import enum
 import logging
 import platform
 from datetime import datetime
@@ -34,6 +35,7 @@ from typing_extensions import Annotated
 import saf
 from saf.plugins import PluginsList
 from saf.utils import dt
+from saf.utils.buffer import OverflowPolicy
 
 if TYPE_CHECKING:
     from types import ModuleType
@@ -69,6 +71,31 @@ class NonMutableConfig(BaseModel):
         return self._parent
 
 
+class PluginExecutor(enum.Enum):
+    """
+    Where to run a plugin, instead of the pipeline's event loop.
+    """
+
+    # A pool of worker processes, see :py:class:`~saf.executors.ProcessPoolPluginExecutor`.
+    # Only supported by process plugins.
+    PROCESS = "process"
+    # A pool of threads, see :py:class:`~saf.executors.ThreadPoolPluginExecutor`.
+    # Collectors hold one of the threads for as long as they run.
+    THREAD = "thread"
+
+
+class EventBusClient(enum.Enum):
+    """
+    How to listen to Salt's event bus.
+    """
+
+    # Salt's own event bus client, running on a separate thread
+    THREAD = "thread"
+    # Read salt's event publisher socket directly, on the pipeline's event loop.
+    # Falls back to ``thread`` when the publisher socket is not supported.
+    ASYNCIO = "asyncio"
+
+
 PCMI = TypeVar("PCMI", bound="PluginConfigMixin")
 
 
@@ -78,6 +105,13 @@ class PluginConfigMixin(NonMutableConfig):
     """
 
     plugin: str
+    # Run the plugin somewhere else than the pipeline's event loop. Plugins which block,
+    # for example, doing I/O, should run on a pool of threads, CPU bound process plugins
+    # should run on a pool of worker processes.
+    executor: Optional[PluginExecutor] = None
+    # The number of executor workers. Defaults to the number of CPUs for the 'process'
+    # executor, and to the number of CPUs plus 4, up to 32, for the 'thread' executor.
+    executor_workers: Optional[int] = Field(None, gt=0)
 
     _name: str = PrivateAttr()
 
@@ -95,6 +129,16 @@ class PluginConfigMixin(NonMutableConfig):
         """
         raise NotImplementedError
 
+    @field_validator("executor")
+    @classmethod
+    def _validate_executor(
+        cls: Type[PCMI], value: Optional[PluginExecutor]
+    ) -> Optional[PluginExecutor]:
+        if value == PluginExecutor.PROCESS and not issubclass(cls, ProcessConfigBase):
+            msg = "The 'process' executor is only supported by process plugins"
+            raise ValueError(msg)
+        return value
+
 
 CCB = TypeVar("CCB", bound="CollectConfigBase")
 
@@ -120,6 +164,12 @@ class ProcessConfigBase(PluginConfigMixin):
     Base config schema for process plugins.
     """
 
+    # The maximum number of events, or batches of events, being processed at the same time
+    concurrency: int = Field(1, gt=0)
+    # When processing concurrently, pass the processed events along in the order
+    # they were received instead of as soon as they're processed
+    ordered: bool = True
+
     @property
     def loaded_plugin(self: PCB) -> ModuleType:
         """
@@ -136,6 +186,10 @@ class ForwardConfigBase(PluginConfigMixin):
     Base config schema for forward plugins.
     """
 
+    # Forwarders which don't modify the events they forward get the same event instances,
+    # instead of copies. Defaults to the plugin's ``READ_ONLY`` module attribute.
+    read_only: Optional[bool] = None
+
     @property
     def loaded_plugin(self: FCB) -> ModuleType:
         """
@@ -143,6 +197,40 @@ class ForwardConfigBase(PluginConfigMixin):
         """
         return PluginsList.instance().forwarders[self.plugin]
 
+    @property
+    def is_read_only(self: FCB) -> bool:
+        """
+        Return ``True`` if the forwarder does not modify the events it forwards.
+        """
+        if self.read_only is not None:
+            return self.read_only
+        return getattr(self.loaded_plugin, "READ_ONLY", False) is True
+
+
+class PipelineBufferConfig(NonMutableModel):
+    """
+    Config schema for a buffer between two pipeline stages.
+    """
+
+    # The maximum number of events the buffer holds
+    size: int = Field(1000, gt=0)
+    # What to do with new events once the buffer is full. Defaults to the pipeline's setting.
+    overflow_policy: Optional[OverflowPolicy] = None
+    # The probability of accepting an event under the 'sample' overflow policy.
+    # Defaults to the pipeline's setting.
+    sample_rate: Optional[float] = Field(None, gt=0, le=1)
+
+
+class PipelineBuffersConfig(NonMutableModel):
+    """
+    Config schema for the buffers between the pipeline stages.
+    """
+
+    # Collected events waiting to be processed
+    process: PipelineBufferConfig = Field(default_factory=PipelineBufferConfig)
+    # Collected, or processed, events waiting to be forwarded
+    forward: PipelineBufferConfig = Field(default_factory=PipelineBufferConfig)
+
 
 PC = TypeVar("PC", bound="PipelineConfig")
 
@@ -157,6 +245,18 @@ class PipelineConfig(NonMutableConfig):
     forward: List[str]
     enabled: bool = True
     restart: bool = True
+    # When greater than 1, events are grouped into batches of, at most, this size
+    # before being passed to the processors and forwarders.
+    batch_size: int = Field(1, gt=0)
+    # The maximum amount of seconds to wait for a batch to fill up before passing
+    # along what was already collected.
+    batch_timeout: float = Field(0.5, gt=0)
+    buffers: PipelineBuffersConfig = Field(default_factory=PipelineBuffersConfig)
+    # What to do with new events once a buffer is full. The default, 'block', waits for
+    # room in the buffer and never drops events.
+    overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK
+    # The probability of accepting an event under the 'sample' overflow policy
+    sample_rate: float = Field(0.1, gt=0, le=1)
 
     _name: str = PrivateAttr()
 
@@ -241,6 +341,8 @@ class AnalyticsConfig(BaseModel):
     forwarders: Dict[str, ForwardConfig]
     pipelines: Dict[str, PipelineConfig]
     salt_config: Dict[str, Any]
+    # How the collectors listening to Salt's event bus, for example, the beacons one, get the events
+    eventbus_client: EventBusClient = EventBusClient.THREAD
 
     @field_validator("pipelines", mode="before")
     @classmethod
@@ -280,6 +382,9 @@ class AnalyticsConfig(BaseModel):
                 config._parent = self  # pylint: disable=protected-access
 
 
+CE = TypeVar("CE", bound="CollectedEvent")
+
+
 class CollectedEvent(BaseModel):
     """
     Class representing each of the collected events.
@@ -288,6 +393,59 @@ class CollectedEvent(BaseModel):
     data: Mapping[str, Any]
     timestamp: Optional[datetime] = Field(default_factory=dt.utcnow)
 
+    def forwarded(self: CE) -> None:
+        """
+        Called by the pipeline once it's done with the event.
+
+        That is, once the event, or the events the processors made out of it, if any, went
+        through all of the forwarders, or were dropped on purpose. Does nothing by default.
+        The events of collectors which keep track of what was delivered, like the file
+        collect plugin checkpoints, let their collector know.
+        """
+
+
+TCE = TypeVar("TCE", bound="TrustedCollectedEvent")
+
+_object_setattr = object.__setattr__
+
+
+class TrustedCollectedEvent(CollectedEvent):
+    """
+    Collected event built without validation.
+
+    Plugins which produce events with well known data can use it instead of
+    :py:class:`CollectedEvent`, to skip the model validation. It's a :py:class:`CollectedEvent`
+    in every other way, built like ``CollectedEvent.model_construct()`` would, but faster.
+    """
+
+    def __init__(self: TCE, data: Mapping[str, Any], timestamp: Optional[datetime] = None) -> None:
+        if timestamp is None:
+            timestamp = dt.utcnow()
+            fields_set = {"data"}
+        else:
+            fields_set = {"data", "timestamp"}
+        # The same state ``model_construct()`` sets, without looking up the fields defaults
+        _object_setattr(self, "__dict__", {"data": data, "timestamp": timestamp})
+        _object_setattr(self, "__pydantic_fields_set__", fields_set)
+        _object_setattr(self, "__pydantic_extra__", None)
+        _object_setattr(self, "__pydantic_private__", None)
+
+    def to_model(self: TCE) -> CollectedEvent:
+        """
+        Return the event as a plain :py:class:`CollectedEvent`.
+
+        The model shares the ``data`` mapping with this event.
+        """
+        return CollectedEvent.model_construct(data=self.data, timestamp=self.timestamp)
+
+    def __eq__(self: TCE, other: object) -> bool:
+        """
+        Compare the event with another event, trusted or not.
+        """
+        if not isinstance(other, CollectedEvent):
+            return NotImplemented
+        return self.data == other.data and self.timestamp == other.timestamp
+
 
 SE = TypeVar("SE", bound="SaltEvent")
 
@@ -300,7 +458,8 @@ class SaltEvent(NonMutableModel):
     tag: str
     stamp: datetime
     data: Dict[str, Any]
-    raw_data: Dict[str, Any]
+    # The full event payload, which shares structure with ``data``
+    raw_data: Optional[Dict[str, Any]] = None
 
     @staticmethod
     def _convert_stamp(stamp: str) -> datetime:
@@ -7,21 +7,37 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from functools import partial
 from typing import TYPE_CHECKING
 from typing import Any
+from typing import AsyncGenerator
+from typing import AsyncIterable
 from typing import AsyncIterator
+from typing import Callable
+from typing import Coroutine
+from typing import List
+from typing import NamedTuple
 from typing import TypeVar
 
 import aiostream.stream
 import backoff
 
+from saf.executors import ProcessPoolPluginExecutor
+from saf.executors import ThreadPoolPluginExecutor
+from saf.executors import process_events
 from saf.models import CollectConfigBase
 from saf.models import CollectedEvent
 from saf.models import ForwardConfigBase
+from saf.models import PipelineBufferConfig
 from saf.models import PipelineConfig
 from saf.models import PipelineRunContext
+from saf.models import PluginExecutor
 from saf.models import ProcessConfigBase
+from saf.utils import dt
+from saf.utils.buffer import EventBuffer
+from saf.utils.stats import LatencyHistogram
+from saf.utils.stats import StageStats
 
 if TYPE_CHECKING:
     from types import ModuleType
@@ -41,6 +57,177 @@ def _log_backoff_exception(details: dict[str, Any]) -> None:
         log.exception(details["exception"])
 
 
+ProcessStreamFunc = Callable[[List[CollectedEvent]], AsyncIterator[CollectedEvent]]
+
+
+class ProcessStep(NamedTuple):
+    """
+    A step of the pipeline's process stage.
+    """
+
+    # Pass a batch of events through one, or more, processors, generating the processed
+    # events as soon as the processors yield them
+    process: ProcessStreamFunc
+    # How many batches the step processes at the same time
+    task_limit: int
+    # Whether the batches leave the step in the order they entered it
+    ordered: bool
+
+
+class ForwardTarget(NamedTuple):
+    """
+    A forwarder of the pipeline's forward stage.
+    """
+
+    plugin: ModuleType
+    ctx: PipelineRunContext[ForwardConfigBase]
+    # Whether the forwarder gets it's own copy of the events
+    copy_events: bool
+
+
+AK = TypeVar("AK", bound="_Acknowledgement")
+
+
+class _Acknowledgement:
+    """
+    Acknowledge the events a processor was given, once the events it returned are.
+
+    Processors may drop the events, or return new ones instead, so the processed events
+    can't be traced back to the events they came from.
+    """
+
+    __slots__ = ("acknowledges", "pending")
+
+    def __init__(self: AK, acknowledges: list[Callable[[], None]]) -> None:
+        self.acknowledges = acknowledges
+        # The processed events not acknowledged yet, plus one until the processor returns
+        self.pending = 1
+
+    def hold(self: AK) -> None:
+        self.pending += 1
+
+    def release(self: AK) -> None:
+        self.pending -= 1
+        if not self.pending:
+            for acknowledge in self.acknowledges:
+                acknowledge()
+
+
+def _chain_processes(chain: list[ProcessStreamFunc]) -> ProcessStreamFunc:
+    # Pass the processed events through the rest of the chain as soon as they're
+    # processed, instead of holding them back until the whole batch is
+    process, *rest = chain
+    if not rest:
+        return process
+    process_rest = _chain_processes(rest)
+
+    async def _process(events: list[CollectedEvent]) -> AsyncIterator[CollectedEvent]:
+        async for processed_batch in _rebatch(process(events)):
+            async for chained_event in process_rest(processed_batch):
+                yield chained_event
+
+    return _process
+
+
+async def _process_in_executor(
+    executor: ProcessPoolPluginExecutor | ThreadPoolPluginExecutor[ProcessConfigBase],
+    events: list[CollectedEvent],
+) -> AsyncIterator[CollectedEvent]:
+    # The executors hand back all of the processed events at once
+    for processed_event in await executor.process_batch(events):
+        yield processed_event
+
+
+async def _rebatch(events: AsyncIterable[CollectedEvent]) -> AsyncIterator[list[CollectedEvent]]:
+    # Keep generating the events while the previous batch is being handled, and hand
+    # over, as a single batch, all of the events generated in the meantime. The events
+    # still move along as soon as they're generated, but, unless they're generated apart
+    # from each other, they move along in batches, not one at a time.
+    queue: asyncio.Queue[tuple[CollectedEvent | None, BaseException | None]] = asyncio.Queue()
+
+    async def _run() -> None:
+        try:
+            async for event in events:
+                queue.put_nowait((event, None))
+        except Exception as exc:  # noqa: BLE001
+            queue.put_nowait((None, exc))
+        else:
+            queue.put_nowait((None, None))
+
+    task = asyncio.ensure_future(_run())
+    try:
+        while True:
+            batch: list[CollectedEvent] = []
+            event, exc = await queue.get()
+            while event is not None:
+                batch.append(event)
+                if queue.empty():
+                    break
+                event, exc = queue.get_nowait()
+            if batch:
+                yield batch
+            if exc is not None:
+                raise exc
+            if event is None:
+                break
+    finally:
+        task.cancel()
+
+
+async def _iter_stream(events: aiostream.Stream[CollectedEvent]) -> AsyncIterator[CollectedEvent]:
+    async with events.stream() as streamer:
+        async for event in streamer:
+            yield event
+
+
+async def _process_ahead(
+    func: ProcessStreamFunc, events: list[CollectedEvent]
+) -> AsyncIterator[CollectedEvent]:
+    # Keep processing the events while the events of previous batches are still being
+    # waited for, to keep the order of the batches without holding back their processing
+    async for processed_batch in _rebatch(func(events)):
+        for processed_event in processed_batch:
+            yield processed_event
+
+
+def _instrument_process(func: ProcessStreamFunc, stats: StageStats) -> ProcessStreamFunc:
+    async def _process(events: list[CollectedEvent]) -> AsyncIterator[CollectedEvent]:
+        processed = 0
+        # Only the time spent in the processor, not the time the processed events
+        # spend downstream
+        duration = 0.0
+        start = time.perf_counter()
+        try:
+            async for processed_event in func(events):
+                duration += time.perf_counter() - start
+                processed += 1
+                yield processed_event
+                start = time.perf_counter()
+        except Exception:
+            stats.errors += 1
+            raise
+        stats.record(len(events), processed, duration + time.perf_counter() - start)
+
+    return _process
+
+
+async def _instrument_collect(
+    events: AsyncGenerator[CollectedEvent, None], stats: StageStats
+) -> AsyncIterator[CollectedEvent]:
+    try:
+        start = time.perf_counter()
+        async for event in events:
+            # The time it took the collector to produce the event
+            stats.record(0, 1, time.perf_counter() - start)
+            yield event
+            start = time.perf_counter()
+    except Exception:
+        stats.errors += 1
+        raise
+    finally:
+        await events.aclose()
+
+
 P = TypeVar("P", bound="Pipeline")
 
 
@@ -66,12 +253,45 @@ class Pipeline:
         self.collect_ctxs: dict[str, PipelineRunContext[CollectConfigBase]] = {}
         self.process_ctxs: dict[str, PipelineRunContext[ProcessConfigBase]] = {}
         self.forward_ctxs: dict[str, PipelineRunContext[ForwardConfigBase]] = {}
+        self.collect_executors: dict[str, ThreadPoolPluginExecutor[CollectConfigBase]] = {}
+        self.process_executors: dict[
+            str, ProcessPoolPluginExecutor | ThreadPoolPluginExecutor[ProcessConfigBase]
+        ] = {}
+        self.forward_executors: dict[str, ThreadPoolPluginExecutor[ForwardConfigBase]] = {}
+        # The processors chain, compiled by ``_build_contexts``
+        self.process_steps: list[ProcessStep] = []
+        # The forwarders, compiled by ``_build_contexts``
+        self.forward_targets: list[ForwardTarget] = []
+        # The buffers between the pipeline stages, keyed by the stage they feed
+        self.buffers: dict[str, EventBuffer[CollectedEvent]] = {}
+        # The statistics of each plugin, keyed by stage and plugin configuration name.
+        # They are kept across pipeline restarts.
+        self.stats: dict[str, dict[str, StageStats]] = {
+            "collect": {
+                collect_config.name: StageStats() for collect_config in self.collect_configs
+            },
+            "process": {
+                process_config.name: StageStats() for process_config in self.process_configs
+            },
+            "forward": {
+                forward_config.name: StageStats() for forward_config in self.forward_configs
+            },
+        }
+        # How old the events are when they reach the forward stage
+        self.lag = LatencyHistogram()
+        # When, in ``time.monotonic()`` seconds, the pipeline first started running
+        self.started_at: float | None = None
+        # How to acknowledge the processed events, keyed by their ``id``, along with the
+        # events themselves, which keeps their ``id`` from being reused
+        self._acknowledges: dict[int, tuple[CollectedEvent, Callable[[], None]]] = {}
 
     async def run(self: P) -> None:
         """
         Run the pipeline.
         """
         log.info("Pipeline %r started", self.name)
+        if self.started_at is None:
+            self.started_at = time.monotonic()
         while True:
             try:
                 await self._run()
@@ -102,12 +322,151 @@ class Pipeline:
     )
     async def _run(self: P) -> None:
         self._build_contexts()
-        async for event in self._collectors_stream():
-            if self.process_configs:
-                async for processed_event in self._pipe_process_events(event):
-                    await self._forward_event(processed_event)
+        # What was still on its way through the pipeline is never acknowledged
+        self._acknowledges.clear()
+        # The pipeline is split into stages, collect, process and forward, which run
+        # concurrently and pass events along through bounded buffers
+        self.buffers.clear()
+        forward_buffer = self._build_buffer("forward", self.config.buffers.forward)
+        stages = [self._forward_stage(forward_buffer)]
+        if self.process_configs:
+            process_buffer = self._build_buffer("process", self.config.buffers.process)
+            stages.append(self._process_stage(process_buffer, forward_buffer))
+            stages.append(self._collect_stage(process_buffer))
+        else:
+            stages.append(self._collect_stage(forward_buffer))
+        await self._run_stages(*stages)
+
+    def _build_buffer(
+        self: P, name: str, buffer_config: PipelineBufferConfig
+    ) -> EventBuffer[CollectedEvent]:
+        buffer: EventBuffer[CollectedEvent] = EventBuffer(
+            buffer_config.size,
+            overflow_policy=buffer_config.overflow_policy or self.config.overflow_policy,
+            sample_rate=buffer_config.sample_rate or self.config.sample_rate,
+            # Dropped on purpose, the events are done with
+            on_drop=self._acknowledge,
+        )
+        self.buffers[name] = buffer
+        return buffer
+
+    async def _run_stages(self: P, *stages: Coroutine[Any, Any, None]) -> None:
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                # Re-raise any stage exception
+                task.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _collect_stage(self: P, destination: EventBuffer[CollectedEvent]) -> None:
+        try:
+            async for event in self._collectors_stream():
+                # If the buffer is full, this waits, which stops pulling events from the collectors
+                await destination.put(event)
+        finally:
+            destination.close()
+
+    async def _process_stage(
+        self: P, source: EventBuffer[CollectedEvent], destination: EventBuffer[CollectedEvent]
+    ) -> None:
+        try:
+            if len(self.process_steps) == 1 and self.process_steps[0].task_limit == 1:
+                # Nothing to run concurrently, skip the stream machinery
+                process = self.process_steps[0].process
+                async for batch in self._iter_batches(source):
+                    async for processed_event in process(batch):
+                        await destination.put(processed_event)
+                    # Allow other coroutines to run
+                    await asyncio.sleep(0)
+                return
+            # Each step is part of a single stream of events. Each step processes up to
+            # ``task_limit`` batches at the same time. The first step gets the collected
+            # batches, the following ones get the events processed by the previous step,
+            # batched as they come.
+            batches = aiostream.stream.iterate(self._iter_batches(source))
+            events: aiostream.Stream[CollectedEvent] | None = None
+            for step in self.process_steps:
+                if events is not None:
+                    batches = aiostream.stream.iterate(_rebatch(_iter_stream(events)))
+                if step.ordered:
+                    events = aiostream.stream.concatmap(
+                        batches, partial(_process_ahead, step.process), task_limit=step.task_limit
+                    )
+                else:
+                    events = aiostream.stream.flatmap(
+                        batches,
+                        step.process,  # type: ignore[arg-type]
+                        task_limit=step.task_limit,
+                    )
+            if TYPE_CHECKING:
+                assert events is not None
+            async with events.stream() as stream:
+                async for processed_event in stream:
+                    await destination.put(processed_event)
+        finally:
+            destination.close()
+
+    async def _forward_stage(self: P, source: EventBuffer[CollectedEvent]) -> None:
+        async for batch in self._iter_batches(source):
+            timestamp = batch[0].timestamp
+            if timestamp is not None and timestamp.tzinfo is not None:
+                # The oldest event of the batch is the first one
+                self.lag.record((dt.utcnow() - timestamp).total_seconds())
+            if self.config.batch_size > 1:
+                forwarded = await self._forward_batch(batch)
             else:
-                await self._forward_event(event)
+                forwarded = await self._forward_event(batch[0])
+            if not forwarded:
+                # Not acknowledged, the events are collected again once the pipeline restarts
+                continue
+            for event in batch:
+                self._acknowledge(event)
+
+    def _pop_acknowledge(self: P, event: CollectedEvent) -> Callable[[], None]:
+        entry = self._acknowledges.pop(id(event), None)
+        if entry is None:
+            # Not processed, it's the collected event itself
+            return event.forwarded
+        return entry[1]
+
+    def _acknowledge(self: P, event: CollectedEvent) -> None:
+        """
+        Let the collector know the pipeline is done with the event, or with what it became.
+        """
+        self._pop_acknowledge(event)()
+
+    def _track_acknowledges(self: P, func: ProcessStreamFunc) -> ProcessStreamFunc:
+        # The events returned by the processors are acknowledged in place of the events
+        # they were given
+        async def _process(events: list[CollectedEvent]) -> AsyncIterator[CollectedEvent]:
+            acknowledgement = _Acknowledgement([self._pop_acknowledge(event) for event in events])
+            async for processed_event in func(events):
+                if id(processed_event) not in self._acknowledges:
+                    acknowledgement.hold()
+                    self._acknowledges[id(processed_event)] = (
+                        processed_event,
+                        acknowledgement.release,
+                    )
+                yield processed_event
+            # Unless the processor failed, in which case nothing is acknowledged
+            acknowledgement.release()
+
+        return _process
+
+    async def _iter_batches(
+        self: P, source: EventBuffer[CollectedEvent]
+    ) -> AsyncIterator[list[CollectedEvent]]:
+        while True:
+            batch = await source.get_batch(self.config.batch_size, self.config.batch_timeout)
+            if not batch:
+                # The source buffer is closed and drained
+                break
+            yield batch
 
     def _build_contexts(self: P) -> None:
         for collect_config in self.collect_configs:
@@ -116,99 +475,268 @@ class Pipeline:
                     config=collect_config,
                     shared_cache=self.shared_cache,
                 )
+            if (
+                collect_config.executor == PluginExecutor.THREAD
+                and collect_config.name not in self.collect_executors
+            ):
+                self.collect_executors[collect_config.name] = ThreadPoolPluginExecutor(
+                    self.collect_ctxs[collect_config.name]
+                )
         for process_config in self.process_configs:
             if process_config.name not in self.process_ctxs:
                 self.process_ctxs[process_config.name] = PipelineRunContext.model_construct(
                     config=process_config,
                     shared_cache=self.shared_cache,
                 )
+            if process_config.executor is None or process_config.name in self.process_executors:
+                continue
+            if process_config.executor == PluginExecutor.PROCESS:
+                self.process_executors[process_config.name] = ProcessPoolPluginExecutor(
+                    process_config
+                )
+            else:
+                self.process_executors[process_config.name] = ThreadPoolPluginExecutor(
+                    self.process_ctxs[process_config.name]
+                )
+        self.process_steps = self._compile_process_steps()
         for forward_config in self.forward_configs:
             if forward_config.name not in self.forward_ctxs:
                 self.forward_ctxs[forward_config.name] = PipelineRunContext.model_construct(
                     config=forward_config,
                     shared_cache=self.shared_cache,
                 )
+            if (
+                forward_config.executor == PluginExecutor.THREAD
+                and forward_config.name not in self.forward_executors
+            ):
+                self.forward_executors[forward_config.name] = ThreadPoolPluginExecutor(
+                    self.forward_ctxs[forward_config.name]
+                )
+        self.forward_targets = self._compile_forward_targets()
 
     async def _collectors_stream(self: P) -> AsyncIterator[CollectedEvent]:
         collectors = []
         for collect_config in self.collect_configs:
-            collect_plugin = collect_config.loaded_plugin
-            collectors.append(
-                collect_plugin.collect(
+            executor = self.collect_executors.get(collect_config.name)
+            if executor is not None:
+                events = executor.collect()
+            else:
+                events = collect_config.loaded_plugin.collect(
                     ctx=self.collect_ctxs[collect_config.name],
-                ),
+                )
+            collectors.append(
+                _instrument_collect(events, self.stats["collect"][collect_config.name])
             )
         combined = aiostream.stream.merge(*collectors)
         async with combined.stream() as stream:
             async for event in stream:
                 yield event
 
-    async def _pipe_process_event(
-        self: P,
-        process_config: ProcessConfigBase,
-        event: CollectedEvent,
-    ) -> AsyncIterator[CollectedEvent]:
-        process_plugin = process_config.loaded_plugin
-        async for processed_event in process_plugin.process(
-            ctx=self.process_ctxs[process_config.name], event=event
-        ):
-            # Allow other coroutines to run
-            await asyncio.sleep(0)
-            if processed_event is not None:
-                yield processed_event
+    def _compile_process_steps(self: P) -> list[ProcessStep]:
+        # Resolve the plugins, contexts and executors once, instead of once per batch,
+        # and chain consecutive processors, which process a batch at a time, into a single
+        # step, so that passing a batch through them is just a few function calls.
+        # The processed events are streamed, only the executors hand them back at once.
+        steps: list[ProcessStep] = []
+        chain: list[ProcessStreamFunc] = []
+        for process_config in self.process_configs:
+            func: ProcessStreamFunc
+            task_limit = process_config.concurrency
+            executor = self.process_executors.get(process_config.name)
+            if executor is not None:
+                func = partial(_process_in_executor, executor)
+                if "concurrency" not in process_config.model_fields_set:
+                    # Unless told otherwise, keep all of the executor workers busy
+                    task_limit = executor.workers
+            else:
+                func = partial(
+                    process_events,
+                    process_config.loaded_plugin,
+                    self.process_ctxs[process_config.name],
+                )
+            func = _instrument_process(func, self.stats["process"][process_config.name])
+            if task_limit == 1:
+                chain.append(func)
+                continue
+            if chain:
+                steps.append(ProcessStep(_chain_processes(chain), task_limit=1, ordered=True))
+                chain = []
+            steps.append(ProcessStep(func, task_limit, process_config.ordered))
+        if chain:
+            steps.append(ProcessStep(_chain_processes(chain), task_limit=1, ordered=True))
+        return [step._replace(process=self._track_acknowledges(step.process)) for step in steps]
 
-    async def _pipe_process_events(self: P, event: CollectedEvent) -> AsyncIterator[CollectedEvent]:
-        process_configs = list(self.process_configs)
-        process_config = process_configs.pop(0)
-        process = aiostream.stream.chain(self._pipe_process_event(process_config, event))
-        for process_config in process_configs:
-            process |= aiostream.pipe.flatmap(partial(self._pipe_process_event, process_config))
-        if TYPE_CHECKING:
-            assert process
-        async with process.stream() as stream:
-            async for processed_event in stream:
-                # Allow other coroutines to run
-                await asyncio.sleep(0)
-                if processed_event is not None:
-                    yield processed_event
+    def _compile_forward_targets(self: P) -> list[ForwardTarget]:
+        # The forwarders which don't modify the events share the same instances. The ones
+        # which do, get their own copies, except one of them, which gets the original
+        # events if there are no forwarders to share them with.
+        read_only = [forward_config.is_read_only for forward_config in self.forward_configs]
+        owner = None
+        if not any(read_only):
+            owner = len(self.forward_configs) - 1
+        targets: list[ForwardTarget] = []
+        for idx, forward_config in enumerate(self.forward_configs):
+            targets.append(
+                ForwardTarget(
+                    forward_config.loaded_plugin,
+                    self.forward_ctxs[forward_config.name],
+                    copy_events=not read_only[idx] and idx != owner,
+                )
+            )
+        return targets
 
-    async def _forward_event(self: P, event: CollectedEvent) -> None:
-        # Forward the event
+    async def _forward_event(self: P, event: CollectedEvent) -> bool:
+        # Forward the event, returning whether all of the forwarders did
         coros = []
-        for forward_config in self.forward_configs:
-            forward_plugin = forward_config.loaded_plugin
+        for target in self.forward_targets:
             coros.append(
                 self._wrap_forwarder_plugin_call(
-                    forward_plugin,
-                    self.forward_ctxs[forward_config.name],
-                    # We pass a copy of the event so that any forwarder get's the
-                    # same event and is free to modify it at will
-                    event.model_copy(),
+                    target.plugin,
+                    target.ctx,
+                    # Forwarders which modify the event get a copy of it so that any
+                    # forwarder get's the same event
+                    event.model_copy() if target.copy_events else event,
                 ),
             )
-        await asyncio.gather(*coros)
+        return all(await asyncio.gather(*coros))
 
     async def _wrap_forwarder_plugin_call(
         self: P,
         plugin: ModuleType,
         ctx: PipelineRunContext[ForwardConfigBase],
         event: CollectedEvent,
-    ) -> None:
+    ) -> bool:
+        stats = self.stats["forward"][ctx.config.name]
+        start = time.perf_counter()
         try:
-            # Allow other coroutines to run
-            await asyncio.sleep(0)
-            await plugin.forward(ctx=ctx, event=event)
+            executor = self.forward_executors.get(ctx.config.name)
+            if executor is not None:
+                await executor.forward(event)
+            else:
+                # Allow other coroutines to run
+                await asyncio.sleep(0)
+                await plugin.forward(ctx=ctx, event=event)
+            stats.record(1, 1, time.perf_counter() - start)
         except Exception:
+            stats.errors += 1
             log.exception(
                 "An exception occurred while forwarding the event through config %r",
                 ctx.config,
             )
+            return False
+        return True
+
+    async def _forward_batch(self: P, events: list[CollectedEvent]) -> bool:
+        # Forward the batch of events, returning whether all of the forwarders did
+        coros = []
+        for target in self.forward_targets:
+            coros.append(
+                self._wrap_forwarder_plugin_batch_call(
+                    target.plugin,
+                    target.ctx,
+                    # Forwarders which modify the events get copies of them so that any
+                    # forwarder get's the same events
+                    [event.model_copy() for event in events] if target.copy_events else events,
+                ),
+            )
+        return all(await asyncio.gather(*coros))
+
+    async def _wrap_forwarder_plugin_batch_call(
+        self: P,
+        plugin: ModuleType,
+        ctx: PipelineRunContext[ForwardConfigBase],
+        events: list[CollectedEvent],
+    ) -> bool:
+        if not hasattr(plugin, "forward_batch"):
+            # The plugin does not support batches, forward one event at a time
+            forwarded = True
+            for event in events:
+                if not await self._wrap_forwarder_plugin_call(plugin, ctx, event):
+                    forwarded = False
+            return forwarded
+        stats = self.stats["forward"][ctx.config.name]
+        start = time.perf_counter()
+        try:
+            executor = self.forward_executors.get(ctx.config.name)
+            if executor is not None:
+                await executor.forward_batch(events)
+            else:
+                # Allow other coroutines to run
+                await asyncio.sleep(0)
+                await plugin.forward_batch(ctx=ctx, events=events)
+            stats.record(len(events), len(events), time.perf_counter() - start)
+        except Exception:
+            stats.errors += 1
+            log.exception(
+                "An exception occurred while forwarding a batch of events through config %r",
+                ctx.config,
+            )
+            return False
+        return True
+
+    def get_stats(self: P) -> dict[str, Any]:
+        """
+        Return the pipeline statistics.
+
+        For each plugin, in each stage, the number of events in and out, the number of errors,
+        and a summary of the time, in seconds, spent in each call to the plugin. Processors
+        and forwarders are called once per batch of events. While the pipeline runs, the
+        plugins running on an executor also include the executor statistics, see
+        :py:meth:`saf.executors.ThreadPoolPluginExecutor.get_stats`. For each buffer between
+        stages, the number of events waiting in it, and the number of events dropped.
+
+        For the whole pipeline, the seconds since it first started running, the number of
+        collected events per second since then, and a summary of how old, in seconds, the
+        events are when they reach the forward stage.
+        """
+        uptime = 0.0
+        if self.started_at is not None:
+            uptime = time.monotonic() - self.started_at
+        collected = sum(
+            collect_stats.events_out for collect_stats in self.stats["collect"].values()
+        )
+        stats: dict[str, Any] = {
+            "uptime": uptime,
+            "throughput": collected / uptime if uptime else 0.0,
+            "lag": self.lag.to_dict(),
+        }
+        for stage, stage_stats in self.stats.items():
+            stats[stage] = {
+                name: plugin_stats.to_dict() for name, plugin_stats in stage_stats.items()
+            }
+        executors: dict[
+            str, dict[str, ProcessPoolPluginExecutor | ThreadPoolPluginExecutor[Any]]
+        ] = {
+            "collect": dict(self.collect_executors),
+            "process": dict(self.process_executors),
+            "forward": dict(self.forward_executors),
+        }
+        for stage, stage_executors in executors.items():
+            for name, executor in stage_executors.items():
+                stats[stage][name]["executor"] = executor.get_stats()
+        stats["buffers"] = {
+            name: {"size": len(buffer), "maxsize": buffer.maxsize, "dropped": buffer.dropped}
+            for name, buffer in self.buffers.items()
+        }
+        return stats
 
     def _cleanup(self: P) -> None:
         self.shared_cache.clear()
         self.collect_ctxs.clear()
         self.process_ctxs.clear()
         self.forward_ctxs.clear()
+        self.process_steps.clear()
+        self.forward_targets.clear()
+        self.buffers.clear()
+        for collect_executor in self.collect_executors.values():
+            collect_executor.shutdown()
+        self.collect_executors.clear()
+        for process_executor in self.process_executors.values():
+            process_executor.shutdown()
+        self.process_executors.clear()
+        for forward_executor in self.forward_executors.values():
+            forward_executor.shutdown()
+        self.forward_executors.clear()
 
     def __enter__(self: P) -> P:
         """
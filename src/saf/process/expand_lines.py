@@ -0,0 +1,47 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Expand the batched lines events, generated by the file collect plugin, into an event per line.
+
+Any other event is passed along untouched.
+"""
+from __future__ import annotations
+
+import logging
+from typing import AsyncIterator
+from typing import Type
+
+from saf.collect.file import CollectedLinesEvent
+from saf.models import CollectedEvent
+from saf.models import PipelineRunContext
+from saf.models import ProcessConfigBase
+
+log = logging.getLogger(__name__)
+
+
+class ExpandLinesConfig(ProcessConfigBase):
+    """
+    Configuration schema for the expand_lines process plugin.
+    """
+
+
+def get_config_schema() -> Type[ExpandLinesConfig]:
+    """
+    Get the expand_lines process plugin configuration schema.
+    """
+    return ExpandLinesConfig
+
+
+async def process(
+    *,
+    ctx: PipelineRunContext[ExpandLinesConfig],  # noqa: ARG001
+    event: CollectedEvent,
+) -> AsyncIterator[CollectedEvent]:
+    """
+    Method called to process events.
+    """
+    if isinstance(event, CollectedLinesEvent):
+        for line_event in event.expand():
+            yield line_event
+    else:
+        yield event
@@ -20,6 +20,7 @@ from pydantic import Field
 from saf.models import CollectedEvent
 from saf.models import PipelineRunContext
 from saf.models import ProcessConfigBase
+from saf.models import TrustedCollectedEvent
 
 log = logging.getLogger(__name__)
 
@@ -94,7 +95,7 @@ async def process(
                 )
             event_data = dict(**event.data)
             event_data[f"{config.name}-child-count"] = counter
-            yield CollectedEvent(data=event_data)
+            yield TrustedCollectedEvent(data=event_data)
             counter += 1
         log.info(
             "Finished generating %d events for processor config named %r",
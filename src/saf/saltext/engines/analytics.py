@@ -18,6 +18,7 @@ from salt.utils import yaml
 
 from saf.manager import Manager
 from saf.models import AnalyticsConfig
+from saf.utils import ipc
 
 if TYPE_CHECKING:
     __salt__: dict[str, Callable[..., Any]]
@@ -70,8 +71,23 @@ def start() -> None:
     config = AnalyticsConfig.model_validate(get_config_dict())
     manager = Manager(config)
     aiorun.run(
-        manager.run(),
+        _run(manager),
         loop=loop,
         stop_on_unhandled_errors=True,
         shutdown_callback=manager.await_stopped(),
     )
+
+
+async def _run(manager: Manager) -> None:
+    # Allow the analytics execution module and runner to query the manager
+    server = None
+    if ipc.HAS_UNIX_SOCKETS:
+        server = ipc.ManagerIPCServer(
+            manager, ipc.get_socket_path(__opts__)  # pylint: disable=undefined-variable
+        )
+        await server.start()
+    try:
+        await manager.run()
+    finally:
+        if server is not None:
+            await server.stop()
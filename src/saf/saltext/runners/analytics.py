@@ -0,0 +1,57 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+"""
+Salt runner to query the salt analytics engine running on the master.
+"""
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+from typing import Any
+
+from salt.exceptions import SaltRunnerError
+
+from saf.utils import ipc
+
+if TYPE_CHECKING:
+    __opts__: dict[str, Any]
+
+log = logging.getLogger(__name__)
+
+
+__virtualname__ = "analytics"
+
+
+def __virtual__() -> str | tuple[bool, str]:
+    """
+    Return the module name, or ``(False, "Failure reason")`` to load, or not, the runner.
+    """
+    if not ipc.HAS_UNIX_SOCKETS:
+        return False, "The analytics runner requires unix sockets"
+    return __virtualname__
+
+
+def stats(pipeline: str | None = None) -> dict[str, Any]:
+    """
+    Return the statistics of the pipelines run by the master's analytics engine.
+
+    For each pipeline, whether it's running, the number of collected events per second,
+    how old the events are when they reach the forward stage, the number of events waiting
+    in the buffers between stages, and, for each plugin, the number of events in and out,
+    the number of errors and the time spent in it.
+
+    pipeline
+        Only return the statistics of this pipeline.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt-run analytics.stats
+        salt-run analytics.stats pipeline=my-pipeline
+    """
+    try:
+        return ipc.get_stats(__opts__, pipeline)  # pylint: disable=undefined-variable
+    except ipc.IPCError as exc:
+        raise SaltRunnerError(str(exc)) from exc
@@ -0,0 +1,27 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Asyncio helpers.
+"""
+from __future__ import annotations
+
+import asyncio
+
+
+async def wait_event(event: asyncio.Event, timeout: float | None = None) -> bool:
+    """
+    Wait until ``event`` is set, at most ``timeout`` seconds.
+
+    Return ``False`` if the timeout was reached.
+
+    Before Python 3.12, ``asyncio.wait_for`` loses a cancellation which arrives as the timeout
+    expires, and the cancelled task would keep on waiting, this never does.
+    """
+    if event.is_set():
+        return True
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        done, _ = await asyncio.wait({waiter}, timeout=timeout)
+    finally:
+        waiter.cancel()
+    return bool(done)
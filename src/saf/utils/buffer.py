@@ -0,0 +1,195 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Bounded buffer used to pass events between the pipeline stages.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections
+import enum
+import logging
+import random
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Generic
+from typing import TypeVar
+
+from saf.utils.aio import wait_event
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+EB = TypeVar("EB", bound="EventBuffer[Any]")
+
+
+class OverflowPolicy(enum.Enum):
+    """
+    What to do with new items when the buffer is full.
+    """
+
+    # Wait for a free slot in the buffer
+    BLOCK = "block"
+    # Drop the oldest item in the buffer to make room for the new one
+    DROP_OLDEST = "drop_oldest"
+    # Drop the new item
+    DROP_NEWEST = "drop_newest"
+    # Once the buffer is half full, only accept new items with a ``sample_rate``
+    # probability. New items are dropped while the buffer is full.
+    SAMPLE = "sample"
+
+
+class EventBuffer(Generic[T]):
+    """
+    Bounded, closable, asyncio buffer.
+
+    What happens on :py:meth:`put` while the buffer is full depends on the ``overflow_policy``.
+    By default, producers wait for a free slot. Once the producing side is done it calls
+    :py:meth:`close`, and consumers keep getting items until the buffer is drained.
+    """
+
+    def __init__(
+        self: EB,
+        maxsize: int,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        sample_rate: float = 1.0,
+        on_drop: Callable[[T], None] | None = None,
+    ) -> None:
+        if maxsize < 1:
+            msg = "The buffer 'maxsize' must be greater than 0"
+            raise ValueError(msg)
+        if not 0 < sample_rate <= 1:
+            msg = "The buffer 'sample_rate' must be greater than 0 and less or equal to 1"
+            raise ValueError(msg)
+        self.maxsize = maxsize
+        self.overflow_policy = overflow_policy
+        self.sample_rate = sample_rate
+        # Called with each item dropped because of the overflow policy
+        self.on_drop = on_drop
+        # The number of items dropped because of the overflow policy
+        self.dropped = 0
+        self._items: Deque[T] = collections.deque()
+        self._closed = False
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def __len__(self: EB) -> int:
+        """
+        Return the number of items in the buffer.
+        """
+        return len(self._items)
+
+    @property
+    def closed(self: EB) -> bool:
+        """
+        Return ``True`` if the buffer no longer accepts new items.
+        """
+        return self._closed
+
+    def full(self: EB) -> bool:
+        """
+        Return ``True`` if the buffer has ``maxsize`` items in it.
+        """
+        return len(self._items) >= self.maxsize
+
+    async def put(self: EB, item: T) -> None:
+        """
+        Put an item into the buffer, applying the overflow policy if the buffer is full.
+
+        Raises ``RuntimeError`` if the buffer is closed, including while waiting for a
+        free slot in it.
+        """
+        self._check_open()
+        if self.overflow_policy == OverflowPolicy.BLOCK:
+            while self.full():
+                self._not_full.clear()
+                await self._not_full.wait()
+                self._check_open()
+        elif self.full():
+            if self.overflow_policy == OverflowPolicy.DROP_OLDEST:
+                self._drop(self._items.popleft())
+            else:
+                self._drop(item)
+                return
+        elif (
+            self.overflow_policy == OverflowPolicy.SAMPLE
+            and len(self._items) * 2 >= self.maxsize
+            and random.random() >= self.sample_rate  # noqa: S311
+        ):
+            self._drop(item)
+            return
+        self._append(item)
+
+    def _drop(self: EB, item: T) -> None:
+        if not self.dropped:
+            log.warning(
+                "Buffer is full, dropping events according to the %r overflow policy",
+                self.overflow_policy.value,
+            )
+        self.dropped += 1
+        if self.on_drop is not None:
+            self.on_drop(item)
+
+    def _check_open(self: EB) -> None:
+        if self._closed:
+            msg = "Cannot put items into a closed buffer"
+            raise RuntimeError(msg)
+
+    def _append(self: EB, item: T) -> None:
+        self._items.append(item)
+        self._not_empty.set()
+
+    def _popleft(self: EB) -> T:
+        item: T = self._items.popleft()
+        self._not_full.set()
+        return item
+
+    def close(self: EB) -> None:
+        """
+        Close the buffer.
+
+        No more items can be added to it, but the remaining items can still be consumed.
+        Producers waiting for a free slot in the buffer get a ``RuntimeError``.
+        """
+        self._closed = True
+        # Wake up any consumer waiting for items, and any producer waiting for a free slot
+        self._not_empty.set()
+        self._not_full.set()
+
+    async def get_batch(self: EB, max_items: int = 1, timeout: float | None = None) -> list[T]:
+        """
+        Get up to ``max_items`` items from the buffer.
+
+        Waits for, at least, one item to be available. After that, waits at most ``timeout``
+        seconds for the remaining items. An empty list is returned when the buffer
+        is closed and drained.
+        """
+        while not self._items:
+            if self._closed:
+                return []
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        batch = [self._popleft()]
+        if max_items == 1:
+            return batch
+        loop = asyncio.get_event_loop()
+        deadline = None
+        if timeout is not None:
+            deadline = loop.time() + timeout
+        while len(batch) < max_items:
+            if self._items:
+                batch.append(self._popleft())
+                continue
+            if self._closed:
+                break
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+            self._not_empty.clear()
+            if not await wait_event(self._not_empty, remaining):
+                break
+        return batch
@@ -0,0 +1,215 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Persistent read offsets of files, to resume reading them where it was left off.
+
+The offsets are keyed by the file's device and inode, which, unlike the file path, don't
+change when a file is rotated.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+from typing import Any
+from typing import Dict
+from typing import Tuple
+from typing import TypeVar
+
+from saf.utils.aio import wait_event
+
+log = logging.getLogger(__name__)
+
+OC = TypeVar("OC", bound="OffsetCheckpoints")
+
+FileKey = Tuple[int, int]
+
+
+def get_file_key(stat: os.stat_result) -> FileKey:
+    """
+    Return the key, device and inode, of the file with the given stat results.
+    """
+    return stat.st_dev, stat.st_ino
+
+
+def _fsync_directory(path: pathlib.Path) -> None:
+    """
+    Persist the entries of a directory, for example, a file just renamed into it.
+    """
+    if sys.platform.startswith("win"):
+        # Directories can't be opened, nor synced, on Windows
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class OffsetCheckpoints:
+    """
+    Read offsets, persisted atomically every ``save_lines`` lines or ``save_interval`` seconds.
+
+    The writes are serialized, and a snapshot of the offsets is never written over a more
+    recent one, whether written by :meth:`run` or :meth:`save`.
+    """
+
+    def __init__(self: OC, path: pathlib.Path, save_lines: int, save_interval: float) -> None:
+        self.path = path
+        self.save_lines = save_lines
+        self.save_interval = save_interval
+        self.offsets: Dict[FileKey, Dict[str, Any]] = {}
+        self._unsaved_lines = 0
+        self._dirty = False
+        self._save_now = asyncio.Event()
+        self._last_save = time.monotonic()
+        # Held while writing, the snapshots are written from the default executor too
+        self._write_lock = threading.Lock()
+        # The number of snapshots taken, and the number of the last one written
+        self._snapshots = 0
+        self._written = 0
+
+    def load(self: OC) -> None:
+        """
+        Load the persisted offsets, if any.
+
+        Offsets of files which no longer exist, at the path they were read from, are dropped.
+        """
+        try:
+            entries = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return
+        except ValueError:
+            log.warning("Ignoring the corrupted file offsets checkpoint %s", self.path)
+            return
+        for entry in entries:
+            key = (entry["dev"], entry["ino"])
+            try:
+                stat = pathlib.Path(entry["path"]).stat()
+            except OSError:
+                continue
+            if get_file_key(stat) == key:
+                self.offsets[key] = {"path": entry["path"], "offset": entry["offset"]}
+
+    def get(self: OC, stat: os.stat_result) -> int | None:
+        """
+        Return the persisted offset of the file with the given stat results, if any.
+        """
+        entry = self.offsets.get(get_file_key(stat))
+        if entry is None:
+            return None
+        return int(entry["offset"])
+
+    def update(self: OC, key: FileKey, path: pathlib.Path, offset: int, lines: int) -> None:
+        """
+        Update the offset of a file, after reading ``lines`` lines from it.
+        """
+        self.offsets[key] = {"path": str(path), "offset": offset}
+        self._dirty = True
+        self._unsaved_lines += lines
+        if self._unsaved_lines >= self.save_lines:
+            self._save_now.set()
+
+    def advance(self: OC, key: FileKey, path: pathlib.Path, offset: int, lines: int) -> None:
+        """
+        Like :meth:`update`, unless the file offset is already past ``offset``.
+
+        For offsets reported as the events read up to them are delivered, which might be out
+        of order.
+        """
+        entry = self.offsets.get(key)
+        if entry is not None and entry["offset"] >= offset:
+            return
+        self.update(key, path, offset, lines)
+
+    def remove(self: OC, key: FileKey) -> None:
+        """
+        Stop tracking the offset of a file, for example, because it was rotated.
+        """
+        if self.offsets.pop(key, None) is not None:
+            self._dirty = True
+
+    def save(self: OC) -> None:
+        """
+        Atomically persist the offsets, if they changed.
+        """
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            self._write(*snapshot)
+
+    def _snapshot(self: OC) -> tuple[int, list[dict[str, Any]]] | None:
+        if not self._dirty:
+            return None
+        self._dirty = False
+        self._unsaved_lines = 0
+        self._last_save = time.monotonic()
+        self._snapshots += 1
+        return self._snapshots, [
+            {"dev": dev, "ino": ino, "path": entry["path"], "offset": entry["offset"]}
+            for (dev, ino), entry in self.offsets.items()
+        ]
+
+    def _write(self: OC, number: int, entries: list[dict[str, Any]]) -> None:
+        with self._write_lock:
+            if number < self._written:
+                # A more recent snapshot was already written
+                return
+            self._replace(entries)
+            self._written = number
+
+    def _replace(self: OC, entries: list[dict[str, Any]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file, on the same filesystem, and replace the checkpoint with
+        # it, so that the checkpoint is never left half written
+        fd, tmp_name = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.")
+        tmp_path = pathlib.Path(tmp_name)
+        try:
+            with os.fdopen(fd, "w") as wfh:
+                json.dump(entries, wfh)
+                wfh.flush()
+                os.fsync(wfh.fileno())
+            tmp_path.replace(self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                tmp_path.unlink()
+            raise
+        # Persist the rename too
+        _fsync_directory(self.path.parent)
+
+    async def run(self: OC) -> None:
+        """
+        Persist the offsets every ``save_interval`` seconds, or ``save_lines`` lines.
+
+        Runs until cancelled. When cancelled while writing, the write is waited for, so that
+        it can't complete after a later :meth:`save`.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            timeout = max(0.0, self._last_save + self.save_interval - time.monotonic())
+            await wait_event(self._save_now, timeout)
+            self._save_now.clear()
+            snapshot = self._snapshot()
+            if snapshot is None:
+                self._last_save = time.monotonic()
+                continue
+            # Written on a separate thread, the offsets keep being updated meanwhile
+            writing = loop.run_in_executor(None, self._write, *snapshot)
+            try:
+                await asyncio.shield(writing)
+            except asyncio.CancelledError:
+                try:
+                    await writing
+                except OSError:
+                    # Left for the final save
+                    self._dirty = True
+                raise
+            except OSError:
+                log.exception("Failed to save the file offsets checkpoint %s", self.path)
+                self._dirty = True
@@ -0,0 +1,139 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Minimal cron expressions support, to know when something is scheduled to run next.
+
+The expressions have five fields, ``minute hour day-of-month month day-of-week``, each being
+``*``, a value, a range, like ``1-5``, or a comma separated list of those, optionally with a
+step, like ``*/15``. Months and days of the week can also be given by their three letters
+English names, and ``@hourly``, ``@daily``, ``@weekly``, ``@monthly`` and ``@yearly`` can be
+used instead of the five fields.
+"""
+from __future__ import annotations
+
+import datetime
+from typing import Dict
+from typing import FrozenSet
+from typing import TypeVar
+
+CE = TypeVar("CE", bound="CronExpression")
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+_MONTHS = {
+    name: idx
+    for idx, name in enumerate(
+        ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"),
+        start=1,
+    )
+}
+_WEEKDAYS = {
+    name: idx for idx, name in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))
+}
+
+# minute, hour, day of month, month and day of week
+_FIELDS_COUNT = 5
+
+# How far to look for the next match, long enough to go through all leap years and weekdays
+_MAX_LOOKAHEAD = datetime.timedelta(days=366 * 28)
+
+
+def _parse_value(value: str, names: Dict[str, int]) -> int:
+    if value.lower() in names:
+        return names[value.lower()]
+    return int(value)
+
+
+def _parse_field(
+    field: str, name: str, low: int, high: int, names: Dict[str, int]
+) -> FrozenSet[int]:
+    values: set[int] = set()
+    for part in field.split(","):
+        value_range, _, step = part.partition("/")
+        try:
+            increment = int(step) if step else 1
+            if value_range == "*":
+                start, end = low, high
+            else:
+                first, _, last = value_range.partition("-")
+                start = _parse_value(first, names)
+                if last:
+                    end = _parse_value(last, names)
+                else:
+                    # ``5/15`` means from 5 until the end, every 15
+                    end = high if step else start
+        except ValueError:
+            msg = f"Invalid {name} {part!r} in cron expression"
+            raise ValueError(msg) from None
+        if increment < 1 or not low <= start <= end <= high:
+            msg = f"Invalid {name} {part!r} in cron expression"
+            raise ValueError(msg)
+        values.update(range(start, end + 1, increment))
+    return frozenset(values)
+
+
+class CronExpression:
+    """
+    A parsed cron expression.
+    """
+
+    def __init__(self: CE, expression: str) -> None:
+        self.expression = expression
+        fields = MACROS.get(expression.strip().lower(), expression).split()
+        if len(fields) != _FIELDS_COUNT:
+            msg = f"Invalid cron expression {expression!r}, it must have five fields"
+            raise ValueError(msg)
+        self.minutes = _parse_field(fields[0], "minute", 0, 59, {})
+        self.hours = _parse_field(fields[1], "hour", 0, 23, {})
+        self.days = _parse_field(fields[2], "day of month", 1, 31, {})
+        self.months = _parse_field(fields[3], "month", 1, 12, _MONTHS)
+        # Both 0 and 7 are Sunday
+        self.weekdays = frozenset(
+            day % 7 for day in _parse_field(fields[4], "day of week", 0, 7, _WEEKDAYS)
+        )
+        # Like cron does, when both the days of the month and the days of the week are
+        # restricted, matching either of them is enough
+        self.any_day = not fields[2].startswith("*") and not fields[4].startswith("*")
+
+    def __repr__(self: CE) -> str:
+        """
+        Return a printable representation of the cron expression.
+        """
+        return f"{self.__class__.__name__}({self.expression!r})"
+
+    def _day_matches(self: CE, when: datetime.datetime) -> bool:
+        day_matches = when.day in self.days
+        weekday_matches = when.isoweekday() % 7 in self.weekdays
+        if self.any_day:
+            return day_matches or weekday_matches
+        return day_matches and weekday_matches
+
+    def next_after(self: CE, after: datetime.datetime) -> datetime.datetime:
+        """
+        Return the first minute, after ``after``, matching the expression.
+        """
+        when = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = when + _MAX_LOOKAHEAD
+        while when < limit:
+            if when.month not in self.months:
+                # The first minute of the next month
+                when = when.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)
+                when = when.replace(day=1)
+            elif not self._day_matches(when):
+                when = when.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif when.hour not in self.hours:
+                when = when.replace(minute=0) + datetime.timedelta(hours=1)
+            elif when.minute not in self.minutes:
+                when += datetime.timedelta(minutes=1)
+            else:
+                return when
+        msg = f"The cron expression {self.expression!r} never matches"
+        raise ValueError(msg)
@@ -6,41 +6,61 @@ Wrapper functions around Salt's eventbus.
 from __future__ import annotations
 
 import asyncio
-import copy
+import contextlib
 import fnmatch
+import functools
+import hashlib
 import logging
-import queue
-from typing import TYPE_CHECKING
+import pathlib
+import re
+import socket
+import struct
+import threading
+from datetime import datetime
 from typing import Any
+from typing import AsyncGenerator
 from typing import AsyncIterator
+from typing import Callable
+from typing import Iterable
+from typing import Pattern
+from typing import Tuple
+from typing import TypeVar
 
+import salt.payload
+import salt.transport.frame
 import salt.utils.event
+import salt.utils.msgpack
 
+from saf.models import EventBusClient
 from saf.models import SaltEvent
 
-if TYPE_CHECKING:
-    from queue import Queue
-
 log = logging.getLogger(__name__)
 
 
-def _construct_event(event_data: dict[str, Any]) -> SaltEvent | None:
+def _construct_event(event_tag: str, event_data: dict[str, Any]) -> SaltEvent | None:
     """
     Construct a :py:class:`~saf.models.SaltEvent` from a salt event payload.
+
+    Nothing is copied, no matter how large the payload is. The event ``raw_data`` is the
+    payload, and the event ``data`` shares structure with it.
     """
     salt_event = None
     try:
-        event_raw_data = copy.deepcopy(event_data)
-        # Salt's event data has some "private" keys, for example, "_stamp".
-        # We'll just store a full_data attribute and clean up the regular data of these keys
-        for key in list(event_data):
-            if key.startswith("_"):
-                event_data.pop(key)
-        salt_event = SaltEvent(
-            tag=event_data["tag"],
-            stamp=event_raw_data["_stamp"],
-            data=event_data["data"],
-            raw_data=event_raw_data,
+        if "data" in event_data:
+            data = event_data["data"]
+        else:
+            # Salt's event data has some "private" keys, for example, "_stamp". Leave them out,
+            # without copying the values
+            data = {key: value for key, value in event_data.items() if not key.startswith("_")}
+        stamp = event_data["_stamp"]
+        if not isinstance(stamp, datetime):
+            stamp = SaltEvent._convert_stamp(stamp)  # noqa: SLF001
+        # The event bus payloads are trusted, skip the validation
+        salt_event = SaltEvent.model_construct(
+            tag=event_tag,
+            stamp=stamp,
+            data=data,
+            raw_data=event_data,
         )
         log.debug("Constructed SaltEvent: %s", salt_event)
     except Exception:
@@ -48,108 +68,434 @@ def _construct_event(event_data: dict[str, Any]) -> SaltEvent | None:
     return salt_event
 
 
-def _process_events(
-    opts: dict[str, Any],
-    events_queue: Queue[SaltEvent],
-    tags: set[str],
-) -> None:
+SUB = TypeVar("SUB", bound="_Subscriber")
+EBH = TypeVar("EBH", bound="EventBusHub")
+AEBH = TypeVar("AEBH", bound="AsyncEventBusHub")
+
+# How long, in seconds, the event bus listener waits for an event before checking if
+# it should stop. This only wakes up the listener thread, never the subscribers.
+GET_EVENT_WAIT = 1
+
+# How many event tags, and the subscribers matching them, each hub remembers
+TAG_CACHE_SIZE = 4096
+
+# How long, in seconds, the asyncio event bus client waits before reconnecting to
+# Salt's event publisher
+RECONNECT_WAIT = 1
+
+# How many bytes the asyncio event bus client reads from Salt's event publisher at once
+READ_SIZE = 65536
+
+# Separates the tag from the serialized data in Salt's event publisher messages
+TAGEND = salt.utils.event.TAGEND.encode()
+
+# Newer Salt releases prefix each message sent by the event publisher with its length, as
+# a 4 bytes big-endian integer, older ones send the bare messages
+IPC_LENGTH_PREFIX_SIZE = 4
+IPC_LENGTH_PREFIX = (
+    len(salt.transport.frame.frame_msg_ipc(b"", raw_body=True))
+    == len(salt.utils.msgpack.dumps({"head": {}, "body": b""}, use_bin_type=True))
+    + IPC_LENGTH_PREFIX_SIZE
+)
+
+# Unix sockets are not available on Windows
+HAS_UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+# The running event bus hubs, keyed by ``_get_hub_key``
+_HUBS: dict[tuple[Any, ...], EventBusHub] = {}
+_HUBS_LOCK = threading.Lock()
+
+
+def compile_tag_patterns(patterns: Iterable[str]) -> Pattern[str]:
     """
-    Collect events from Salt's event bus.
+    Compile shell-style tag patterns, as used by :py:func:`fnmatch.fnmatchcase`, into a regex.
 
-    This function is meant to run on a separate threads until Salt stops using tornado or
-    it's safe to use asyncio as the asynchronous loop.
+    Matching the regex is the same as matching any of the patterns.
     """
-    opts["file_client"] = "local"
-    with salt.utils.event.get_event(
-        opts["__role"],
-        sock_dir=opts["sock_dir"],
-        transport=opts["transport"],
-        opts=opts,
-        listen=True,
-    ) as eventbus:
-        for event in eventbus.iter_events(full=True, auto_reconnect=True):
-            if not event:
-                continue
-            event_tag = event["tag"]
-            event_data = event["data"]
-            if event_tag == "__beacons_return":
-                # Special case __beacons_return event since it's basically a container
-                # for all of the Salt's beacon events on each beacons collect iteration
-
-                for beacon_event_data in event_data["beacons"]:
-                    for tag in tags:
-                        try:
-                            if fnmatch.fnmatch(beacon_event_data["tag"], tag):
-                                if "_stamp" not in beacon_event_data:
-                                    # Wrapped beacon data usually lack the _stamp key/value pair. Use parent's.
-                                    beacon_event_data["_stamp"] = event_data["_stamp"]
-                                # Unwrap the nested data key/value pair if needed
-                                if "data" in beacon_event_data["data"]:
-                                    beacon_event_data["data"] = beacon_event_data["data"].pop(
-                                        "data"
-                                    )
-                                log.debug(
-                                    "Matching Beacon event; TAG: %r DATA: %r",
-                                    beacon_event_data["tag"],
-                                    beacon_event_data["data"],
-                                )
-                                salt_event = _construct_event(beacon_event_data)
-                                if salt_event:
-                                    events_queue.put_nowait(salt_event)
-                                # We found a matching tag, stop iterating tags
-                                break
-                        except Exception:
-                            log.exception(
-                                "Ran into an error while processing beacon events",
-                            )
-                # No additional processing required, process to next event from the event bus
-                continue
-
-            # Non special cased salt event tags
-            for tag in tags:
-                if fnmatch.fnmatch(event_tag, tag):
-                    log.debug("Matching event; TAG: %r DATA: %r", event_tag, event_data)
-                    salt_event = _construct_event(event_data)
-                    if salt_event:
-                        events_queue.put_nowait(salt_event)
-                    # We found a matching tag, stop iterating tags
-                    break
-
-
-async def _start_event_listener(
-    *,
+    translated = [fnmatch.translate(pattern) for pattern in sorted(patterns)]
+    if not translated:
+        # Never match
+        return re.compile("(?!)")
+    return re.compile("|".join(translated))
+
+
+class _Subscriber:
+    def __init__(self: SUB, tags: set[str], loop: asyncio.AbstractEventLoop) -> None:
+        self.tags = tags
+        self._tags_regex = compile_tag_patterns(tags)
+        self.loop = loop
+        # ``None`` is put into the queue when the event bus listener stops
+        self.queue: asyncio.Queue[SaltEvent | None] = asyncio.Queue()
+        self.error: BaseException | None = None
+
+    def matches(self: SUB, tag: str) -> bool:
+        return self._tags_regex.match(tag) is not None
+
+    def put(self: SUB, salt_event: SaltEvent | None) -> None:
+        # Called from the event bus listener thread, wakes up the subscriber's loop
+        # only when there's an event for it
+        with contextlib.suppress(RuntimeError):
+            # Unless the loop is closed
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, salt_event)
+
+
+class EventBusHub:
+    """
+    A single subscription to Salt's event bus, shared by all subscribers in the process.
+
+    Each event is received and deserialized once, and then passed along to the
+    subscribers listening to it's tag. The subscription is closed once the last subscriber
+    stops listening.
+    """
+
+    def __init__(self: EBH, opts: dict[str, Any], key: tuple[Any, ...]) -> None:
+        self.opts = dict(opts, file_client="local")
+        self.key = key
+        self.subscribers = ()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._process_events, name="saf-eventbus", daemon=True
+        )
+
+    @property
+    def subscribers(self: EBH) -> tuple[_Subscriber, ...]:
+        """
+        Return the hub's subscribers.
+        """
+        return self._subscribers
+
+    @subscribers.setter
+    def subscribers(self: EBH, subscribers: tuple[_Subscriber, ...]) -> None:
+        # Replaced, never modified, along with the tags index, so that the listener thread
+        # can use them without locks
+        self._subscribers = subscribers
+        self._get_subscribers = _build_tag_index(subscribers)
+
+    def start(self: EBH) -> None:
+        """
+        Start listening to Salt's event bus.
+        """
+        self._thread.start()
+
+    def stop(self: EBH) -> None:
+        """
+        Stop listening to Salt's event bus.
+
+        The listener thread stops within :py:data:`GET_EVENT_WAIT` seconds.
+        """
+        self._stop.set()
+
+    def _process_events(self: EBH) -> None:
+        """
+        Collect events from Salt's event bus.
+
+        This function is meant to run on a separate threads until Salt stops using tornado or
+        it's safe to use asyncio as the asynchronous loop.
+        """
+        error: BaseException | None = None
+        try:
+            with salt.utils.event.get_event(
+                self.opts["__role"],
+                sock_dir=self.opts["sock_dir"],
+                opts=self.opts,
+                listen=True,
+            ) as eventbus:
+                while not self._stop.is_set():
+                    event = eventbus.get_event(wait=GET_EVENT_WAIT, full=True, auto_reconnect=True)
+                    if event:
+                        self._dispatch(event["tag"], event["data"])
+        except Exception as exc:
+            log.exception("Ran into an error while listening to Salt's event bus")
+            error = exc
+        finally:
+            with _HUBS_LOCK:
+                # New subscribers get a new subscription
+                _remove_hub(self)
+            for subscriber in self.subscribers:
+                subscriber.error = error
+                subscriber.put(None)
+
+    def _dispatch(self: EBH, event_tag: str, event_data: dict[str, Any]) -> None:
+        if event_tag == "__beacons_return":
+            # Special case __beacons_return event since it's basically a container
+            # for all of the Salt's beacon events on each beacons collect iteration
+            for beacon_event_data in event_data["beacons"]:
+                try:
+                    subscribers = self._get_subscribers(beacon_event_data["tag"])
+                    if not subscribers:
+                        continue
+                    if "_stamp" not in beacon_event_data:
+                        # Wrapped beacon data usually lack the _stamp key/value pair. Use parent's.
+                        beacon_event_data["_stamp"] = event_data["_stamp"]
+                    # Unwrap the nested data key/value pair if needed
+                    if "data" in beacon_event_data["data"]:
+                        beacon_event_data["data"] = beacon_event_data["data"].pop("data")
+                    log.debug(
+                        "Matching Beacon event; TAG: %r DATA: %r",
+                        beacon_event_data["tag"],
+                        beacon_event_data["data"],
+                    )
+                    self._put(subscribers, beacon_event_data["tag"], beacon_event_data)
+                except Exception:
+                    log.exception(
+                        "Ran into an error while processing beacon events",
+                    )
+            # No additional processing required, process to next event from the event bus
+            return
+
+        # Non special cased salt event tags
+        subscribers = self._get_subscribers(event_tag)
+        if subscribers:
+            log.debug("Matching event; TAG: %r DATA: %r", event_tag, event_data)
+            self._put(subscribers, event_tag, event_data)
+
+    def _put(
+        self: EBH,
+        subscribers: tuple[_Subscriber, ...],
+        event_tag: str,
+        event_data: dict[str, Any],
+    ) -> None:
+        # The event is constructed once and shared by all subscribers, it's not mutable
+        salt_event = _construct_event(event_tag, event_data)
+        if salt_event is None:
+            return
+        for subscriber in subscribers:
+            self._deliver(subscriber, salt_event)
+
+    def _deliver(self: EBH, subscriber: _Subscriber, salt_event: SaltEvent) -> None:
+        subscriber.put(salt_event)
+
+
+class AsyncEventBusHub(EventBusHub):
+    """
+    A single subscription to Salt's event bus, read on the subscribers' event loop.
+
+    Instead of Salt's event bus client, running on a separate thread, Salt's event publisher
+    socket is read, and the events deserialized, directly on the event loop. Only the events
+    with subscribers are deserialized.
+    """
+
+    def __init__(
+        self: AEBH, opts: dict[str, Any], key: tuple[Any, ...], loop: asyncio.AbstractEventLoop
+    ) -> None:
+        super().__init__(opts, key)
+        self.loop = loop
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self: AEBH) -> None:
+        """
+        Start listening to Salt's event bus.
+        """
+        self._task = self.loop.create_task(self._process_events())
+
+    def stop(self: AEBH) -> None:
+        """
+        Stop listening to Salt's event bus.
+        """
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _process_events(self: AEBH) -> None:  # type: ignore[override]
+        """
+        Collect events from Salt's event publisher, reconnecting when the connection is lost.
+        """
+        error: BaseException | None = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    reader, writer = await _open_publisher_connection(self.opts)
+                except OSError as exc:
+                    log.debug("Failed to connect to Salt's event publisher: %s", exc)
+                    await asyncio.sleep(RECONNECT_WAIT)
+                    continue
+                try:
+                    await self._read_events(reader)
+                finally:
+                    writer.close()
+                log.debug("Salt's event publisher closed the connection")
+        except asyncio.CancelledError:
+            # Stopped
+            pass
+        except Exception as exc:
+            log.exception("Ran into an error while listening to Salt's event bus")
+            error = exc
+        finally:
+            with _HUBS_LOCK:
+                # New subscribers get a new subscription
+                _remove_hub(self)
+            for subscriber in self.subscribers:
+                subscriber.error = error
+                subscriber.queue.put_nowait(None)
+
+    async def _read_events(self: AEBH, reader: asyncio.StreamReader) -> None:
+        async for frames in _read_frames(reader):
+            for frame in frames:
+                raw_tag, _, raw_data = frame["body"].partition(TAGEND)
+                event_tag = raw_tag.decode()
+                if event_tag != "__beacons_return" and not self._get_subscribers(event_tag):
+                    # Nobody's listening, don't bother deserializing the event data
+                    continue
+                self._dispatch(event_tag, salt.payload.loads(raw_data, encoding="utf-8"))
+            # Reading buffered data does not yield to the event loop, give the pipelines a chance
+            # to process the dispatched events
+            await asyncio.sleep(0)
+
+    def _deliver(self: AEBH, subscriber: _Subscriber, salt_event: SaltEvent) -> None:
+        # Already on the subscriber's event loop
+        subscriber.queue.put_nowait(salt_event)
+
+
+def _build_tag_index(
+    subscribers: tuple[_Subscriber, ...]
+) -> Callable[[str], Tuple[_Subscriber, ...]]:
+    # Most tags, for example, the beacons ones, repeat over and over again
+    @functools.lru_cache(maxsize=TAG_CACHE_SIZE)
+    def _get_subscribers(event_tag: str) -> tuple[_Subscriber, ...]:
+        return tuple(subscriber for subscriber in subscribers if subscriber.matches(event_tag))
+
+    return _get_subscribers
+
+
+def get_publisher_path(opts: dict[str, Any]) -> pathlib.Path:
+    """
+    Return the path to Salt's event publisher socket, given salt's configuration.
+    """
+    if opts["__role"] == "master":
+        return pathlib.Path(opts["sock_dir"]) / "master_event_pub.ipc"
+    hasher = hashlib.new(opts.get("hash_type") or "sha256")
+    hasher.update(str(opts.get("hash_id") or opts["id"]).encode())
+    return pathlib.Path(opts["sock_dir"]) / f"minion_event_{hasher.hexdigest()[:10]}_pub.ipc"
+
+
+async def _open_publisher_connection(
+    opts: dict[str, Any]
+) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if opts.get("ipc_mode") == "tcp":
+        if opts["__role"] == "master":
+            port = opts["tcp_master_pub_port"]
+        else:
+            port = opts["tcp_pub_port"]
+        host = "::1" if opts.get("ipv6") else "127.0.0.1"
+        return await asyncio.open_connection(host, int(port))
+    return await asyncio.open_unix_connection(str(get_publisher_path(opts)))
+
+
+async def _read_frames(reader: asyncio.StreamReader) -> AsyncIterator[list[dict[str, Any]]]:
+    # Generate the messages sent by Salt's event publisher, as many as each read returns
+    if not IPC_LENGTH_PREFIX:
+        unpacker = salt.utils.msgpack.Unpacker(raw=False)
+        while True:
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                return
+            unpacker.feed(chunk)
+            yield list(unpacker)
+    buffer = bytearray()
+    while True:
+        chunk = await reader.read(READ_SIZE)
+        if not chunk:
+            return
+        buffer += chunk
+        frames = []
+        start = 0
+        while len(buffer) - start >= IPC_LENGTH_PREFIX_SIZE:
+            (length,) = struct.unpack_from(">I", buffer, start)
+            end = start + IPC_LENGTH_PREFIX_SIZE + length
+            if len(buffer) < end:
+                # The rest of the message wasn't read yet
+                break
+            frames.append(
+                salt.utils.msgpack.loads(
+                    bytes(buffer[start + IPC_LENGTH_PREFIX_SIZE : end]), raw=False
+                )
+            )
+            start = end
+        del buffer[:start]
+        yield frames
+
+
+def _get_client(opts: dict[str, Any], client: EventBusClient) -> EventBusClient:
+    if client is EventBusClient.ASYNCIO and opts.get("ipc_mode") != "tcp" and not HAS_UNIX_SOCKETS:
+        log.warning(
+            "The %r event bus client requires unix sockets, using the %r event bus client",
+            EventBusClient.ASYNCIO.value,
+            EventBusClient.THREAD.value,
+        )
+        return EventBusClient.THREAD
+    return client
+
+
+def _get_hub_key(
+    opts: dict[str, Any], client: EventBusClient, loop: asyncio.AbstractEventLoop
+) -> tuple[Any, ...]:
+    key: tuple[Any, ...] = (opts["__role"], opts["sock_dir"], opts["transport"])
+    if client is EventBusClient.ASYNCIO:
+        # The asyncio event bus client is bound to an event loop
+        key += (client, loop)
+    return key
+
+
+def _subscribe(
     opts: dict[str, Any],
-    events_queue: Queue[SaltEvent],
     tags: set[str],
-) -> None:
-    # We don't want to mix asyncio and tornado loops,
-    # so, we defer the salt event listening to a separate
-    # thread.
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(
-        None,
-        _process_events,
-        opts,
-        events_queue,
-        tags,
-    )
+    loop: asyncio.AbstractEventLoop,
+    client: EventBusClient = EventBusClient.THREAD,
+) -> tuple[EventBusHub, _Subscriber]:
+    subscriber = _Subscriber(tags, loop)
+    client = _get_client(opts, client)
+    with _HUBS_LOCK:
+        key = _get_hub_key(opts, client, loop)
+        hub = _HUBS.get(key)
+        if hub is None:
+            if client is EventBusClient.ASYNCIO:
+                hub = AsyncEventBusHub(opts, key, loop)
+            else:
+                hub = EventBusHub(opts, key)
+            _HUBS[key] = hub
+            hub.subscribers += (subscriber,)
+            hub.start()
+        else:
+            hub.subscribers += (subscriber,)
+    return hub, subscriber
+
+
+def _unsubscribe(hub: EventBusHub, subscriber: _Subscriber) -> None:
+    with _HUBS_LOCK:
+        hub.subscribers = tuple(sub for sub in hub.subscribers if sub is not subscriber)
+        if not hub.subscribers:
+            # That was the last subscriber, close the subscription
+            hub.stop()
+            _remove_hub(hub)
+
+
+def _remove_hub(hub: EventBusHub) -> None:
+    # Must be called with ``_HUBS_LOCK`` held
+    if _HUBS.get(hub.key) is hub:
+        _HUBS.pop(hub.key)
 
 
-async def iter_events(*, tags: set[str], opts: dict[str, Any]) -> AsyncIterator[SaltEvent]:
+async def iter_events(
+    *,
+    tags: set[str],
+    opts: dict[str, Any],
+    client: EventBusClient = EventBusClient.THREAD,
+) -> AsyncGenerator[SaltEvent, None]:
     """
     Method called to collect events.
+
+    All callers in the process share a single subscription to Salt's event bus, or, when
+    using the ``asyncio`` client, all callers on the same event loop.
     """
     loop = asyncio.get_event_loop()
-    events_queue: Queue[SaltEvent] = queue.Queue()
-    process_events_task = loop.create_task(
-        _start_event_listener(opts=opts, events_queue=events_queue, tags=tags)
-    )
+    hub, subscriber = _subscribe(opts, tags, loop, client)
     try:
         while True:
-            try:
-                event = events_queue.get_nowait()
-                yield event
-            except queue.Empty:
-                await asyncio.sleep(0.1)
+            event = await subscriber.queue.get()
+            if event is None:
+                if subscriber.error is not None:
+                    raise subscriber.error
+                break
+            yield event
     finally:
-        process_events_task.cancel()
+        _unsubscribe(hub, subscriber)
@@ -0,0 +1,213 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Minimal asyncio wrapper around Linux's inotify API, to get notified about file changes.
+
+A single inotify instance, read from the event loop, is shared by all watched files.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+import sys
+from typing import TYPE_CHECKING
+from typing import Callable
+from typing import TypeVar
+
+from saf.utils.aio import wait_event
+
+if TYPE_CHECKING:
+    import pathlib
+
+log = logging.getLogger(__name__)
+
+# File was modified
+IN_MODIFY = 0x00000002
+# Metadata changed, for example, the file was truncated
+IN_ATTRIB = 0x00000004
+# Writable file was closed
+IN_CLOSE_WRITE = 0x00000008
+# Watched file was deleted
+IN_DELETE_SELF = 0x00000400
+# Watched file was moved
+IN_MOVE_SELF = 0x00000800
+# Event queue overflowed, some events were lost
+IN_Q_OVERFLOW = 0x00004000
+# Watch was removed, by the kernel, or explicitly
+IN_IGNORED = 0x00008000
+
+# What's watched on each file by default, anything which could mean there's something to read
+DEFAULT_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_DELETE_SELF | IN_MOVE_SELF
+
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+_EVENT_HEADER = struct.Struct("iIII")
+
+_libc: ctypes.CDLL | None = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        _libc.inotify_init1  # noqa: B018
+    except (OSError, AttributeError):
+        _libc = None
+
+HAS_INOTIFY = _libc is not None
+
+IN = TypeVar("IN", bound="Inotify")
+IW = TypeVar("IW", bound="InotifyWatch")
+
+
+class InotifyWatch:
+    """
+    A watched file.
+    """
+
+    def __init__(
+        self: IW,
+        inotify: Inotify,
+        path: pathlib.Path,
+        wd: int,
+        callback: Callable[[], None] | None = None,
+    ) -> None:
+        self.inotify = inotify
+        self.path = path
+        self.wd = wd
+        # Called, from the event loop, every time the file changes
+        self.callback = callback
+        self._changed = asyncio.Event()
+
+    @property
+    def active(self: IW) -> bool:
+        """
+        Return ``False`` once the file is no longer watched, for example, because it was deleted.
+        """
+        return self.wd >= 0 and self.inotify.fd >= 0
+
+    async def wait(self: IW, timeout: float | None = None) -> bool:
+        """
+        Wait until the file changes, at most ``timeout`` seconds.
+
+        Changes which happened since the previous call to ``wait`` return right away.
+        Return ``False`` if the timeout was reached.
+        """
+        if not await wait_event(self._changed, timeout):
+            return False
+        self._changed.clear()
+        return True
+
+    def notify(self: IW) -> None:
+        """
+        Flag the file as changed.
+        """
+        self._changed.set()
+        if self.callback is not None:
+            self.callback()
+
+    def close(self: IW) -> None:
+        """
+        Stop watching the file.
+        """
+        self.inotify.remove_watch(self)
+
+
+class Inotify:
+    """
+    An inotify instance, read from the current event loop.
+    """
+
+    def __init__(self: IN) -> None:
+        if _libc is None:
+            msg = "inotify is not available on this platform"
+            raise OSError(msg)
+        fd = _libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd = fd
+        self.watches: dict[int, set[InotifyWatch]] = {}
+        self.loop = asyncio.get_event_loop()
+        self.loop.add_reader(self.fd, self._read_events)
+
+    def add_watch(
+        self: IN,
+        path: pathlib.Path,
+        mask: int = DEFAULT_MASK,
+        callback: Callable[[], None] | None = None,
+    ) -> InotifyWatch:
+        """
+        Start watching ``path``, calling ``callback``, if given, every time it changes.
+        """
+        if self.fd < 0:
+            msg = "The inotify instance is closed"
+            raise ValueError(msg)
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(path), mask)  # type: ignore[union-attr]
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(path))
+        watch = InotifyWatch(self, path, wd, callback=callback)
+        # Watching the same file more than once returns the same watch descriptor
+        self.watches.setdefault(wd, set()).add(watch)
+        return watch
+
+    def remove_watch(self: IN, watch: InotifyWatch) -> None:
+        """
+        Stop watching the file.
+        """
+        watches = self.watches.get(watch.wd)
+        if not watches or watch not in watches:
+            return
+        watches.remove(watch)
+        if not watches:
+            self.watches.pop(watch.wd)
+            if self.fd >= 0:
+                # The kernel might have removed the watch already
+                _libc.inotify_rm_watch(self.fd, watch.wd)  # type: ignore[union-attr]
+
+    def close(self: IN) -> None:
+        """
+        Close the inotify instance, waking up all the watches.
+        """
+        if self.fd < 0:
+            return
+        with contextlib.suppress(RuntimeError):
+            # Unless the loop is closed
+            self.loop.remove_reader(self.fd)
+        os.close(self.fd)
+        self.fd = -1
+        for watches in self.watches.values():
+            for watch in watches:
+                watch.notify()
+        self.watches.clear()
+
+    def _read_events(self: IN) -> None:
+        while True:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    log.debug("The inotify event queue overflowed, waking up all watches")
+                    for watches in self.watches.values():
+                        for watch in watches:
+                            watch.notify()
+                    continue
+                if mask & IN_IGNORED:
+                    # The kernel removed the watch, for example, the file was deleted, and
+                    # might reuse the watch descriptor
+                    for watch in self.watches.pop(wd, ()):
+                        watch.wd = -1
+                        watch.notify()
+                    continue
+                for watch in self.watches.get(wd, ()):
+                    watch.notify()
@@ -0,0 +1,150 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Local IPC channel to query the running pipelines manager.
+
+The manager listens on a unix socket, in a directory of salt's ``sock_dir`` which only the
+user running salt can access. Each request and each response is a single line of JSON.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import pathlib
+import socket
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import TypeVar
+
+if TYPE_CHECKING:
+    from saf.manager import Manager
+
+log = logging.getLogger(__name__)
+
+SOCKET_DIR_NAME = "saf-analytics"
+SOCKET_NAME = "manager.ipc"
+
+# Unix sockets are not available on Windows
+HAS_UNIX_SOCKETS = hasattr(socket, "AF_UNIX")
+
+MIS = TypeVar("MIS", bound="ManagerIPCServer")
+
+
+def get_socket_path(opts: dict[str, Any]) -> pathlib.Path:
+    """
+    Return the path to the manager's IPC socket, given salt's configuration.
+    """
+    return pathlib.Path(opts["sock_dir"]) / SOCKET_DIR_NAME / SOCKET_NAME
+
+
+class IPCError(Exception):
+    """
+    Raised when a request to the manager fails.
+    """
+
+
+class ManagerIPCServer:
+    """
+    Answer the requests made through :py:func:`request` with the data from the manager.
+    """
+
+    def __init__(self: MIS, manager: Manager, path: pathlib.Path) -> None:
+        self.manager = manager
+        self.path = path
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self: MIS) -> None:
+        """
+        Start listening for requests.
+        """
+        # Only the user running salt can query the manager. The socket is only reachable
+        # through a directory only that user can access, so, there's no window, between
+        # creating the socket and restricting its permissions, where others can connect.
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.path.parent.chmod(0o700)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=str(self.path))
+        self.path.chmod(0o600)
+        log.debug("Listening for IPC requests on %s", self.path)
+
+    async def stop(self: MIS) -> None:
+        """
+        Stop listening for requests.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        with contextlib.suppress(FileNotFoundError):
+            self.path.unlink()
+
+    async def _handle_connection(
+        self: MIS, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            line = await reader.readline()
+            try:
+                response = {"return": self._handle_request(json.loads(line))}
+            except Exception as exc:  # noqa: BLE001
+                response = {"error": str(exc)}
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            log.debug("The IPC client disconnected before getting a response")
+        finally:
+            writer.close()
+
+    def _handle_request(self: MIS, request: dict[str, Any]) -> Any:  # noqa: ANN401
+        function = request.get("function")
+        if function == "stats":
+            return self.manager.get_stats(request.get("pipeline"))
+        msg = f"Unknown IPC function {function!r}"
+        raise ValueError(msg)
+
+
+def request(
+    path: pathlib.Path, function: str, timeout: float = 5, **kwargs: Any  # noqa: ANN401
+) -> Any:  # noqa: ANN401
+    """
+    Make a request to the manager listening on ``path`` and return the response.
+
+    This is a blocking call, meant to be used from salt's execution modules and runners.
+    A :py:exc:`ConnectionError` is raised if the manager is not listening,
+    and a :py:exc:`ValueError` if the manager fails to answer the request.
+    """
+    payload = json.dumps(dict(kwargs, function=function)).encode() + b"\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            sock.sendall(payload)
+            with sock.makefile("rb") as rfh:
+                line = rfh.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as exc:
+        msg = f"The salt analytics manager is not listening on {path}"
+        raise ConnectionError(msg) from exc
+    if not line:
+        msg = "The salt analytics manager closed the connection without answering"
+        raise ConnectionError(msg)
+    response = json.loads(line)
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["return"]
+
+
+def get_stats(opts: dict[str, Any], pipeline: str | None = None) -> dict[str, dict[str, Any]]:
+    """
+    Return the statistics of the pipelines run by the manager, given salt's configuration.
+
+    The client side of salt's ``analytics.stats`` execution module and runner, see
+    :py:meth:`saf.manager.Manager.get_stats`. An :py:exc:`IPCError` is raised if
+    the request fails.
+    """
+    try:
+        return request(  # type: ignore[no-any-return]
+            get_socket_path(opts), "stats", pipeline=pipeline
+        )
+    except (OSError, ValueError) as exc:
+        raise IPCError(str(exc)) from exc
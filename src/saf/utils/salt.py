@@ -7,12 +7,87 @@ AsyncIO implementations of some of Salt's classes.
 from __future__ import annotations
 
 import asyncio
+import collections
+import hashlib
+import json
+import logging
+import threading
 from functools import partial
 from typing import Any
+from typing import Callable
+from typing import TypeVar
 
 import salt.client
+import salt.loader
 import salt.minion
 
+log = logging.getLogger(__name__)
+
+# How many loaders, for different options, each kind of loader keeps around
+LOADERS_CACHE_SIZE = 4
+
+# The loaded execution modules, and minions, keyed by their options fingerprint, the most
+# recently used last, shared by the whole process
+_MINION_MODS: collections.OrderedDict[str, salt.loader.LazyLoader] = collections.OrderedDict()
+_SMINIONS: collections.OrderedDict[str, salt.minion.SMinion] = collections.OrderedDict()
+_LOADERS_LOCK = threading.Lock()
+
+L = TypeVar("L")
+
+
+def get_opts_fingerprint(opts: dict[str, Any]) -> str:
+    """
+    Return a fingerprint of the given Salt options, the same for equal options.
+    """
+    try:
+        serialized = json.dumps(opts, sort_keys=True, default=repr)
+    except TypeError:
+        # For example, keys which can't be sorted
+        serialized = repr(opts)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def _get_loader(
+    cache: collections.OrderedDict[str, L], opts: dict[str, Any], load: Callable[[Any], L]
+) -> L:
+    fingerprint = get_opts_fingerprint(opts)
+    with _LOADERS_LOCK:
+        loader = cache.get(fingerprint)
+        if loader is not None:
+            cache.move_to_end(fingerprint)
+            return loader
+        log.debug("Loading %s, options fingerprint %s", load.__name__, fingerprint)
+        loader = cache[fingerprint] = load(opts)
+        while len(cache) > LOADERS_CACHE_SIZE:
+            cache.popitem(last=False)
+        return loader
+
+
+def get_minion_mods(opts: dict[str, Any]) -> salt.loader.LazyLoader:
+    """
+    Return the execution modules loaded, by ``salt.loader.minion_mods``, for the given options.
+
+    Loading the execution modules is slow, and takes quite some memory, so, they're loaded
+    once per process for equal options, and shared. Like ``salt.loader.minion_mods``, the
+    grains and the pillar are the ones in the options, they're not loaded, nor compiled.
+    The modules themselves are loaded lazily, when first used.
+
+    The functions of the shared modules can be called from several threads at the same time,
+    sharing ``__context__``, like they are by a salt minion which runs its jobs in threads.
+    """
+    return _get_loader(_MINION_MODS, opts, salt.loader.minion_mods)
+
+
+def get_sminion(opts: dict[str, Any]) -> salt.minion.SMinion:
+    """
+    Return a minion, with all its execution modules, grains and pillar, for the given options.
+
+    Like :func:`get_minion_mods`, the minion is loaded once per process for equal options,
+    and shared. The minion loads its own execution modules, with the grains and the pillar
+    it compiles, so they're not the ones returned by :func:`get_minion_mods`.
+    """
+    return _get_loader(_SMINIONS, opts, salt.minion.SMinion)
+
 
 class MasterClient:
     """
@@ -69,7 +144,7 @@ class MinionClient:
     def __init__(self, minion_opts: dict[str, Any]) -> None:
         self._opts = minion_opts.copy()
         self._opts["file_client"] = "local"
-        self._client = salt.minion.SMinion(self._opts)
+        self._client = get_sminion(self._opts)
 
     async def cmd(self, func: str, *args: Any, **kwargs: Any) -> Any:
         """
@@ -0,0 +1,103 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Pipeline instrumentation.
+"""
+from __future__ import annotations
+
+import bisect
+from typing import Any
+from typing import TypeVar
+
+# The upper bounds, in seconds, of the latency histogram buckets. From 1 microsecond to,
+# roughly, 50 minutes, each bucket 1.41 times larger than the previous one.
+LATENCY_BUCKETS = tuple(1e-6 * 2 ** (idx / 2) for idx in range(64))
+
+LH = TypeVar("LH", bound="LatencyHistogram")
+SS = TypeVar("SS", bound="StageStats")
+
+
+class LatencyHistogram:
+    """
+    Fixed buckets latency histogram.
+
+    Recording a value is cheap and uses no extra memory. The percentiles are approximated
+    to the upper bound of the bucket they fall in, which is, at most, 41% off.
+    """
+
+    def __init__(self: LH) -> None:
+        # One more bucket for values larger than the last bound
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self: LH, value: float) -> None:
+        """
+        Record a latency, in seconds.
+        """
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self: LH, percentile: float) -> float:
+        """
+        Return the approximate latency, in seconds, at the given percentile, 0 to 100.
+        """
+        if not self.count:
+            return 0.0
+        target = self.count * percentile / 100
+        seen = 0
+        for idx, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                if idx == len(LATENCY_BUCKETS):
+                    break
+                return min(LATENCY_BUCKETS[idx], self.max)
+        return self.max
+
+    def to_dict(self: LH) -> dict[str, Any]:
+        """
+        Return a summary of the recorded latencies.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class StageStats:
+    """
+    Statistics of a plugin running in one of the pipeline stages.
+    """
+
+    def __init__(self: SS) -> None:
+        self.events_in = 0
+        self.events_out = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+    def record(self: SS, events_in: int, events_out: int, duration: float) -> None:
+        """
+        Record a successful call to the plugin.
+        """
+        self.events_in += events_in
+        self.events_out += events_out
+        self.latency.record(duration)
+
+    def to_dict(self: SS) -> dict[str, Any]:
+        """
+        Return the statistics as a dictionary.
+        """
+        return {
+            "events_in": self.events_in,
+            "events_out": self.events_out,
+            "errors": self.errors,
+            "latency": self.latency.to_dict(),
+        }
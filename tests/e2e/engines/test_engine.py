@@ -58,3 +58,18 @@ def test_events_dumped_to_disk(analytics_events_dump_directory):
             break
     else:
         pytest.fail(f"Failed to find dumped events in {analytics_events_dump_directory}")
+
+
+def test_stats(salt_cli, minion):
+    timeout = 10
+    while timeout:
+        ret = salt_cli.run("analytics.stats", minion_tgt=minion.id)
+        if ret.returncode == 0:
+            break
+        # The engine might not be listening yet
+        time.sleep(1)
+        timeout -= 1
+    else:
+        pytest.fail(f"Failed to get the analytics stats: {ret}")
+    assert ret.data["my-pipeline"]["running"] is True
+    assert ret.data["my-pipeline"]["collect"]["test-collector"]["errors"] == 0
@@ -0,0 +1,594 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextlib
+import re
+import time
+
+import pytest
+
+from saf.collect import file
+from saf.models import PipelineRunContext
+from saf.utils import inotify
+
+
+@pytest.fixture(params=[file.FileWatchMode.INOTIFY, file.FileWatchMode.POLL])
+def watch(request):
+    if request.param is file.FileWatchMode.INOTIFY and not inotify.HAS_INOTIFY:
+        pytest.skip("inotify is not available")
+    return request.param
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "test.log"
+    path.write_text("old line\n")
+    return path
+
+
+def _get_ctx(**kwargs) -> PipelineRunContext[file.FileCollectConfig]:
+    config = file.FileCollectConfig(plugin="file", **kwargs)
+    config._name = "test-file"  # noqa: SLF001
+    return PipelineRunContext(config=config)
+
+
+def _line(event: file.CollectedLineEvent | file.CollectedLinesEvent) -> str:
+    assert isinstance(event, file.CollectedLineEvent)
+    return event.data["line"]
+
+
+@pytest.mark.asyncio
+async def test_tail(log_file, watch):
+    ctx = _get_ctx(paths=[log_file], watch=watch, poll_interval=0.05)
+    events = file.collect(ctx=ctx)
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    with log_file.open("a") as wfh:
+        wfh.write("new line\n")
+    event = await asyncio.wait_for(next_event, 5)
+    latency = time.perf_counter() - start
+    assert _line(event) == "new line\n"
+    assert event.data["source"] == log_file
+    assert event.backfill is False
+    if watch is file.FileWatchMode.INOTIFY:
+        # No polling interval to wait for
+        assert latency < 0.05
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_backfill(log_file, watch):
+    ctx = _get_ctx(paths=[log_file], watch=watch, backfill=True, poll_interval=0.05)
+    events = file.collect(ctx=ctx)
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    assert _line(event) == "old line\n"
+    assert event.backfill is True
+    with log_file.open("a") as wfh:
+        wfh.write("new line\n")
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    assert _line(event) == "new line\n"
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_backfill_on_executor(log_file):
+    ran = []
+
+    class RecordingExecutor(concurrent.futures.ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            ran.append(fn.__name__)
+            return super().submit(fn, *args, **kwargs)
+
+    loop = asyncio.get_event_loop()
+    executor = RecordingExecutor()
+    loop.set_default_executor(executor)
+    ctx = _get_ctx(
+        paths=[log_file], watch=file.FileWatchMode.POLL, backfill=True, poll_interval=0.05
+    )
+    events = file.collect(ctx=ctx)
+    try:
+        event = await asyncio.wait_for(events.__anext__(), 5)
+        assert _line(event) == "old line\n"
+        next_event = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.1)
+        with log_file.open("a") as wfh:
+            wfh.write("new line\n")
+        event = await asyncio.wait_for(next_event, 5)
+        assert _line(event) == "new line\n"
+        assert event.backfill is False
+        # The rescan and the backfill reads, up to the end of the file, ran on the executor,
+        # once backfilled, the file is read from the event loop
+        assert ran == ["_match_paths", "read", "read"]
+    finally:
+        await events.aclose()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_small_reads(log_file):
+    log_file.write_text("first line\r\nsecond line\nthird ")
+    # Lines split across reads are put back together
+    ctx = _get_ctx(paths=[log_file], backfill=True, read_size=4, poll_interval=0.05)
+    events = file.collect(ctx=ctx)
+    lines = [_line(await asyncio.wait_for(events.__anext__(), 5)) for _ in range(2)]
+    assert lines == ["first line\n", "second line\n"]
+    # The incomplete line is only collected once complete
+    with log_file.open("a") as wfh:
+        wfh.write("line\n")
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    assert _line(event) == "third line\n"
+    await events.aclose()
+
+
+@pytest.mark.parametrize(("lines_per_event", "expected"), [(2, [2, 2, 1]), (None, [5])])
+@pytest.mark.asyncio
+async def test_lines_per_event(log_file, lines_per_event, expected):
+    log_file.write_text("".join(f"line {idx}\n" for idx in range(5)))
+    ctx = _get_ctx(paths=[log_file], backfill=True, lines_per_event=lines_per_event)
+    events = file.collect(ctx=ctx)
+    collected = []
+    for _ in expected:
+        event = await asyncio.wait_for(events.__anext__(), 5)
+        assert isinstance(event, file.CollectedLinesEvent)
+        collected.append(event)
+    await events.aclose()
+    assert [len(event.data["lines"]) for event in collected] == expected
+    assert all(event.backfill for event in collected)
+    expanded = [line_event for event in collected for line_event in event.expand()]
+    assert [line_event.data["line"] for line_event in expanded] == [
+        f"line {idx}\n" for idx in range(5)
+    ]
+    assert all(line_event.data["source"] == log_file for line_event in expanded)
+
+
+async def _next_line(events):
+    return _line(await asyncio.wait_for(events.__anext__(), 5))
+
+
+@pytest.mark.asyncio
+async def test_rename_rotation(log_file, watch):
+    ctx = _get_ctx(paths=[log_file], watch=watch, poll_interval=0.05)
+    events = file.collect(ctx=ctx)
+    next_event = asyncio.ensure_future(_next_line(events))
+    await asyncio.sleep(0.1)
+    with log_file.open("a") as wfh:
+        wfh.write("before rotation\n")
+    assert await next_event == "before rotation\n"
+    next_event = asyncio.ensure_future(_next_line(events))
+    rotated = log_file.with_suffix(".log.1")
+    with log_file.open("a") as wfh:
+        log_file.rename(rotated)
+        # Still written to the rotated file
+        wfh.write("rotated line\n")
+    assert await next_event == "rotated line\n"
+    next_event = asyncio.ensure_future(_next_line(events))
+    await asyncio.sleep(0.1)
+    log_file.write_text("new file line\n")
+    # The new file is read from the start
+    assert await next_event == "new file line\n"
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rename_rotation_matched_again(log_file, watch):
+    log_file.write_text("first\n")
+    # The rotated file matches too
+    ctx = _get_ctx(
+        paths=[log_file.parent / "*.log*"],
+        watch=watch,
+        backfill=True,
+        poll_interval=0.05,
+        rescan_interval=0.05,
+    )
+    events = file.collect(ctx=ctx)
+    assert await _next_line(events) == "first\n"
+    with log_file.open("a") as wfh:
+        wfh.write("second\n")
+    assert await _next_line(events) == "second\n"
+    rotated = log_file.with_suffix(".log.1")
+    with log_file.open("a") as wfh:
+        log_file.rename(rotated)
+        wfh.write("rotated line\n")
+    log_file.write_text("new file line\n")
+    lines = [await _next_line(events), await _next_line(events)]
+    next_event = asyncio.ensure_future(_next_line(events))
+    # Enough for a few rescans, which don't read the rotated file again
+    await asyncio.sleep(0.3)
+    with rotated.open("a") as wfh:
+        wfh.write("late rotated line\n")
+    lines.append(await next_event)
+    assert sorted(lines) == ["late rotated line\n", "new file line\n", "rotated line\n"]
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rescan_removes_gone_files(tmp_path):
+    paths = [tmp_path / f"{idx}.log" for idx in range(2)]
+    for path in paths:
+        path.write_text("")
+    ctx = _get_ctx(paths=[tmp_path / "*.log"], poll_interval=0.05, rescan_interval=0.05)
+    tailer = file._FileTailer(ctx.config)  # noqa: SLF001
+    events = tailer.events()
+    try:
+        next_event = asyncio.ensure_future(_next_line(events))
+        await asyncio.sleep(0.1)
+        assert set(tailer.files) == set(paths)
+        paths[0].unlink()
+        await asyncio.sleep(0.2)
+        # No longer checked for changes
+        assert set(tailer.files) == {paths[1]}
+        assert set(tailer.polled) <= {paths[1]}
+        assert not tailer.keys.keys() - {tailer.files[paths[1]].key}
+        next_event.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await next_event
+    finally:
+        await events.aclose()
+        tailer.close()
+
+
+@pytest.mark.asyncio
+async def test_copytruncate_rotation(log_file, watch):
+    ctx = _get_ctx(paths=[log_file], watch=watch, poll_interval=0.05)
+    events = file.collect(ctx=ctx)
+    next_event = asyncio.ensure_future(_next_line(events))
+    await asyncio.sleep(0.1)
+    with log_file.open("a") as wfh:
+        wfh.write("before truncation\n")
+    assert await next_event == "before truncation\n"
+    next_event = asyncio.ensure_future(_next_line(events))
+    with log_file.open("r+") as wfh:
+        wfh.truncate(0)
+    await asyncio.sleep(0.1)
+    with log_file.open("a") as wfh:
+        wfh.write("after\n")
+    assert await next_event == "after\n"
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_checkpoints(log_file, tmp_path):
+    checkpoints = tmp_path / "checkpoints" / "file.json"
+    log_file.write_text("first\nsecond\n")
+    ctx = _get_ctx(paths=[log_file], backfill=True, checkpoints=checkpoints)
+    events = file.collect(ctx=ctx)
+    for expected in ("first\n", "second\n"):
+        event = await asyncio.wait_for(events.__anext__(), 5)
+        assert _line(event) == expected
+        event.forwarded()
+    await events.aclose()
+    assert checkpoints.exists()
+
+    # Written while not running
+    with log_file.open("a") as wfh:
+        wfh.write("third\n")
+    events = file.collect(ctx=ctx)
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    # Resumed from the checkpoint, instead of backfilling the whole file again
+    assert _line(event) == "third\n"
+    assert event.backfill is True
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_not_forwarded(log_file, tmp_path):
+    checkpoints = tmp_path / "checkpoints.json"
+    log_file.write_text("first\n")
+    ctx = _get_ctx(
+        paths=[log_file],
+        backfill=True,
+        checkpoints=checkpoints,
+        watch=file.FileWatchMode.POLL,
+        poll_interval=0.05,
+    )
+    events = file.collect(ctx=ctx)
+    (await asyncio.wait_for(events.__anext__(), 5)).forwarded()
+    with log_file.open("a") as wfh:
+        wfh.write("second\n")
+    # Collected, but not forwarded
+    assert await _next_line(events) == "second\n"
+    await events.aclose()
+
+    events = file.collect(ctx=ctx)
+    # Resumed after the last forwarded line
+    assert await _next_line(events) == "second\n"
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_acknowledged_out_of_order(log_file, tmp_path):
+    checkpoints = tmp_path / "checkpoints.json"
+    log_file.write_text("first\nsecond\nthird\n")
+    ctx = _get_ctx(
+        paths=[log_file],
+        backfill=True,
+        checkpoints=checkpoints,
+        # A line per read
+        read_size=len("first\n"),
+    )
+    events = file.collect(ctx=ctx)
+    first = await asyncio.wait_for(events.__anext__(), 5)
+    second = await asyncio.wait_for(events.__anext__(), 5)
+    third = await asyncio.wait_for(events.__anext__(), 5)
+    third.forwarded()
+    first.forwarded()
+    await events.aclose()
+
+    events = file.collect(ctx=ctx)
+    # Resumed from the first line not acknowledged
+    assert await _next_line(events) == "second\n"
+    await events.aclose()
+    second.forwarded()
+
+
+@pytest.mark.asyncio
+async def test_rescan(tmp_path):
+    ctx = _get_ctx(paths=[tmp_path / "*.log"], poll_interval=0.05, rescan_interval=0.05)
+    events = file.collect(ctx=ctx)
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.1)
+    new_file = tmp_path / "new.log"
+    new_file.write_text("")
+    await asyncio.sleep(0.2)
+    with new_file.open("a") as wfh:
+        wfh.write("new file line\n")
+    event = await asyncio.wait_for(next_event, 5)
+    assert event.data["source"] == new_file
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rescan_reads_new_files_from_start(tmp_path):
+    ctx = _get_ctx(paths=[tmp_path / "*.log"], poll_interval=0.05, rescan_interval=0.2)
+    events = file.collect(ctx=ctx)
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.1)
+    # Written before the rescan picks up the file
+    new_file = tmp_path / "new.log"
+    new_file.write_text("first\nsecond\n")
+    event = await asyncio.wait_for(next_event, 5)
+    assert event.data["source"] == new_file
+    assert _line(event) == "first\n"
+    assert event.backfill is False
+    assert await _next_line(events) == "second\n"
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_glob_matches(tmp_path, watch):
+    paths = [tmp_path / "first.log", tmp_path / "second.log", tmp_path / "nested" / "third.log"]
+    for path in paths:
+        path.parent.mkdir(exist_ok=True)
+        path.write_text("")
+    ctx = _get_ctx(paths=[tmp_path / "**" / "*.log"], watch=watch, poll_interval=0.05)
+    events = file.collect(ctx=ctx)
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.1)
+    for path in paths:
+        with path.open("a") as wfh:
+            wfh.write(f"{path.name}\n")
+    sources = [(await asyncio.wait_for(next_event, 5)).data["source"]]
+    sources.extend(
+        [(await asyncio.wait_for(events.__anext__(), 5)).data["source"] for _ in range(2)]
+    )
+    # Every match is tailed, not just the last one
+    assert sorted(sources) == sorted(paths)
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_max_open_files(tmp_path, watch):
+    paths = [tmp_path / f"{idx}.log" for idx in range(5)]
+    for path in paths:
+        path.write_text("")
+    ctx = _get_ctx(paths=[tmp_path / "*.log"], watch=watch, poll_interval=0.05, max_open_files=2)
+    watcher = file._get_inotify(ctx.config)  # noqa: SLF001
+    tailer = file._FileTailer(ctx.config, watcher=watcher)  # noqa: SLF001
+    events = tailer.events()
+    try:
+        next_event = asyncio.ensure_future(_next_line(events))
+        await asyncio.sleep(0.1)
+        assert len(tailer.open_files) == 2
+        for idx in range(2):
+            for path in paths:
+                with path.open("a") as wfh:
+                    wfh.write(f"{path.name} {idx}\n")
+                # The closed files are opened again once they change
+                assert await next_event == f"{path.name} {idx}\n"
+                assert len(tailer.open_files) <= 2
+                next_event = asyncio.ensure_future(_next_line(events))
+        next_event.cancel()
+    finally:
+        await events.aclose()
+        tailer.close()
+        if watcher is not None:
+            watcher.close()
+
+
+@pytest.mark.asyncio
+async def test_mmap_backfill(log_file, monkeypatch):
+    monkeypatch.setattr(file, "MMAP_READ_SIZE", 16)
+    log_file.write_bytes("short\nlonger than the read size\r\né\npartial".encode())
+    ctx = _get_ctx(
+        paths=[log_file],
+        watch=file.FileWatchMode.POLL,
+        backfill=True,
+        poll_interval=0.05,
+        mmap_backfill=True,
+    )
+    tailer = file._FileTailer(ctx.config)  # noqa: SLF001
+    events = tailer.events()
+    try:
+        collected = [await asyncio.wait_for(events.__anext__(), 5) for _ in range(3)]
+        assert [_line(event) for event in collected] == [
+            "short\n",
+            "longer than the read size\n",
+            "é\n",
+        ]
+        assert all(event.backfill for event in collected)
+        # Tailing takes over where the backfill stopped, at the incomplete line
+        with log_file.open("a") as wfh:
+            wfh.write(" line\n")
+        assert await _next_line(events) == "partial line\n"
+        assert tailer.files[log_file].mapped is None
+    finally:
+        await events.aclose()
+        tailer.close()
+
+
+@pytest.mark.parametrize("lines_per_event", [1, 2, None])
+@pytest.mark.asyncio
+async def test_mmap_backfill_opt_in(log_file, lines_per_event):
+    log_file.write_text("line 1\nline 2\n")
+    ctx = _get_ctx(
+        paths=[log_file],
+        watch=file.FileWatchMode.POLL,
+        backfill=True,
+        lines_per_event=lines_per_event,
+    )
+    tailer = file._FileTailer(ctx.config)  # noqa: SLF001
+    tailer.add(log_file)
+    try:
+        tailer._read(tailer.files[log_file])  # noqa: SLF001
+        # Truncating a mapped file can crash the process, it's never mapped unless enabled
+        assert tailer.files[log_file].mapped is None
+    finally:
+        tailer.close()
+
+
+@pytest.mark.asyncio
+async def test_mmap_backfill_truncated(log_file, monkeypatch):
+    monkeypatch.setattr(file, "MMAP_READ_SIZE", 8)
+    log_file.write_text("".join(f"line {idx}\n" for idx in range(10)))
+    ctx = _get_ctx(
+        paths=[log_file],
+        watch=file.FileWatchMode.POLL,
+        backfill=True,
+        poll_interval=0.05,
+        mmap_backfill=True,
+    )
+    tailer = file._FileTailer(ctx.config)  # noqa: SLF001
+    events = tailer.events()
+    try:
+        assert await _next_line(events) == "line 0\n"
+        assert tailer.files[log_file].mapped is not None
+        # Accessing the mapped pages past the new end of the file would crash
+        log_file.write_text("after\n")
+        assert await _next_line(events) == "after\n"
+    finally:
+        await events.aclose()
+        tailer.close()
+
+
+@pytest.mark.asyncio
+async def test_multiline_start(log_file):
+    log_file.write_text(
+        "2023-01-01 [ERROR] Failed\n"
+        "Traceback (most recent call last):\n"
+        '  File "test.py", line 1\n'
+        "ValueError\n"
+        "2023-01-01 [INFO] Done\n"
+    )
+    ctx = _get_ctx(
+        paths=[log_file],
+        backfill=True,
+        poll_interval=0.05,
+        multiline_start=r"^\d{4}-\d{2}-\d{2} ",
+        multiline_timeout=0.1,
+    )
+    events = file.collect(ctx=ctx)
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    assert _line(event) == (
+        "2023-01-01 [ERROR] Failed\n"
+        "Traceback (most recent call last):\n"
+        '  File "test.py", line 1\n'
+        "ValueError\n"
+    )
+    assert event.backfill is True
+    # Not followed by another record, collected once the timeout is reached
+    assert await _next_line(events) == "2023-01-01 [INFO] Done\n"
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_multiline_continuation(log_file):
+    log_file.write_text("first\n  continued\n\tand continued\nsecond\n")
+    ctx = _get_ctx(
+        paths=[log_file],
+        backfill=True,
+        multiline_continuation=r"^\s",
+        multiline_max_lines=2,
+        multiline_timeout=0.1,
+    )
+    events = file.collect(ctx=ctx)
+    lines = [await _next_line(events) for _ in range(3)]
+    assert lines == ["first\n  continued\n", "\tand continued\n", "second\n"]
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_multiline_checkpoints(log_file, tmp_path):
+    checkpoints = tmp_path / "checkpoints.json"
+    log_file.write_text("first\n  continued\n")
+    ctx = _get_ctx(
+        paths=[log_file],
+        backfill=True,
+        checkpoints=checkpoints,
+        multiline_continuation=r"^\s",
+        multiline_timeout=5,
+    )
+    events = file.collect(ctx=ctx)
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.1)
+    next_event.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await next_event
+    await events.aclose()
+    # The incomplete record was not collected, it's read again when resuming
+    with log_file.open("a") as wfh:
+        wfh.write("second\n")
+    events = file.collect(ctx=ctx)
+    assert await _next_line(events) == "first\n  continued\n"
+    await events.aclose()
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.asyncio
+async def test_multiline_checkpoints_record_start(log_file, tmp_path, newline):
+    checkpoints = tmp_path / "checkpoints.json"
+    log_file.write_bytes(
+        newline.join(["first", "  continued", "second", "  continued", ""]).encode()
+    )
+    ctx = _get_ctx(
+        paths=[log_file],
+        backfill=True,
+        checkpoints=checkpoints,
+        multiline_continuation=r"^\s",
+        multiline_timeout=5,
+    )
+    events = file.collect(ctx=ctx)
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    assert _line(event) == "first\n  continued\n"
+    event.forwarded()
+    await events.aclose()
+    # Read in the same chunk, the incomplete record is read again from its own start
+    with log_file.open("a") as wfh:
+        wfh.write("third\n")
+    events = file.collect(ctx=ctx)
+    assert await _next_line(events) == "second\n  continued\n"
+    await events.aclose()
+
+
+def test_multiline_mutually_exclusive():
+    with pytest.raises(ValueError, match="mutually exclusive"):
+        file.FileCollectConfig(
+            plugin="file",
+            paths=[],
+            multiline_start=re.compile("^a"),
+            multiline_continuation=re.compile("^b"),
+        )
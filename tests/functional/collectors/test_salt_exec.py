@@ -0,0 +1,146 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+import datetime
+import threading
+import time
+
+import pytest
+
+from saf.collect import salt_exec
+from saf.models import AnalyticsConfig
+from saf.models import PipelineRunContext
+from saf.utils import dt
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    # Don't leave the blocked functions running
+    event.set()
+
+
+@pytest.fixture(autouse=True)
+def _minion_mods(monkeypatch, release):
+    def _blocked():
+        release.wait()
+        return "unblocked"
+
+    def _slow():
+        time.sleep(0.05)
+        return "slow"
+
+    def _fail():
+        msg = "Failed"
+        raise RuntimeError(msg)
+
+    functions = {
+        "test.arg": lambda *args, **kwargs: {"args": list(args), "kwargs": kwargs},
+        "test.blocked": _blocked,
+        "test.slow": _slow,
+        "test.fail": _fail,
+    }
+    monkeypatch.setattr(salt_exec, "get_minion_mods", lambda _: functions)
+
+
+def _get_ctx(**kwargs) -> PipelineRunContext[salt_exec.SaltExecConfig]:
+    config = salt_exec.SaltExecConfig(plugin="salt_exec", **kwargs)
+    config._name = "test-salt-exec"  # noqa: SLF001
+    config._parent = AnalyticsConfig.model_construct(  # noqa: SLF001
+        collectors={},
+        processors={},
+        forwarders={},
+        pipelines={},
+        salt_config={"__role": "minion"},
+    )
+    return PipelineRunContext(config=config)
+
+
+async def _next_event(events):
+    return await asyncio.wait_for(events.__anext__(), 5)
+
+
+@pytest.mark.asyncio
+async def test_collect():
+    events = salt_exec.collect(ctx=_get_ctx(fn="test.arg", args=[1], kwargs={"a": 2}))
+    event = await _next_event(events)
+    assert event.data == {"fn": "test.arg", "ret": {"args": [1], "kwargs": {"a": 2}}}
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_functions():
+    ctx = _get_ctx(
+        interval=0.1,
+        functions=[{"fn": "test.blocked"}, {"fn": "test.fail"}, {"fn": "test.arg", "args": [1]}],
+    )
+    events = salt_exec.collect(ctx=ctx)
+    start = time.monotonic()
+    # Neither the blocked function, nor the failing one, stop the others from running
+    rets = [(await _next_event(events)).data["ret"] for _ in range(3)]
+    assert rets == [{"args": [1], "kwargs": {}}] * 3
+    assert time.monotonic() - start < 0.5
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_timeout(release):
+    ctx = _get_ctx(
+        interval=0.05, timeout=0.05, functions=[{"fn": "test.blocked"}, {"fn": "test.slow"}]
+    )
+    events = salt_exec.collect(ctx=ctx)
+    assert (await _next_event(events)).data["ret"] == "slow"
+    release.set()
+    # The timed out call still returns, just not collected, and the function runs again
+    while (await _next_event(events)).data["ret"] != "unblocked":
+        pass
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_no_drift():
+    events = salt_exec.collect(ctx=_get_ctx(interval=0.1, fn="test.slow"))
+    await _next_event(events)
+    start = time.monotonic()
+    for _ in range(5):
+        await _next_event(events)
+    # Running the function takes 0.05 seconds, which doesn't delay the next runs
+    assert time.monotonic() - start < 0.5 + 0.05
+    await events.aclose()
+
+
+@pytest.fixture
+def utcnow(monkeypatch):
+    # Always a fifth of a second before the hour, in UTC
+    now = datetime.datetime(2023, 1, 1, 12, 59, 59, 800000, tzinfo=datetime.timezone.utc)
+    monkeypatch.setattr(dt, "utcnow", lambda: now)
+    return now
+
+
+@pytest.mark.usefixtures("utcnow")
+@pytest.mark.asyncio
+async def test_schedule():
+    events = salt_exec.collect(ctx=_get_ctx(schedule="@hourly", fn="test.slow"))
+    start = time.monotonic()
+    await _next_event(events)
+    # Not run when starting, only when the schedule matches
+    assert time.monotonic() - start >= 0.2
+    await events.aclose()
+
+
+@pytest.mark.usefixtures("utcnow")
+@pytest.mark.asyncio
+async def test_schedule_run_at_start():
+    ctx = _get_ctx(schedule="0 0 1 1 *", run_at_start=True, fn="test.slow")
+    events = salt_exec.collect(ctx=ctx)
+    assert (await _next_event(events)).data["ret"] == "slow"
+    await events.aclose()
+
+
+def test_invalid_schedule():
+    with pytest.raises(ValueError, match="never matches"):
+        _get_ctx(schedule="0 0 31 feb *")
@@ -0,0 +1,197 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+import datetime
+
+import pytest
+
+from saf.collect import salt_jobs
+from saf.models import AnalyticsConfig
+from saf.models import EventBusClient
+from saf.models import PipelineRunContext
+from saf.models import SaltEvent
+from saf.utils import eventbus
+
+JID = "20230101000000000000"
+
+
+def _stamp(second=0):
+    return datetime.datetime(2023, 1, 1, 0, 0, second, tzinfo=datetime.timezone.utc)
+
+
+def new_event(jid=JID, minions=("minion-1", "minion-2"), fun="state.apply"):
+    return SaltEvent(
+        tag=f"salt/job/{jid}/new",
+        stamp=_stamp(),
+        data={
+            "jid": jid,
+            "fun": fun,
+            "arg": [],
+            "tgt": "*",
+            "tgt_type": "glob",
+            "user": "root",
+            "minions": list(minions),
+        },
+    )
+
+
+def ret_event(minion, jid=JID, retcode=0, fun="state.apply", second=1):
+    return SaltEvent(
+        tag=f"salt/job/{jid}/ret/{minion}",
+        stamp=_stamp(second),
+        data={
+            "jid": jid,
+            "id": minion,
+            "fun": fun,
+            "fun_args": [],
+            "return": {"result": not retcode},
+            "retcode": retcode,
+            "success": True,
+        },
+    )
+
+
+@pytest.fixture
+def config():
+    config = salt_jobs.SaltJobsConfig(plugin="salt_jobs", ttl=0.2)
+    config._name = "test-salt-jobs"  # noqa: SLF001
+    config._parent = AnalyticsConfig.model_construct(  # noqa: SLF001
+        collectors={},
+        processors={},
+        forwarders={},
+        pipelines={},
+        salt_config={"__role": "master"},
+        eventbus_client=EventBusClient.THREAD,
+    )
+    return config
+
+
+@pytest.fixture
+def fired_events():
+    return []
+
+
+@pytest.fixture
+def keep_listening():
+    return True
+
+
+@pytest.fixture(autouse=True)
+def _iter_events(monkeypatch, fired_events, keep_listening):
+    async def _fake_iter_events(*, tags, **_):
+        assert tags == salt_jobs.JOB_TAGS
+        for event in fired_events:
+            await asyncio.sleep(0.01)
+            yield event
+        if keep_listening:
+            await asyncio.sleep(5)
+
+    monkeypatch.setattr(eventbus, "iter_events", _fake_iter_events)
+
+
+def test_job_index_complete():
+    index = salt_jobs.JobIndex(ttl=60, max_jobs=10)
+    assert index.add_event(new_event()) == []
+    assert index.add_event(ret_event("minion-1", second=2)) == []
+    (job,) = index.add_event(ret_event("minion-2", retcode=1, second=4))
+    assert not index
+    aggregated = job.to_dict()
+    assert aggregated["jid"] == JID
+    assert aggregated["fun"] == "state.apply"
+    assert aggregated["targets"] == ["minion-1", "minion-2"]
+    assert aggregated["missing"] == []
+    assert aggregated["complete"] is True
+    assert aggregated["success_ratio"] == 0.5
+    assert aggregated["duration"] == 4
+    assert aggregated["returns"]["minion-1"] == {
+        "success": True,
+        "retcode": 0,
+        "return": {"result": True},
+    }
+    assert "return" not in job.to_dict(include_returns=False)["returns"]["minion-1"]
+
+
+def test_job_index_expire():
+    index = salt_jobs.JobIndex(ttl=60, max_jobs=10)
+    index.add_event(new_event())
+    index.add_event(ret_event("minion-1"))
+    assert index.expire() == []
+    (job,) = index.expire(now=index.jobs[JID].expires_at)
+    aggregated = job.to_dict()
+    assert aggregated["complete"] is False
+    assert aggregated["missing"] == ["minion-2"]
+    assert aggregated["success_ratio"] == 0.5
+
+
+def test_job_index_max_jobs():
+    index = salt_jobs.JobIndex(ttl=60, max_jobs=2)
+    index.add_event(new_event(jid="1"))
+    index.add_event(new_event(jid="2"))
+    (job,) = index.add_event(new_event(jid="3"))
+    assert job.jid == "1"
+    assert list(index.jobs) == ["2", "3"]
+
+
+def test_job_index_missed_new_event():
+    index = salt_jobs.JobIndex(ttl=60, max_jobs=10)
+    index.add_event(ret_event("minion-1"))
+    (job,) = index.expire(now=index.jobs[JID].expires_at)
+    aggregated = job.to_dict()
+    assert aggregated["fun"] == "state.apply"
+    assert aggregated["targets"] == ["minion-1"]
+    assert aggregated["success_ratio"] == 1.0
+
+
+def test_job_index_no_targets():
+    index = salt_jobs.JobIndex(ttl=60, max_jobs=10)
+    # Nothing to wait for
+    (job,) = index.add_event(new_event(minions=()))
+    assert not index
+    aggregated = job.to_dict()
+    assert aggregated["complete"] is True
+    assert aggregated["targets"] == []
+
+
+@pytest.mark.parametrize("keep_listening", [False])
+@pytest.mark.asyncio
+async def test_collect_flushes_on_events_end(config, fired_events):
+    fired_events.extend([new_event(), ret_event("minion-1"), new_event(jid="2")])
+    ctx: PipelineRunContext[salt_jobs.SaltJobsConfig] = PipelineRunContext(config=config)
+    events = salt_jobs.collect(ctx=ctx)
+    # Aggregated as soon as the events end, instead of after the TTL
+    collected = [event async for event in events]
+    assert [(event.data["jid"], event.data["complete"]) for event in collected] == [
+        (JID, False),
+        ("2", False),
+    ]
+    assert collected[0].data["missing"] == ["minion-2"]
+
+
+@pytest.mark.asyncio
+async def test_collect(config, fired_events):
+    fired_events.extend(
+        [
+            new_event(fun="saltutil.find_job"),
+            new_event(),
+            ret_event("minion-1", fun="saltutil.find_job"),
+            ret_event("minion-1"),
+            ret_event("minion-2"),
+            new_event(jid="2"),
+            ret_event("minion-1", jid="2"),
+        ]
+    )
+    ctx: PipelineRunContext[salt_jobs.SaltJobsConfig] = PipelineRunContext(config=config)
+    events = salt_jobs.collect(ctx=ctx)
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    assert event.data["jid"] == JID
+    assert event.data["complete"] is True
+    assert event.data["success_ratio"] == 1.0
+    # Not all minions returned, the job is aggregated once the TTL expires
+    event = await asyncio.wait_for(events.__anext__(), 5)
+    assert event.data["jid"] == "2"
+    assert event.data["complete"] is False
+    assert event.data["missing"] == ["minion-2"]
+    await events.aclose()
@@ -0,0 +1,125 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from saf.forward import test as test_forwarder
+from saf.pipeline import Pipeline
+
+LINES = [f"line {idx:02d}\n" for idx in range(20)]
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "test.log"
+    path.write_text("".join(LINES))
+    return path
+
+
+@pytest.fixture
+def collectors_config(log_file, tmp_path):
+    return {
+        "file-collector": {
+            "plugin": "file",
+            "paths": [str(log_file)],
+            "backfill": True,
+            "watch": "poll",
+            "poll_interval": 0.05,
+            "checkpoints": str(tmp_path / "checkpoints.json"),
+            # A line per read, each line is checkpointed once forwarded
+            "read_size": len(LINES[0]),
+        },
+    }
+
+
+@pytest.fixture(
+    params=[
+        {},
+        # Processors which make new events out of the collected ones
+        {"mask-processor": {"plugin": "regex_mask", "rules": {"secret": "password=\\S+"}}},
+        # And which hand them over out of order
+        {
+            "mask-processor": {
+                "plugin": "regex_mask",
+                "rules": {"secret": "password=\\S+"},
+                "concurrency": 4,
+                "ordered": False,
+            },
+        },
+    ],
+    ids=["unprocessed", "processed", "processed-unordered"],
+)
+def processors_config(request):
+    return request.param
+
+
+@pytest.fixture
+def forwarders_config():
+    return {
+        "test-forwarder": {
+            "plugin": "test",
+            "sleep": 0.05,
+            "add_event_to_shared_cache": True,
+        },
+    }
+
+
+async def _wait_for_forwarded(pipeline, count):
+    while len(pipeline.shared_cache.get("collected_events", ())) < count:
+        await asyncio.sleep(0.01)
+
+
+async def _run_until_forwarded(pipeline, count):
+    running = asyncio.ensure_future(pipeline.run())
+    try:
+        await asyncio.wait_for(_wait_for_forwarded(pipeline, count), 5)
+    finally:
+        running.cancel()
+        await asyncio.gather(running, return_exceptions=True)
+    return [event.data["line"] for event in pipeline.shared_cache["collected_events"]]
+
+
+def _first_not_forwarded(forwarded):
+    return next(idx for idx, line in enumerate(LINES) if line not in forwarded)
+
+
+@pytest.mark.asyncio
+async def test_restart_with_buffered_events(analytics_config, pipeline_name, processors_config):
+    with Pipeline(pipeline_name, analytics_config.pipelines[pipeline_name]) as pipeline:
+        forwarded = await _run_until_forwarded(pipeline, 3)
+        # All of the lines were read, most of them are still waiting to be forwarded
+        assert len(forwarded) < len(LINES)
+    with Pipeline(pipeline_name, analytics_config.pipelines[pipeline_name]) as pipeline:
+        resumed = await _run_until_forwarded(pipeline, 1)
+    # Resumed from the first line not forwarded, or before it, nothing is lost
+    first_not_forwarded = _first_not_forwarded(forwarded)
+    assert 0 < LINES.index(resumed[0]) <= first_not_forwarded
+    if all(config.get("ordered", True) for config in processors_config.values()):
+        # At most the last forwarded line is forwarded again
+        assert LINES.index(resumed[0]) >= first_not_forwarded - 1
+
+
+@pytest.mark.parametrize("processors_config", [{}], ids=["unprocessed"])
+@pytest.mark.asyncio
+async def test_restart_after_failed_forward(analytics_config, pipeline_name, monkeypatch):
+    forward = test_forwarder.forward
+
+    async def _forward(*, ctx, event):
+        if event.data["line"] == LINES[2]:
+            msg = "Failed to forward"
+            raise RuntimeError(msg)
+        await forward(ctx=ctx, event=event)
+
+    monkeypatch.setattr(test_forwarder, "forward", _forward)
+    with Pipeline(pipeline_name, analytics_config.pipelines[pipeline_name]) as pipeline:
+        forwarded = await _run_until_forwarded(pipeline, 4)
+        assert LINES[2] not in forwarded
+    monkeypatch.setattr(test_forwarder, "forward", forward)
+    with Pipeline(pipeline_name, analytics_config.pipelines[pipeline_name]) as pipeline:
+        resumed = await _run_until_forwarded(pipeline, 1)
+    # The lines are not checkpointed past the one which failed to be forwarded
+    assert resumed[0] == LINES[2]
@@ -0,0 +1,88 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+from functools import partial
+
+import pytest
+import pytest_asyncio
+
+from saf.utils import ipc
+
+pytestmark = pytest.mark.skipif(not ipc.HAS_UNIX_SOCKETS, reason="Unix sockets are not available")
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return ipc.get_socket_path({"sock_dir": tmp_path / "sock"})
+
+
+@pytest_asyncio.fixture
+async def ipc_server(manager, socket_path):
+    server = ipc.ManagerIPCServer(manager, socket_path)
+    await server.start()
+    try:
+        yield server
+    finally:
+        await server.stop()
+
+
+async def _request(socket_path, function, **kwargs):
+    # The client blocks, run it in a thread, not to block the server
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, partial(ipc.request, socket_path, function, **kwargs))
+
+
+@pytest.mark.asyncio
+async def test_stats(ipc_server, manager, pipeline_name, socket_path):
+    assert socket_path.parent.stat().st_mode & 0o777 == 0o700
+    assert socket_path.stat().st_mode & 0o777 == 0o600
+    stats = await _request(socket_path, "stats")
+    assert list(stats) == [pipeline_name]
+    assert stats[pipeline_name]["running"] is True
+    assert "test-collector" in stats[pipeline_name]["collect"]
+    stats = await _request(socket_path, "stats", pipeline=pipeline_name)
+    assert list(stats) == [pipeline_name]
+
+
+@pytest.mark.asyncio
+async def test_errors(ipc_server, socket_path):
+    with pytest.raises(ValueError, match="Unknown pipeline 'foo'"):
+        await _request(socket_path, "stats", pipeline="foo")
+    with pytest.raises(ValueError, match="Unknown IPC function 'foo'"):
+        await _request(socket_path, "foo")
+
+
+@pytest.mark.asyncio
+async def test_not_listening(ipc_server, socket_path):
+    await ipc_server.stop()
+    assert not socket_path.exists()
+    with pytest.raises(ConnectionError, match="is not listening"):
+        await _request(socket_path, "stats")
+
+
+@pytest.mark.asyncio
+async def test_socket_directory_permissions(manager, socket_path):
+    socket_path.parent.mkdir(mode=0o755, parents=True)
+    socket_path.parent.chmod(0o755)
+    server = ipc.ManagerIPCServer(manager, socket_path)
+    await server.start()
+    try:
+        assert socket_path.parent.stat().st_mode & 0o777 == 0o700
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_get_stats(ipc_server, pipeline_name, tmp_path):
+    loop = asyncio.get_event_loop()
+    opts = {"sock_dir": tmp_path / "sock"}
+    stats = await loop.run_in_executor(None, ipc.get_stats, opts, pipeline_name)
+    assert list(stats) == [pipeline_name]
+    with pytest.raises(ipc.IPCError, match="Unknown pipeline 'foo'"):
+        await loop.run_in_executor(None, ipc.get_stats, opts, "foo")
+    await ipc_server.stop()
+    with pytest.raises(ipc.IPCError, match="is not listening"):
+        await loop.run_in_executor(None, ipc.get_stats, opts)
@@ -0,0 +1,59 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def processors_config():
+    return {
+        "test-processor": {
+            "plugin": "test",
+            "child_events_count": 1,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_stats(manager, pipeline_name, collect_events_count):
+    pipeline = manager.pipelines[pipeline_name]
+    for _ in range(50):
+        if len(pipeline.shared_cache.get("collected_events", ())) == collect_events_count * 2:
+            break
+        await asyncio.sleep(0.1)
+    stats = manager.get_stats()
+    assert list(stats) == [pipeline_name]
+    assert list(manager.get_stats(pipeline_name)) == [pipeline_name]
+    pipeline_stats = stats[pipeline_name]
+    assert pipeline_stats["uptime"] > 0
+    assert pipeline_stats["throughput"] > 0
+    assert pipeline_stats["lag"]["count"] == collect_events_count * 2
+
+    collector_stats = pipeline_stats["collect"]["test-collector"]
+    assert collector_stats["events_out"] == collect_events_count
+    assert collector_stats["errors"] == 0
+
+    processor_stats = pipeline_stats["process"]["test-processor"]
+    assert processor_stats["events_in"] == collect_events_count
+    # Each event produces a child event
+    assert processor_stats["events_out"] == collect_events_count * 2
+    assert processor_stats["latency"]["count"] == collect_events_count
+    assert 0 < processor_stats["latency"]["p50"] <= processor_stats["latency"]["max"]
+
+    forwarder_stats = pipeline_stats["forward"]["test-forwarder"]
+    assert forwarder_stats["events_in"] == collect_events_count * 2
+    assert forwarder_stats["events_out"] == collect_events_count * 2
+    assert forwarder_stats["errors"] == 0
+
+    assert pipeline_stats["buffers"]["process"]["size"] == 0
+    assert pipeline_stats["buffers"]["forward"]["dropped"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_pipeline_stats(manager):
+    with pytest.raises(ValueError, match="Unknown pipeline 'foo'"):
+        manager.get_stats("foo")
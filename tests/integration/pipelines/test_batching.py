@@ -0,0 +1,116 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import pytest
+
+from saf.forward import noop
+
+
+@pytest.fixture
+def collect_events_count():
+    return 10
+
+
+@pytest.fixture
+def collect_interval():
+    return 0.01
+
+
+@pytest.fixture
+def collectors_config(collect_events_count, collect_interval):
+    return {
+        "test-collector": {
+            "plugin": "test",
+            "count": collect_events_count,
+            "interval": collect_interval,
+        },
+    }
+
+
+@pytest.fixture
+def forwarders_config(tmp_path):
+    return {
+        "test-forwarder": {
+            "plugin": "test",
+            "add_event_to_shared_cache": True,
+        },
+        "noop-forwarder": {
+            "plugin": "noop",
+        },
+        "disk-forwarder": {
+            "plugin": "disk",
+            "path": tmp_path,
+            "filename": "events.txt",
+        },
+    }
+
+
+@pytest.fixture
+def batch_size():
+    return 4
+
+
+@pytest.fixture
+def batch_timeout():
+    return 0.5
+
+
+@pytest.fixture
+def pipelines_config(pipelines_config, pipeline_name, batch_size, batch_timeout):
+    pipelines_config[pipeline_name]["batch_size"] = batch_size
+    pipelines_config[pipeline_name]["batch_timeout"] = batch_timeout
+    return pipelines_config
+
+
+@pytest.fixture
+def forwarded_batch_sizes(monkeypatch):
+    batch_sizes = []
+    forward_batch = noop.forward_batch
+
+    async def _forward_batch(*, ctx, events):
+        batch_sizes.append(len(events))
+        await forward_batch(ctx=ctx, events=events)
+
+    monkeypatch.setattr(noop, "forward_batch", _forward_batch)
+    return batch_sizes
+
+
+@pytest.mark.asyncio
+async def test_pipeline(pipeline, collect_events_count, forwarded_batch_sizes, tmp_path):
+    with pipeline:
+        await pipeline.run()
+        # The test forwarder does not support batches, it must still get all events, in order
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        assert [event.data["count"] for event in forwarded_events] == list(
+            range(1, collect_events_count + 1)
+        )
+    assert forwarded_batch_sizes == [4, 4, 2]
+    assert len(tmp_path.joinpath("events.txt").read_text().splitlines()) == collect_events_count
+
+
+@pytest.mark.parametrize("collect_events_count", [3])
+@pytest.mark.parametrize("batch_size", [100])
+@pytest.mark.asyncio
+async def test_partial_batch_on_collectors_end(
+    pipeline, collect_events_count, forwarded_batch_sizes
+):
+    with pipeline:
+        await pipeline.run()
+        assert len(pipeline.shared_cache["collected_events"]) == collect_events_count
+    # The batch never fills up, it's forwarded once the collector stops
+    assert forwarded_batch_sizes == [3]
+
+
+@pytest.mark.parametrize("collect_events_count", [3])
+@pytest.mark.parametrize("collect_interval", [0.2])
+@pytest.mark.parametrize("batch_size", [100])
+@pytest.mark.parametrize("batch_timeout", [0.05])
+@pytest.mark.asyncio
+async def test_batch_timeout(pipeline, collect_events_count, forwarded_batch_sizes):
+    with pipeline:
+        await pipeline.run()
+        assert len(pipeline.shared_cache["collected_events"]) == collect_events_count
+    # The batch never fills up, each event is forwarded once the batch timeout is reached
+    assert forwarded_batch_sizes == [1, 1, 1]
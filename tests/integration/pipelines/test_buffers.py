@@ -0,0 +1,89 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def collect_events_count():
+    return 5
+
+
+@pytest.fixture
+def collectors_config(collect_events_count):
+    return {
+        "test-collector": {
+            "plugin": "test",
+            "count": collect_events_count,
+            "interval": 0.01,
+        },
+    }
+
+
+@pytest.fixture
+def processors_config():
+    return {
+        "test-processor": {
+            "plugin": "test",
+            "delay": 0.2,
+        },
+    }
+
+
+@pytest.fixture
+def forwarders_config():
+    return {
+        "test-forwarder": {
+            "plugin": "test",
+            "sleep": 0.2,
+            "add_event_to_shared_cache": True,
+        },
+    }
+
+
+@pytest.fixture
+def overflow_policy():
+    return "block"
+
+
+@pytest.fixture
+def pipelines_config(pipelines_config, pipeline_name, overflow_policy):
+    pipelines_config[pipeline_name]["buffers"] = {
+        "process": {"size": 1},
+        "forward": {"size": 1},
+    }
+    pipelines_config[pipeline_name]["overflow_policy"] = overflow_policy
+    return pipelines_config
+
+
+@pytest.mark.asyncio
+async def test_stages_overlap(pipeline, collect_events_count):
+    with pipeline:
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        await pipeline.run()
+        duration = loop.time() - start
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        assert [event.data["count"] for event in forwarded_events] == list(
+            range(1, collect_events_count + 1)
+        )
+    # Processing and forwarding each take 0.2 seconds per event. Running them in lockstep
+    # would take, at least, 2 seconds. Since the stages overlap, the first event
+    # is being forwarded while the second is being processed, and so on.
+    assert duration < 1.6
+
+
+@pytest.mark.parametrize("collect_events_count", [20])
+@pytest.mark.parametrize("overflow_policy", ["drop_newest", "drop_oldest", "sample"])
+@pytest.mark.asyncio
+async def test_overflow_policy(pipeline, collect_events_count):
+    with pipeline:
+        await pipeline.run()
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        dropped = pipeline.buffers["process"].dropped + pipeline.buffers["forward"].dropped
+        assert dropped
+        assert len(forwarded_events) + dropped == collect_events_count
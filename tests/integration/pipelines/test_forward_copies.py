@@ -0,0 +1,60 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture
+def forwarders_config():
+    return {
+        "first-forwarder": {
+            "plugin": "test",
+            "add_event_to_shared_cache": True,
+        },
+        "second-forwarder": {
+            "plugin": "test",
+            "add_event_to_shared_cache": True,
+        },
+        "mutating-forwarder": {
+            "plugin": "test",
+            "add_event_to_shared_cache": True,
+            "read_only": False,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_read_only_forwarders_share_events(pipeline, collect_events_count):
+    with pipeline:
+        await pipeline.run()
+        assert [target.copy_events for target in pipeline.forward_targets] == [
+            False,
+            False,
+            True,
+        ]
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        assert len(forwarded_events) == collect_events_count * 3
+        for idx in range(collect_events_count):
+            first, second, mutating = forwarded_events[idx * 3 : idx * 3 + 3]
+            assert first is second
+            assert mutating is not first
+            assert mutating == first
+
+
+@pytest.mark.parametrize(
+    "forwarders_config",
+    [
+        {
+            "first-forwarder": {"plugin": "test", "read_only": False},
+            "second-forwarder": {"plugin": "test", "read_only": False},
+        }
+    ],
+)
+def test_mutating_forwarders_copies(pipeline):
+    with pipeline:
+        pipeline._build_contexts()  # noqa: SLF001
+        # Without read only forwarders to share the events with, the last forwarder
+        # gets the original events
+        assert [target.copy_events for target in pipeline.forward_targets] == [True, False]
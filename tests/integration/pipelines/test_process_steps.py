@@ -0,0 +1,142 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from saf.process import test as test_process
+
+
+@pytest.fixture
+def processors_config():
+    return {
+        "first-processor": {
+            "plugin": "test",
+        },
+        "second-processor": {
+            "plugin": "test",
+            "child_events_count": 1,
+        },
+        "concurrent-processor": {
+            "plugin": "test",
+            "concurrency": 2,
+        },
+        "last-processor": {
+            "plugin": "test",
+        },
+    }
+
+
+def test_process_steps(pipeline):
+    with pipeline:
+        pipeline._build_contexts()  # noqa: SLF001
+        # The consecutive processors which process a batch at a time are chained
+        # into a single step
+        assert [(step.task_limit, step.ordered) for step in pipeline.process_steps] == [
+            (1, True),
+            (2, True),
+            (1, True),
+        ]
+    assert pipeline.process_steps == []
+
+
+@pytest.mark.asyncio
+async def test_pipeline(pipeline, collect_events_count):
+    with pipeline:
+        await pipeline.run()
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        assert [event.data["count"] for event in forwarded_events] == [
+            count for count in range(1, collect_events_count + 1) for _ in range(2)
+        ]
+        assert ["second-processor-child-count" in event.data for event in forwarded_events] == [
+            False,
+            True,
+        ] * collect_events_count
+
+
+@pytest.mark.parametrize("collect_events_count", [1])
+@pytest.mark.parametrize(
+    "processors_config",
+    [
+        {
+            "slow-processor": {"plugin": "test", "delay": 0.2, "child_events_count": 2},
+            "last-processor": {"plugin": "test"},
+        },
+        {
+            "slow-processor": {
+                "plugin": "test",
+                "delay": 0.2,
+                "child_events_count": 2,
+                "concurrency": 2,
+            },
+            "last-processor": {"plugin": "test", "concurrency": 2, "ordered": False},
+        },
+    ],
+    ids=["chained", "concurrent"],
+)
+@pytest.mark.asyncio
+async def test_processed_events_are_streamed(pipeline):
+    with pipeline:
+        running = asyncio.ensure_future(pipeline.run())
+        try:
+            while not pipeline.shared_cache.get("collected_events"):
+                await asyncio.sleep(0.01)
+            # The parent event is forwarded while the child events are still being generated
+            assert len(pipeline.shared_cache["collected_events"]) == 1
+            await asyncio.wait_for(running, 5)
+        finally:
+            running.cancel()
+        assert len(pipeline.shared_cache["collected_events"]) == 3
+
+
+@pytest.fixture
+def batch_size():
+    return 1
+
+
+@pytest.fixture
+def pipelines_config(pipelines_config, pipeline_name, batch_size):
+    pipelines_config[pipeline_name]["batch_size"] = batch_size
+    return pipelines_config
+
+
+@pytest.fixture
+def processed_batch_sizes(monkeypatch):
+    batch_sizes: dict[str, list[int]] = {}
+
+    async def _process_batch(*, ctx, events):
+        batch_sizes.setdefault(ctx.config.name, []).append(len(events))
+        for event in events:
+            async for processed_event in test_process.process(ctx=ctx, event=event):
+                yield processed_event
+
+    monkeypatch.setattr(test_process, "process_batch", _process_batch, raising=False)
+    return batch_sizes
+
+
+@pytest.mark.parametrize("collect_events_count", [4])
+@pytest.mark.parametrize("batch_size", [4])
+@pytest.mark.parametrize(
+    "processors_config",
+    [
+        {
+            "first-processor": {"plugin": "test"},
+            "second-processor": {"plugin": "test"},
+        },
+    ],
+)
+@pytest.mark.asyncio
+async def test_chained_processors_get_batches(
+    pipeline, collect_events_count, processed_batch_sizes
+):
+    with pipeline:
+        await pipeline.run()
+        assert len(pipeline.shared_cache["collected_events"]) == collect_events_count
+    # The processors after the first one get the processed batch, not one event at a time
+    assert processed_batch_sizes == {
+        "first-processor": [collect_events_count],
+        "second-processor": [collect_events_count],
+    }
@@ -0,0 +1,136 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from saf.executors import ThreadPoolPluginExecutor
+from saf.forward import test as test_forwarder
+from saf.models import PipelineRunContext
+
+
+@pytest.fixture
+def collectors_config(collect_events_count):
+    return {
+        "test-collector": {
+            "plugin": "test",
+            "count": collect_events_count,
+            "interval": 0.05,
+            "executor": "thread",
+        },
+    }
+
+
+@pytest.fixture
+def processors_config():
+    return {
+        "test-processor": {
+            "plugin": "test",
+            "executor": "thread",
+            "executor_workers": 2,
+        },
+    }
+
+
+@pytest.fixture
+def forwarders_config():
+    return {
+        "test-forwarder": {
+            "plugin": "test",
+            "add_event_to_shared_cache": True,
+            "executor": "thread",
+            "executor_workers": 1,
+        },
+    }
+
+
+@pytest.fixture
+def forwarder_thread_names(monkeypatch):
+    thread_names = set()
+    forward = test_forwarder.forward
+
+    async def _forward(*, ctx, event):
+        thread_names.add(threading.current_thread().name)
+        await forward(ctx=ctx, event=event)
+
+    monkeypatch.setattr(test_forwarder, "forward", _forward)
+    return thread_names
+
+
+@pytest.mark.asyncio
+async def test_pipeline(pipeline, collect_events_count, forwarder_thread_names):
+    with pipeline:
+        await pipeline.run()
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        assert [event.data["count"] for event in forwarded_events] == list(
+            range(1, collect_events_count + 1)
+        )
+        assert pipeline.collect_executors["test-collector"].calls == 1
+        assert pipeline.process_executors["test-processor"].calls == collect_events_count
+        forward_executor = pipeline.forward_executors["test-forwarder"]
+        assert forward_executor.calls == collect_events_count
+        assert forward_executor.errors == 0
+        assert forward_executor.busy_time > 0
+        stats = pipeline.get_stats()
+        assert stats["collect"]["test-collector"]["executor"]["calls"] == 1
+        assert stats["process"]["test-processor"]["executor"]["workers"] == 2
+        assert stats["forward"]["test-forwarder"]["executor"] == {
+            "workers": 1,
+            "active": 0,
+            "calls": collect_events_count,
+            "errors": 0,
+            "busy_time": forward_executor.busy_time,
+        }
+        loops = [
+            loop
+            for executor in (
+                pipeline.collect_executors["test-collector"],
+                pipeline.process_executors["test-processor"],
+                forward_executor,
+            )
+            for loop in executor._loops.values()  # noqa: SLF001
+        ]
+        assert loops
+    assert forwarder_thread_names == {"saf-test-forwarder_0"}
+    assert not pipeline.forward_executors
+    # The threads event loops are closed once the pipeline stops
+    assert all(loop.is_closed() for loop in loops)
+    # And their statistics are no longer reported
+    assert "executor" not in pipeline.get_stats()["forward"]["test-forwarder"]
+
+
+@pytest.mark.asyncio
+async def test_collect_stopped_before_the_thread_runs(analytics_config):
+    config = analytics_config.collectors["test-collector"].model_copy(
+        update={"executor_workers": 1}
+    )
+    executor = ThreadPoolPluginExecutor(PipelineRunContext(config=config))
+    # Keep the only thread busy, the collector can't start yet
+    release = threading.Event()
+    executor._pool.submit(release.wait)  # noqa: SLF001
+    events = executor.collect()
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.sleep(0.05)
+    next_event.cancel()
+    await asyncio.gather(next_event, return_exceptions=True)
+    await events.aclose()
+    release.set()
+    # Once the thread is free, it doesn't run the stopped collector, which would block
+    # the thread forever, with no one to take its events
+    for _ in range(100):
+        if executor.calls:
+            break
+        await asyncio.sleep(0.01)
+    assert executor.get_stats()["active"] == 0
+    assert executor.calls == 1
+    executor.shutdown()
+
+
+def test_process_executor_only_for_processors(analytics_config):
+    config_cls = type(analytics_config.forwarders["test-forwarder"])
+    with pytest.raises(ValueError, match="only supported by process plugins"):
+        config_cls(plugin="test", executor="process")
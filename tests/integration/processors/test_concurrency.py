@@ -0,0 +1,73 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def collect_events_count():
+    return 5
+
+
+@pytest.fixture
+def collectors_config(collect_events_count):
+    return {
+        "test-collector": {
+            "plugin": "test",
+            "count": collect_events_count,
+            "interval": 0.01,
+        },
+    }
+
+
+@pytest.fixture
+def ordered():
+    return True
+
+
+@pytest.fixture
+def processors_config(collect_events_count, ordered):
+    return {
+        "test-processor": {
+            "plugin": "test",
+            "delay_range": {
+                "minimum": 0.2,
+                "maximum": 0.4,
+            },
+            "concurrency": collect_events_count,
+            "ordered": ordered,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_processing(pipeline, collect_events_count):
+    with pipeline:
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        await pipeline.run()
+        duration = loop.time() - start
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        # Even though each event takes a random time to be processed, the forwarded
+        # events keep the collection order
+        assert [event.data["count"] for event in forwarded_events] == list(
+            range(1, collect_events_count + 1)
+        )
+    # Processing the events one at a time would take, at least, 1 second
+    # and, up to 2 seconds
+    assert duration < 0.75
+
+
+@pytest.mark.parametrize("ordered", [False])
+@pytest.mark.asyncio
+async def test_unordered_concurrent_processing(pipeline, collect_events_count):
+    with pipeline:
+        await pipeline.run()
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        assert sorted(event.data["count"] for event in forwarded_events) == list(
+            range(1, collect_events_count + 1)
+        )
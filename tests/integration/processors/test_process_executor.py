@@ -0,0 +1,43 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import pytest
+
+from saf.executors import ProcessPoolPluginExecutor
+
+
+@pytest.fixture
+def collect_events_count():
+    return 6
+
+
+@pytest.fixture
+def processors_config():
+    return {
+        "mask-processor": {
+            "plugin": "regex_mask",
+            "rules": {
+                "NAME": "test-collector",
+            },
+            "executor": "process",
+            "executor_workers": 2,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_pipeline(pipeline, collect_events_count):
+    with pipeline:
+        await pipeline.run()
+        executor = pipeline.process_executors["mask-processor"]
+        assert isinstance(executor, ProcessPoolPluginExecutor)
+        assert executor.workers == 2
+        forwarded_events = pipeline.shared_cache["collected_events"]
+        assert [event.data["count"] for event in forwarded_events] == list(
+            range(1, collect_events_count + 1)
+        )
+        for event in forwarded_events:
+            assert event.data["name"] == "<:NAME:>"
+    assert not pipeline.process_executors
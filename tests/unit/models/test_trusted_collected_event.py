@@ -0,0 +1,60 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+import datetime
+import json
+import pickle
+
+import pytest
+
+from saf.models import CollectedEvent
+from saf.models import TrustedCollectedEvent
+
+
+@pytest.fixture
+def event():
+    return TrustedCollectedEvent(data={"foo": "bar"})
+
+
+def test_attributes(event):
+    assert isinstance(event, CollectedEvent)
+    assert event.data == {"foo": "bar"}
+    assert event.timestamp is not None
+    assert event.timestamp.tzinfo is not None
+    assert event.model_fields_set == {"data"}
+    # Like processors do
+    event.data = {"foo": "baz"}
+    assert event.model_dump()["data"] == {"foo": "baz"}
+
+
+def test_to_model(event):
+    model = event.to_model()
+    assert isinstance(model, CollectedEvent)
+    assert model.data is event.data
+    assert model.timestamp == event.timestamp
+    assert model == event
+    assert event == model
+
+
+def test_model_attributes(event):
+    assert json.loads(event.model_dump_json())["data"] == {"foo": "bar"}
+    assert event.model_dump() == event.to_model().model_dump()
+    copied = event.model_copy()
+    assert isinstance(copied, TrustedCollectedEvent)
+    assert copied == event
+    with pytest.raises(AttributeError):
+        event.not_an_attribute  # noqa: B018
+
+
+def test_timestamp():
+    timestamp = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    event = TrustedCollectedEvent(data={"foo": "bar"}, timestamp=timestamp)
+    assert event.timestamp == timestamp
+    assert event.model_fields_set == {"data", "timestamp"}
+    assert event == CollectedEvent(data={"foo": "bar"}, timestamp=timestamp)
+
+
+def test_pickle(event):
+    unpickled = pickle.loads(pickle.dumps(event))  # noqa: S301
+    assert isinstance(unpickled, TrustedCollectedEvent)
+    assert unpickled == event
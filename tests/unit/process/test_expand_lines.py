@@ -0,0 +1,45 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import pathlib
+
+import pytest
+
+from saf.collect.file import CollectedLineEvent
+from saf.collect.file import CollectedLinesData
+from saf.collect.file import CollectedLinesEvent
+from saf.models import CollectedEvent
+from saf.models import PipelineRunContext
+from saf.process import expand_lines
+
+
+@pytest.fixture
+def ctx():
+    config = expand_lines.ExpandLinesConfig(plugin="expand_lines")
+    config._name = "test-expand-lines"  # noqa: SLF001
+    return PipelineRunContext(config=config)
+
+
+@pytest.mark.asyncio
+async def test_expand(ctx):
+    source = pathlib.Path("/var/log/test.log")
+    event = CollectedLinesEvent(
+        data=CollectedLinesData(lines=["first\n", "second\n"], source=source), backfill=True
+    )
+    expanded = [line_event async for line_event in expand_lines.process(ctx=ctx, event=event)]
+    assert [line_event.data for line_event in expanded] == [
+        {"line": "first\n", "source": source},
+        {"line": "second\n", "source": source},
+    ]
+    for line_event in expanded:
+        assert isinstance(line_event, CollectedLineEvent)
+        assert line_event.backfill
+        assert line_event.timestamp == event.timestamp
+
+
+@pytest.mark.asyncio
+async def test_passthrough(ctx):
+    event = CollectedEvent(data={"foo": "bar"})
+    assert [processed async for processed in expand_lines.process(ctx=ctx, event=event)] == [event]
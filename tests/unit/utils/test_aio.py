@@ -0,0 +1,35 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from saf.utils.aio import wait_event
+
+
+@pytest.mark.asyncio
+async def test_wait_event_set():
+    event = asyncio.Event()
+    asyncio.get_event_loop().call_later(0.01, event.set)
+    assert await wait_event(event, 1) is True
+
+
+@pytest.mark.asyncio
+async def test_wait_event_timeout():
+    event = asyncio.Event()
+    assert await wait_event(event, 0.01) is False
+    assert await wait_event(event, 0) is False
+
+
+@pytest.mark.asyncio
+async def test_wait_event_cancelled_as_it_is_set():
+    event = asyncio.Event()
+    waiting = asyncio.ensure_future(wait_event(event, 1))
+    await asyncio.sleep(0)
+    event.set()
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
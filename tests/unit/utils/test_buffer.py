@@ -0,0 +1,140 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from saf.utils.buffer import EventBuffer
+from saf.utils.buffer import OverflowPolicy
+
+
+def test_maxsize_must_be_positive():
+    with pytest.raises(ValueError, match="must be greater than 0"):
+        EventBuffer(0)
+
+
+@pytest.mark.asyncio
+async def test_put_waits_while_full():
+    buffer: EventBuffer[int] = EventBuffer(2)
+    await buffer.put(1)
+    await buffer.put(2)
+    assert buffer.full()
+    put_task = asyncio.ensure_future(buffer.put(3))
+    await asyncio.sleep(0.05)
+    assert put_task.done() is False
+    assert await buffer.get_batch() == [1]
+    await asyncio.wait_for(put_task, 1)
+    assert await buffer.get_batch(10, timeout=0) == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_get_batch_timeout():
+    buffer: EventBuffer[int] = EventBuffer(10)
+    await buffer.put(1)
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    assert await buffer.get_batch(5, timeout=0.1) == [1]
+    assert loop.time() - start >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_close_drains_remaining_items():
+    buffer: EventBuffer[int] = EventBuffer(10)
+    await buffer.put(1)
+    await buffer.put(2)
+    buffer.close()
+    assert buffer.closed
+    with pytest.raises(RuntimeError):
+        await buffer.put(3)
+    assert await buffer.get_batch(5) == [1, 2]
+    assert await buffer.get_batch(5) == []
+
+
+@pytest.mark.asyncio
+async def test_close_wakes_up_consumers():
+    buffer: EventBuffer[int] = EventBuffer(10)
+    get_task = asyncio.ensure_future(buffer.get_batch())
+    await asyncio.sleep(0.01)
+    buffer.close()
+    assert await asyncio.wait_for(get_task, 1) == []
+
+
+@pytest.mark.asyncio
+async def test_close_wakes_up_producers():
+    buffer: EventBuffer[int] = EventBuffer(1)
+    await buffer.put(1)
+    put_task = asyncio.ensure_future(buffer.put(2))
+    await asyncio.sleep(0.01)
+    buffer.close()
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(put_task, 1)
+    assert await buffer.get_batch(5) == [1]
+
+
+@pytest.mark.parametrize("overflow_policy", list(OverflowPolicy))
+@pytest.mark.asyncio
+async def test_put_into_closed_buffer(overflow_policy):
+    buffer: EventBuffer[int] = EventBuffer(1, overflow_policy=overflow_policy)
+    await buffer.put(1)
+    buffer.close()
+    # Not dropped because of the overflow policy, nor silently ignored
+    with pytest.raises(RuntimeError):
+        await buffer.put(2)
+    assert buffer.dropped == 0
+    assert await buffer.get_batch(5) == [1]
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest():
+    dropped: list[int] = []
+    buffer: EventBuffer[int] = EventBuffer(
+        2, overflow_policy=OverflowPolicy.DROP_OLDEST, on_drop=dropped.append
+    )
+    for item in range(5):
+        await buffer.put(item)
+    assert buffer.dropped == 3
+    assert dropped == [0, 1, 2]
+    assert await buffer.get_batch(5, timeout=0) == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_drop_newest():
+    dropped: list[int] = []
+    buffer: EventBuffer[int] = EventBuffer(
+        2, overflow_policy=OverflowPolicy.DROP_NEWEST, on_drop=dropped.append
+    )
+    for item in range(5):
+        await buffer.put(item)
+    assert buffer.dropped == 3
+    assert dropped == [2, 3, 4]
+    assert await buffer.get_batch(5, timeout=0) == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_sample(monkeypatch):
+    random_values = iter([0.9, 0.1, 0.9])
+    monkeypatch.setattr("random.random", lambda: next(random_values))
+    buffer: EventBuffer[int] = EventBuffer(
+        4, overflow_policy=OverflowPolicy.SAMPLE, sample_rate=0.5
+    )
+    # Below half the buffer size, all items are accepted
+    await buffer.put(0)
+    await buffer.put(1)
+    # From then on, items are only accepted if the random value is below the sample rate
+    await buffer.put(2)
+    await buffer.put(3)
+    await buffer.put(4)
+    assert buffer.dropped == 2
+    assert await buffer.get_batch(5, timeout=0) == [0, 1, 3]
+
+
+@pytest.mark.asyncio
+async def test_sample_drops_when_full():
+    buffer: EventBuffer[int] = EventBuffer(2, overflow_policy=OverflowPolicy.SAMPLE, sample_rate=1)
+    for item in range(5):
+        await buffer.put(item)
+    assert buffer.dropped == 3
+    assert await buffer.get_batch(5, timeout=0) == [0, 1]
@@ -0,0 +1,124 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import threading
+import time
+
+import pytest
+
+from saf.utils.checkpoints import OffsetCheckpoints
+from saf.utils.checkpoints import get_file_key
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "test.log"
+    path.write_text("line\n" * 10)
+    return path
+
+
+@pytest.fixture
+def checkpoints_path(tmp_path):
+    return tmp_path / "checkpoints.json"
+
+
+def test_save_and_load(log_file, checkpoints_path):
+    checkpoints = OffsetCheckpoints(checkpoints_path, save_lines=100, save_interval=60)
+    stat = log_file.stat()
+    assert checkpoints.get(stat) is None
+    checkpoints.update(get_file_key(stat), log_file, 10, 2)
+    checkpoints.save()
+    # Nothing is left behind
+    assert sorted(path.name for path in checkpoints_path.parent.iterdir()) == [
+        "checkpoints.json",
+        "test.log",
+    ]
+
+    loaded = OffsetCheckpoints(checkpoints_path, save_lines=100, save_interval=60)
+    loaded.load()
+    assert loaded.get(stat) == 10
+
+
+def test_load_drops_missing_files(log_file, checkpoints_path):
+    checkpoints = OffsetCheckpoints(checkpoints_path, save_lines=100, save_interval=60)
+    checkpoints.update(get_file_key(log_file.stat()), log_file, 10, 2)
+    checkpoints.save()
+    log_file.unlink()
+    loaded = OffsetCheckpoints(checkpoints_path, save_lines=100, save_interval=60)
+    loaded.load()
+    assert not loaded.offsets
+
+
+def test_load_corrupted(checkpoints_path):
+    checkpoints_path.write_text("{not json")
+    checkpoints = OffsetCheckpoints(checkpoints_path, save_lines=100, save_interval=60)
+    checkpoints.load()
+    assert not checkpoints.offsets
+
+
+@pytest.mark.asyncio
+async def test_run_saves_every_n_lines(log_file, checkpoints_path):
+    checkpoints = OffsetCheckpoints(checkpoints_path, save_lines=5, save_interval=60)
+    task = asyncio.ensure_future(checkpoints.run())
+    try:
+        key = get_file_key(log_file.stat())
+        checkpoints.update(key, log_file, 20, 4)
+        await asyncio.sleep(0.1)
+        assert not checkpoints_path.exists()
+        checkpoints.update(key, log_file, 25, 1)
+        for _ in range(50):
+            if checkpoints_path.exists():
+                break
+            await asyncio.sleep(0.01)
+        assert json.loads(checkpoints_path.read_text())[0]["offset"] == 25
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_run_saves_every_n_seconds(log_file, checkpoints_path):
+    checkpoints = OffsetCheckpoints(checkpoints_path, save_lines=1000, save_interval=0.1)
+    task = asyncio.ensure_future(checkpoints.run())
+    try:
+        checkpoints.update(get_file_key(log_file.stat()), log_file, 5, 1)
+        await asyncio.sleep(0.3)
+        assert json.loads(checkpoints_path.read_text())[0]["offset"] == 5
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_cancel_waits_for_write(log_file, checkpoints_path, monkeypatch):
+    checkpoints = OffsetCheckpoints(checkpoints_path, save_lines=1, save_interval=60)
+    replace = checkpoints._replace
+    writing = threading.Event()
+
+    def slow_first_replace(entries):
+        if not writing.is_set():
+            writing.set()
+            time.sleep(0.2)
+        replace(entries)
+
+    monkeypatch.setattr(checkpoints, "_replace", slow_first_replace)
+    task = asyncio.ensure_future(checkpoints.run())
+    key = get_file_key(log_file.stat())
+    checkpoints.update(key, log_file, 10, 1)
+    while not writing.is_set():
+        await asyncio.sleep(0.01)
+    checkpoints.update(key, log_file, 20, 1)
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await task
+    checkpoints.save()
+    # Give a write still in flight the time to complete
+    await asyncio.sleep(0.3)
+    assert json.loads(checkpoints_path.read_text())[0]["offset"] == 20
@@ -0,0 +1,64 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import datetime
+
+import pytest
+
+from saf.utils.cron import CronExpression
+
+
+def _dt(  # noqa: PLR0913
+    year: int, month: int, day: int, hour: int = 0, minute: int = 0, second: int = 0
+) -> datetime.datetime:
+    return datetime.datetime(year, month, day, hour, minute, second, tzinfo=datetime.timezone.utc)
+
+
+# A Sunday
+NOW = _dt(2023, 1, 1, 12, 30, 15)
+
+
+@pytest.mark.parametrize(
+    ("expression", "expected"),
+    [
+        ("* * * * *", _dt(2023, 1, 1, 12, 31)),
+        ("*/15 * * * *", _dt(2023, 1, 1, 12, 45)),
+        ("5/20 * * * *", _dt(2023, 1, 1, 12, 45)),
+        ("0 9-17 * * *", _dt(2023, 1, 1, 13, 0)),
+        ("0,10 8 * * *", _dt(2023, 1, 2, 8, 0)),
+        ("0 0 * * mon-fri", _dt(2023, 1, 2, 0, 0)),
+        ("0 0 1 feb *", _dt(2023, 2, 1, 0, 0)),
+        ("0 0 29 2 *", _dt(2024, 2, 29, 0, 0)),
+        # Either the day of the month or the day of the week
+        ("0 0 15 * 3", _dt(2023, 1, 4, 0, 0)),
+        ("0 0 * * 7", _dt(2023, 1, 8, 0, 0)),
+        ("@hourly", _dt(2023, 1, 1, 13, 0)),
+        ("@monthly", _dt(2023, 2, 1, 0, 0)),
+    ],
+)
+def test_next_after(expression, expected):
+    assert CronExpression(expression).next_after(NOW) == expected
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "* * * *",
+        "60 * * * *",
+        "* 24 * * *",
+        "* * 0 * *",
+        "*/0 * * * *",
+        "* * * foo *",
+        "5-1 * * * *",
+    ],
+)
+def test_invalid(expression):
+    with pytest.raises(ValueError, match="Invalid"):
+        CronExpression(expression)
+
+
+def test_never_matches():
+    with pytest.raises(ValueError, match="never matches"):
+        CronExpression("0 0 30 2 *").next_after(NOW)
@@ -0,0 +1,328 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import pathlib
+import queue
+import re
+import threading
+import time
+from typing import Any
+
+import pytest
+import pytest_asyncio
+import salt.payload
+import salt.transport.frame
+import salt.utils.event
+import salt.utils.msgpack
+
+from saf.models import EventBusClient
+from saf.utils import eventbus
+
+
+class FakeEventBus:
+    """
+    Salt's event bus stand-in, fed from the tests.
+    """
+
+    def __init__(self):  # noqa: D107
+        self.events: queue.Queue[dict[str, Any]] = queue.Queue()
+        self.stopped = threading.Event()
+
+    def __enter__(self):  # noqa: D105
+        return self
+
+    def __exit__(self, *_):  # noqa: D105
+        self.stopped.set()
+
+    def get_event(self, wait=5, **_):  # noqa: D102
+        try:
+            return self.events.get(timeout=wait)
+        except queue.Empty:
+            return None
+
+    def fire_event(self, tag, data=None):  # noqa: D102
+        self.events.put(
+            {
+                "tag": tag,
+                "data": {
+                    "tag": tag,
+                    "data": data or {},
+                    "_stamp": "2023-01-01T00:00:00.000000",
+                },
+            }
+        )
+
+
+@pytest.fixture
+def connections():
+    return []
+
+
+@pytest.fixture
+def event_bus(monkeypatch, connections):
+    bus = FakeEventBus()
+
+    def _get_event(*_, **__):
+        connections.append(bus)
+        return bus
+
+    monkeypatch.setattr(salt.utils.event, "get_event", _get_event)
+    monkeypatch.setattr(eventbus, "GET_EVENT_WAIT", 0.05)
+    return bus
+
+
+@pytest.fixture
+def opts():
+    return {"__role": "minion", "sock_dir": "", "transport": "zeromq"}
+
+
+@pytest.mark.asyncio
+async def test_iter_events(event_bus, opts):
+    events = eventbus.iter_events(tags={"salt/job/*"}, opts=opts)
+    event_bus.fire_event("salt/auth")
+    event_bus.fire_event("salt/job/1", {"foo": "bar"})
+    salt_event = await asyncio.wait_for(events.__anext__(), 5)
+    assert salt_event.tag == "salt/job/1"
+    assert salt_event.data == {"foo": "bar"}
+
+    # The events are handed to the loop as soon as they're fired, there's no polling
+    start = time.perf_counter()
+    event_bus.fire_event("salt/job/2")
+    salt_event = await asyncio.wait_for(events.__anext__(), 5)
+    assert salt_event.tag == "salt/job/2"
+    assert time.perf_counter() - start < 0.05
+
+    await events.aclose()
+    # The event bus subscription is closed once there are no more subscribers
+    loop = asyncio.get_event_loop()
+    assert await loop.run_in_executor(None, event_bus.stopped.wait, 5)
+    assert not eventbus._HUBS  # noqa: SLF001
+
+
+@pytest.mark.asyncio
+async def test_shared_subscription(event_bus, opts, connections):
+    job_events = eventbus.iter_events(tags={"salt/job/*"}, opts=opts)
+    all_events = eventbus.iter_events(tags={"salt/*"}, opts=opts)
+    next_job_event = asyncio.ensure_future(job_events.__anext__())
+    next_event = asyncio.ensure_future(all_events.__anext__())
+    await asyncio.sleep(0.1)
+    event_bus.fire_event("salt/auth")
+    event_bus.fire_event("salt/job/1")
+    assert (await asyncio.wait_for(next_event, 5)).tag == "salt/auth"
+    assert (await asyncio.wait_for(all_events.__anext__(), 5)).tag == "salt/job/1"
+    # The event is constructed once for all subscribers
+    job_event = await asyncio.wait_for(next_job_event, 5)
+    assert job_event.tag == "salt/job/1"
+    assert len(connections) == 1
+
+    # The subscription is kept while there are subscribers
+    await job_events.aclose()
+    event_bus.fire_event("salt/job/2")
+    assert (await asyncio.wait_for(all_events.__anext__(), 5)).tag == "salt/job/2"
+    assert not event_bus.stopped.is_set()
+
+    await all_events.aclose()
+    loop = asyncio.get_event_loop()
+    assert await loop.run_in_executor(None, event_bus.stopped.wait, 5)
+    assert len(connections) == 1
+
+
+@pytest.mark.parametrize(
+    "tag",
+    [
+        "salt/job/20230101000000000000/new",
+        "salt/job/20230101000000000000/ret/minion-1",
+        "salt/beacon/minion-1/memusage/",
+        "salt/beacon/minion-1/status/",
+        "salt/auth",
+        "salt/job/20230101000000000000/prog/minion-1/0",
+        "minion_start",
+    ],
+)
+def test_compile_tag_patterns(tag):
+    patterns = {
+        "salt/job/*/ret/*",
+        "salt/beacon/*/memusage/*",
+        "salt/beacon/*/status/*",
+        "minion_[!a-z]tart",
+    }
+    regex = eventbus.compile_tag_patterns(patterns)
+    assert (regex.match(tag) is not None) is any(
+        fnmatch.fnmatchcase(tag, pattern) for pattern in patterns
+    )
+
+
+def test_compile_no_tag_patterns():
+    assert eventbus.compile_tag_patterns(set()).match("salt/auth") is None
+
+
+def test_construct_event_shares_data():
+    payload: dict[str, Any] = {
+        "tag": "salt/beacon/minion-1/memusage/",
+        "data": {"memusage": 42.0, "nested": {"list": [1, 2, 3]}},
+        "beacon_name": "memusage",
+        "_stamp": "2023-01-01T00:00:00.000000",
+    }
+    salt_event = eventbus._construct_event(payload["tag"], payload)  # noqa: SLF001
+    assert salt_event is not None
+    assert salt_event.tag == "salt/beacon/minion-1/memusage/"
+    assert salt_event.stamp.tzinfo is not None
+    # Nothing is copied
+    assert salt_event.raw_data is payload
+    assert salt_event.data is payload["data"]
+    # Nor modified
+    assert "_stamp" in payload
+
+
+def test_construct_event_filters_private_keys():
+    ret = {"local": {"state_|-foo_|-foo_|-run": {"result": True}}}
+    payload = {
+        "jid": "20230101000000000000",
+        "id": "minion-1",
+        "return": ret,
+        "_stamp": "2023-01-01T00:00:00.000000",
+    }
+    tag = "salt/job/20230101000000000000/ret/minion-1"
+    salt_event = eventbus._construct_event(tag, payload)  # noqa: SLF001
+    assert salt_event is not None
+    assert salt_event.data == {"jid": "20230101000000000000", "id": "minion-1", "return": ret}
+    assert salt_event.data["return"] is ret
+    assert salt_event.raw_data is payload
+
+
+def test_construct_event_failure():
+    assert eventbus._construct_event("salt/auth", {"data": {}}) is None  # noqa: SLF001
+
+
+class FakePublisher:
+    """
+    Salt's event publisher stand-in, fed from the tests.
+    """
+
+    def __init__(self, path, length_prefix=eventbus.IPC_LENGTH_PREFIX):  # noqa: D107
+        self.path = path
+        # Whether to send the messages like newer Salt releases, prefixed with their length
+        self.length_prefix = length_prefix
+        self.writers = []
+        self.connected = asyncio.Event()
+        self.server: asyncio.AbstractServer | None = None
+
+    async def start(self):  # noqa: D102
+        self.server = await asyncio.start_unix_server(self._handle_connection, path=str(self.path))
+
+    async def stop(self):  # noqa: D102
+        assert self.server is not None
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle_connection(self, _, writer):
+        self.writers.append(writer)
+        self.connected.set()
+
+    async def fire_event(self, tag, data=None):  # noqa: D102
+        payload = (
+            tag.encode()
+            + salt.utils.event.TAGEND.encode()
+            + salt.payload.dumps({"data": data or {}, "_stamp": "2023-01-01T00:00:00.000000"})
+        )
+        if self.length_prefix:
+            message = salt.transport.frame.frame_msg_ipc(payload, raw_body=True)
+        else:
+            message = salt.utils.msgpack.dumps({"head": {}, "body": payload}, use_bin_type=True)
+        for writer in self.writers:
+            writer.write(message)
+            await writer.drain()
+
+
+@pytest.fixture
+def async_opts(tmp_path):
+    return {"__role": "master", "sock_dir": str(tmp_path), "transport": "zeromq"}
+
+
+@pytest_asyncio.fixture
+async def publisher(async_opts):
+    publisher = FakePublisher(eventbus.get_publisher_path(async_opts))
+    await publisher.start()
+    yield publisher
+    await publisher.stop()
+
+
+@pytest.mark.asyncio
+async def test_iter_events_asyncio(publisher, async_opts):
+    events = eventbus.iter_events(
+        tags={"salt/job/*"}, opts=async_opts, client=EventBusClient.ASYNCIO
+    )
+    next_event = asyncio.ensure_future(events.__anext__())
+    await asyncio.wait_for(publisher.connected.wait(), 5)
+    await publisher.fire_event("salt/auth")
+    await publisher.fire_event("salt/job/1", {"foo": "bar"})
+    salt_event = await asyncio.wait_for(next_event, 5)
+    assert salt_event.tag == "salt/job/1"
+    assert salt_event.data == {"foo": "bar"}
+    # The hub runs on the subscriber's loop, there's no thread
+    hub = eventbus._HUBS[  # noqa: SLF001
+        eventbus._get_hub_key(  # noqa: SLF001
+            async_opts, EventBusClient.ASYNCIO, asyncio.get_event_loop()
+        )
+    ]
+    assert isinstance(hub, eventbus.AsyncEventBusHub)
+
+    await events.aclose()
+    await asyncio.sleep(0)
+    assert not eventbus._HUBS  # noqa: SLF001
+
+
+@pytest.mark.asyncio
+async def test_iter_events_asyncio_reconnects(async_opts, monkeypatch):
+    monkeypatch.setattr(eventbus, "RECONNECT_WAIT", 0.05)
+    events = eventbus.iter_events(
+        tags={"salt/job/*"}, opts=async_opts, client=EventBusClient.ASYNCIO
+    )
+    next_event = asyncio.ensure_future(events.__anext__())
+    # The publisher is not listening yet
+    await asyncio.sleep(0.1)
+    publisher = FakePublisher(eventbus.get_publisher_path(async_opts))
+    await publisher.start()
+    try:
+        await asyncio.wait_for(publisher.connected.wait(), 5)
+        await publisher.fire_event("salt/job/1")
+        assert (await asyncio.wait_for(next_event, 5)).tag == "salt/job/1"
+    finally:
+        await events.aclose()
+        await publisher.stop()
+
+
+@pytest.mark.asyncio
+async def test_iter_events_asyncio_unprefixed_messages(async_opts, monkeypatch):
+    # Older Salt releases don't prefix the event publisher messages with their length
+    monkeypatch.setattr(eventbus, "IPC_LENGTH_PREFIX", False)
+    publisher = FakePublisher(eventbus.get_publisher_path(async_opts), length_prefix=False)
+    await publisher.start()
+    events = eventbus.iter_events(
+        tags={"salt/job/*"}, opts=async_opts, client=EventBusClient.ASYNCIO
+    )
+    try:
+        next_event = asyncio.ensure_future(events.__anext__())
+        await asyncio.wait_for(publisher.connected.wait(), 5)
+        await publisher.fire_event("salt/job/1", {"foo": "bar"})
+        salt_event = await asyncio.wait_for(next_event, 5)
+        assert salt_event.tag == "salt/job/1"
+        assert salt_event.data == {"foo": "bar"}
+    finally:
+        await events.aclose()
+        await publisher.stop()
+
+
+def test_get_publisher_path():
+    opts = {"__role": "master", "sock_dir": "/var/run/salt/master"}
+    assert eventbus.get_publisher_path(opts) == pathlib.Path(
+        "/var/run/salt/master/master_event_pub.ipc"
+    )
+    opts = {"__role": "minion", "sock_dir": "/var/run/salt/minion", "id": "minion-1"}
+    path = eventbus.get_publisher_path(opts)
+    assert path.parent == pathlib.Path("/var/run/salt/minion")
+    assert re.match(r"minion_event_[0-9a-f]{10}_pub\.ipc", path.name)
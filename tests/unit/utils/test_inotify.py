@@ -0,0 +1,67 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from saf.utils import inotify
+
+pytestmark = pytest.mark.skipif(not inotify.HAS_INOTIFY, reason="inotify is not available")
+
+
+@pytest.mark.asyncio
+async def test_wait(tmp_path):
+    path = tmp_path / "test.log"
+    path.write_text("")
+    watcher = inotify.Inotify()
+    try:
+        watch = watcher.add_watch(path)
+        assert await watch.wait(timeout=0.05) is False
+        with path.open("a") as wfh:
+            wfh.write("line\n")
+        assert await watch.wait(timeout=5) is True
+        # The change was consumed
+        assert await watch.wait(timeout=0.05) is False
+    finally:
+        watcher.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_watch_descriptor(tmp_path):
+    path = tmp_path / "test.log"
+    path.write_text("")
+    watcher = inotify.Inotify()
+    try:
+        first = watcher.add_watch(path)
+        second = watcher.add_watch(path)
+        assert first.wd == second.wd
+        first.close()
+        path.write_text("line\n")
+        assert await second.wait(timeout=5) is True
+        second.close()
+        assert not watcher.watches
+    finally:
+        watcher.close()
+
+
+@pytest.mark.asyncio
+async def test_deleted_file(tmp_path):
+    path = tmp_path / "test.log"
+    path.write_text("")
+    watcher = inotify.Inotify()
+    try:
+        watch = watcher.add_watch(path)
+        path.unlink()
+        assert await watch.wait(timeout=5) is True
+        # Wait for the kernel to remove the watch
+        for _ in range(50):
+            if not watch.active:
+                break
+            await asyncio.sleep(0.01)
+        assert not watch.active
+        watch.close()
+    finally:
+        watcher.close()
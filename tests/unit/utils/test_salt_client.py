@@ -3,13 +3,29 @@
 #
 from __future__ import annotations
 
+import asyncio
+import collections
+
 import pytest
 import salt.config
+import salt.loader
+import salt.pillar
 
+from saf.collect import salt_exec
+from saf.models import AnalyticsConfig
+from saf.models import PipelineRunContext
+from saf.utils import salt as salt_utils
 from saf.utils.salt import MasterClient
 from saf.utils.salt import MinionClient
 
 
+@pytest.fixture(autouse=True)
+def _loaders(monkeypatch):
+    # Don't share the loaded modules, and minions, across tests
+    monkeypatch.setattr(salt_utils, "_MINION_MODS", collections.OrderedDict())
+    monkeypatch.setattr(salt_utils, "_SMINIONS", collections.OrderedDict())
+
+
 @pytest.fixture
 def minion_opts(tmp_path):
     """
@@ -38,3 +54,63 @@ async def test_minin_client_missing_func(minion_opts):
     client = MinionClient(minion_opts)
     with pytest.raises(RuntimeError):
         await client.cmd("this_func.does_not_exist")
+
+
+def test_opts_fingerprint():
+    fingerprint = salt_utils.get_opts_fingerprint({"a": 1, "b": {"c": [1, 2]}})
+    assert fingerprint == salt_utils.get_opts_fingerprint({"b": {"c": [1, 2]}, "a": 1})
+    assert fingerprint != salt_utils.get_opts_fingerprint({"a": 1, "b": {"c": [2, 1]}})
+
+
+def test_sminion_shared(minion_opts):
+    client = MinionClient(minion_opts)
+    # The passed options are not modified
+    assert minion_opts["file_client"] == "remote"
+    assert MinionClient(minion_opts.copy())._client is client._client  # noqa: SLF001
+    sminion = salt_utils.get_sminion(dict(minion_opts, file_client="local"))
+    assert sminion is client._client  # noqa: SLF001
+    other_opts = dict(minion_opts, file_client="local", id="other")
+    assert salt_utils.get_sminion(other_opts) is not sminion
+
+
+def test_loaders_cache_size(minion_opts, monkeypatch):
+    monkeypatch.setattr(salt_utils, "LOADERS_CACHE_SIZE", 2)
+    monkeypatch.setattr(salt.loader, "minion_mods", lambda _: object())
+    first = salt_utils.get_minion_mods(dict(minion_opts, id="first"))
+    salt_utils.get_minion_mods(dict(minion_opts, id="second"))
+    # Using it makes it the most recently used one
+    assert salt_utils.get_minion_mods(dict(minion_opts, id="first")) is first
+    salt_utils.get_minion_mods(dict(minion_opts, id="third"))
+    assert len(salt_utils._MINION_MODS) == 2  # noqa: SLF001
+    assert salt_utils.get_minion_mods(dict(minion_opts, id="first")) is first
+
+
+@pytest.mark.asyncio
+async def test_collectors_share_minion_mods(minion_opts, monkeypatch):
+    def _not_compiled(*args, **kwargs):
+        pytest.fail("Neither the grains, nor the pillar, should be compiled")
+
+    monkeypatch.setattr(salt.loader, "grains", _not_compiled)
+    monkeypatch.setattr(salt.pillar, "get_pillar", _not_compiled)
+    loaded = []
+    minion_mods = salt.loader.minion_mods
+
+    def _minion_mods(opts):
+        loaded.append(opts)
+        return minion_mods(opts)
+
+    monkeypatch.setattr(salt.loader, "minion_mods", _minion_mods)
+    analytics_config = AnalyticsConfig.model_construct(
+        collectors={}, processors={}, forwarders={}, pipelines={}, salt_config=minion_opts
+    )
+    collectors = []
+    for name in ("first", "second"):
+        config = salt_exec.SaltExecConfig(plugin="salt_exec", fn="test.ping")
+        config._name = name  # noqa: SLF001
+        config._parent = analytics_config  # noqa: SLF001
+        collectors.append(salt_exec.collect(ctx=PipelineRunContext(config=config)))
+    for events in collectors:
+        event = await asyncio.wait_for(events.__anext__(), 30)
+        assert event.data == {"fn": "test.ping", "ret": True}
+        await events.aclose()
+    assert loaded == [minion_opts]
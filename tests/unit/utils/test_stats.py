@@ -0,0 +1,58 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+#
+from __future__ import annotations
+
+import pytest
+
+from saf.utils.stats import LatencyHistogram
+from saf.utils.stats import StageStats
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.to_dict() == {
+        "count": 0,
+        "mean": 0.0,
+        "p50": 0.0,
+        "p95": 0.0,
+        "p99": 0.0,
+        "max": 0.0,
+    }
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.record(0.001)
+    for _ in range(9):
+        histogram.record(0.1)
+    histogram.record(2)
+    assert histogram.count == 100
+    assert histogram.max == 2
+    assert histogram.total == pytest.approx(0.09 + 0.9 + 2)
+    # The percentiles are the upper bound of the bucket they fall in
+    assert 0.001 <= histogram.percentile(50) < 0.001 * 1.5
+    assert 0.1 <= histogram.percentile(95) < 0.1 * 1.5
+    assert 0.1 <= histogram.percentile(99) < 0.1 * 1.5
+    # But never larger than the largest recorded value
+    assert histogram.percentile(100) == 2
+
+
+def test_histogram_overflow_bucket():
+    histogram = LatencyHistogram()
+    histogram.record(100000)
+    assert histogram.percentile(50) == 100000
+
+
+def test_stage_stats():
+    stats = StageStats()
+    stats.record(2, 1, 0.5)
+    stats.record(3, 3, 0.5)
+    stats.errors += 1
+    data = stats.to_dict()
+    assert data["events_in"] == 5
+    assert data["events_out"] == 4
+    assert data["errors"] == 1
+    assert data["latency"]["count"] == 2
+    assert data["latency"]["mean"] == 0.5
@@ -10,6 +10,7 @@ import ptscripts
 ptscripts.register_tools_module("tools.ci")
 ptscripts.register_tools_module("tools.pre_commit")
 ptscripts.register_tools_module("tools.examples")
+ptscripts.register_tools_module("tools.bench")
 
 for name in ("boto3", "botocore", "urllib3"):
     logging.getLogger(name).setLevel(logging.INFO)
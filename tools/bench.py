@@ -0,0 +1,746 @@
+# Copyright 2023 VMware, Inc.
+# SPDX-License-Identifier: Apache-2.0
+"""
+These commands are used to benchmark the salt-analytics-framework.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import copy
+import fnmatch
+import functools
+import logging
+import pathlib
+import tempfile
+import threading
+import time
+import timeit
+import tracemalloc
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Callable
+
+from ptscripts import Context
+from ptscripts import command_group
+
+if TYPE_CHECKING:
+    import re
+
+log = logging.getLogger(__name__)
+
+# Define the command group
+cgroup = command_group(name="bench", help="Benchmark Related Commands", description=__doc__)
+
+
+async def _run_pipeline(pipeline_config: dict[str, Any], **config: dict[str, Any]) -> float:
+    # Imported here to not slow down other commands
+    from saf.models import AnalyticsConfig
+    from saf.pipeline import Pipeline
+
+    analytics_config = AnalyticsConfig.model_validate(
+        {
+            "pipelines": {"bench": dict(pipeline_config, enabled=True, restart=False)},
+            "salt_config": {},
+            **config,
+        }
+    )
+    with Pipeline("bench", analytics_config.pipelines["bench"]) as pipeline:
+        start = time.perf_counter()
+        await pipeline.run()
+        return time.perf_counter() - start
+
+
+@cgroup.command(
+    name="processors",
+    arguments={
+        "events": {
+            "help": "The number of events to pass through the pipeline.",
+        },
+        "processors": {
+            "help": "The number of chained processors to benchmark.",
+            "nargs": "+",
+            "type": int,
+        },
+        "rounds": {
+            "help": "Run each benchmark this many times and report the best round.",
+        },
+    },
+)
+def processors(
+    ctx: Context,
+    events: int = 20000,
+    processors: list[int] = [1, 3, 10],  # noqa: B006
+    rounds: int = 3,
+):
+    """
+    Measure the events per second passing through a chain of test processors.
+    """
+    # Don't measure how fast we can log
+    logging.getLogger("saf").setLevel(logging.WARNING)
+    for count in processors:
+        config = {
+            "collectors": {
+                "bench-collector": {
+                    "plugin": "test",
+                    "count": events,
+                    # As fast as the event loop allows
+                    "interval": 1e-9,
+                },
+            },
+            "processors": {f"bench-processor-{idx}": {"plugin": "test"} for idx in range(count)},
+            "forwarders": {"bench-forwarder": {"plugin": "noop"}},
+        }
+        pipeline_config = {
+            "collect": list(config["collectors"]),
+            "process": list(config["processors"]),
+            "forward": list(config["forwarders"]),
+        }
+        best = min(asyncio.run(_run_pipeline(pipeline_config, **config)) for _ in range(rounds))
+        ctx.info(
+            f"{count:>3} chained processors: {events / best:>10,.0f} events/sec "
+            f"({events} events in {best:.3f} seconds)"
+        )
+
+
+@cgroup.command(
+    name="events",
+    arguments={
+        "events": {
+            "help": "The number of events to create.",
+        },
+    },
+)
+def events(ctx: Context, events: int = 100000):
+    """
+    Measure the construction rate, and memory usage, of the collected events implementations.
+    """
+    # Imported here to not slow down other commands
+    from saf.models import CollectedEvent
+    from saf.models import TrustedCollectedEvent
+
+    # All events share the same data, only the event overhead is measured
+    data = {"name": "bench", "count": 1}
+    implementations: dict[str, Callable[[], Any]] = {
+        "CollectedEvent": lambda: CollectedEvent(data=data),
+        "CollectedEvent.model_construct": lambda: CollectedEvent.model_construct(data=data),
+        "TrustedCollectedEvent": lambda: TrustedCollectedEvent(data=data),
+    }
+    for name, factory in implementations.items():
+        duration = min(timeit.repeat(factory, number=events, repeat=3))
+        tracemalloc.start()
+        created = [factory() for _ in range(events)]
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del created
+        ctx.info(
+            f"{name:>30}: {events / duration:>10,.0f} events/sec, "
+            f"{memory / events:>6.0f} bytes/event"
+        )
+
+
+@cgroup.command(
+    name="tags",
+    arguments={
+        "events": {
+            "help": "The number of event tags to match.",
+        },
+        "patterns": {
+            "help": "The number of tag patterns to benchmark.",
+            "nargs": "+",
+            "type": int,
+        },
+    },
+)
+def tags(ctx: Context, events: int = 100000, patterns: list[int] = [2, 10, 100]):  # noqa: B006
+    """
+    Measure the event tags per second matched against the event bus tag patterns.
+
+    The tags are a mix of job tags, each job with a new JID, and beacon tags, which repeat.
+    """
+    # Imported here to not slow down other commands
+    from saf.utils.eventbus import TAG_CACHE_SIZE
+    from saf.utils.eventbus import compile_tag_patterns
+
+    minions = [f"minion-{idx}" for idx in range(100)]
+    beacons = [f"beacon-{idx}" for idx in range(max(patterns))]
+    event_tags = []
+    for idx in range(events // (len(minions) * 4)):
+        jid = f"20230101{idx:012d}"
+        event_tags.append(f"salt/job/{jid}/new")
+        for minion in minions:
+            event_tags.append(f"salt/job/{jid}/ret/{minion}")
+            event_tags.append(f"salt/beacon/{minion}/{beacons[idx % len(beacons)]}/")
+            event_tags.append(f"salt/beacon/{minion}/inotify//etc/{idx % 10}")
+            event_tags.append(f"salt/beacon/{minion}/status/")
+    for count in patterns:
+        tag_patterns = {"salt/job/*/ret/*"}
+        tag_patterns.update(f"salt/beacon/*/{beacon}/*" for beacon in beacons[: count - 1])
+        regex = compile_tag_patterns(tag_patterns)
+
+        def _fnmatch(tag: str, tag_patterns: set[str] = tag_patterns) -> bool:
+            return any(fnmatch.fnmatch(tag, pattern) for pattern in tag_patterns)
+
+        def _regex(tag: str, regex: re.Pattern[str] = regex) -> bool:
+            return regex.match(tag) is not None
+
+        implementations = {
+            "fnmatch": _fnmatch,
+            "regex": _regex,
+            "regex+lru": functools.lru_cache(maxsize=TAG_CACHE_SIZE)(_regex),
+        }
+        results = []
+        for name, matches in implementations.items():
+            start = time.perf_counter()
+            matched = sum(1 for tag in event_tags if matches(tag))
+            duration = time.perf_counter() - start
+            results.append(f"{name}: {len(event_tags) / duration:>10,.0f} tags/sec")
+        ctx.info(f"{count:>3} patterns, {matched} of {len(event_tags)} tags match")
+        for result in results:
+            ctx.info(f"    {result}")
+
+
+@cgroup.command(
+    name="salt-events",
+    arguments={
+        "sizes": {
+            "help": "The approximate sizes, in megabytes, of the job returns to benchmark.",
+            "nargs": "+",
+            "type": int,
+        },
+        "events": {
+            "help": "The number of events to construct for each size.",
+        },
+    },
+)
+def salt_events(ctx: Context, sizes: list[int] = [1, 4, 16], events: int = 20):  # noqa: B006
+    """
+    Measure the construction rate of salt events from large job returns.
+
+    The ``copy`` implementation is how the events were constructed before sharing
+    the event payload.
+    """
+    # Imported here to not slow down other commands
+    from saf.models import SaltEvent
+    from saf.utils.eventbus import _construct_event
+
+    def _copy(event_tag: str, event_data: dict[str, Any]) -> SaltEvent:
+        raw = copy.deepcopy(event_data)
+        data = {key: value for key, value in raw.items() if not key.startswith("_")}
+        return SaltEvent(tag=event_tag, stamp=raw["_stamp"], data=data, raw_data=raw)
+
+    implementations = {
+        "copy": _copy,
+        "shared": _construct_event,
+    }
+    for size in sizes:
+        # A state.apply return, each state result is roughly 1KB
+        states = {
+            f"file_|-state-{idx}_|-/etc/state-{idx}_|-managed": {
+                "name": f"/etc/state-{idx}",
+                "result": True,
+                "changes": {"diff": "x" * 900},
+                "comment": "File updated",
+                "__run_num__": idx,
+                "duration": 1.5,
+                "start_time": "00:00:00.000000",
+            }
+            for idx in range(size * 1024)
+        }
+        tag = "salt/job/20230101000000000000/ret/minion-1"
+        event_data = {
+            "jid": "20230101000000000000",
+            "id": "minion-1",
+            "fun": "state.apply",
+            "return": states,
+            "retcode": 0,
+            "success": True,
+            "_stamp": "2023-01-01T00:00:00.000000",
+        }
+        ctx.info(f"{size:>3}MB job return:")
+        for name, construct in implementations.items():
+            duration = min(
+                timeit.repeat(
+                    functools.partial(construct, tag, event_data),
+                    number=events,
+                    repeat=3,
+                )
+            )
+            tracemalloc.start()
+            construct(tag, event_data)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            ctx.info(
+                f"    {name:>6}: {events / duration:>12,.1f} events/sec, "
+                f"{peak / 1024 / 1024:>8.2f}MB peak allocated"
+            )
+
+
+@cgroup.command(
+    name="eventbus",
+    arguments={
+        "events": {
+            "help": "The number of events to publish.",
+        },
+    },
+)
+def eventbus(ctx: Context, events: int = 100000):
+    """
+    Measure the events per second received from Salt's event publisher by each event bus client.
+
+    A fake event publisher, running on a separate thread, publishes beacon events as fast as
+    it can.
+    """
+    # Imported here to not slow down other commands
+    import salt.transport.frame
+    import salt.utils.event
+
+    from saf.models import EventBusClient
+    from saf.utils.eventbus import get_publisher_path
+    from saf.utils.eventbus import iter_events
+
+    payload = b"".join(
+        salt.transport.frame.frame_msg(
+            salt.utils.event.SaltEvent.pack(
+                f"salt/beacon/minion-{idx % 100}/memusage/",
+                {
+                    "data": {"memusage": 42.0, "id": f"minion-{idx % 100}"},
+                    "_stamp": "2023-01-01T00:00:00.000000",
+                },
+            )
+        )
+        for idx in range(events)
+    )
+
+    async def _publish(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter  # noqa: ARG001
+    ) -> None:
+        writer.write(payload)
+        await writer.drain()
+
+    async def _consume(opts: dict[str, Any], client: EventBusClient) -> float:
+        received = 0
+        start = time.perf_counter()
+        async for _ in iter_events(opts=opts, tags={"salt/beacon/*"}, client=client):
+            received += 1
+            if received == events:
+                break
+        return time.perf_counter() - start
+
+    for client in EventBusClient:
+        with tempfile.TemporaryDirectory() as sock_dir:
+            opts = {"__role": "master", "sock_dir": sock_dir, "transport": "zeromq"}
+            publisher_loop = asyncio.new_event_loop()
+            server = publisher_loop.run_until_complete(
+                asyncio.start_unix_server(_publish, path=str(get_publisher_path(opts)))
+            )
+            publisher = threading.Thread(target=publisher_loop.run_forever, daemon=True)
+            publisher.start()
+            try:
+                duration = asyncio.run(_consume(opts, client))
+            finally:
+                publisher_loop.call_soon_threadsafe(publisher_loop.stop)
+                publisher.join()
+                server.close()
+                publisher_loop.run_until_complete(server.wait_closed())
+                publisher_loop.close()
+        ctx.info(
+            f"{client.value:>8} client: {events / duration:>10,.0f} events/sec "
+            f"({events} events in {duration:.3f} seconds)"
+        )
+
+
+@cgroup.command(
+    name="file-tail",
+    arguments={
+        "files": {
+            "help": "The number of files to tail.",
+        },
+        "lines": {
+            "help": "The number of lines to write, each to a different file, to measure latency.",
+        },
+        "idle": {
+            "help": "How long, in seconds, to measure the idle CPU usage.",
+        },
+    },
+)
+def file_tail(ctx: Context, files: int = 200, lines: int = 50, idle: float = 3):
+    """
+    Measure the latency, and the idle CPU usage, of the file collector in each watch mode.
+    """
+    # Imported here to not slow down other commands
+    from saf.collect import file
+    from saf.models import PipelineRunContext
+
+    async def _run(paths: list[pathlib.Path], watch: file.FileWatchMode) -> tuple[float, float]:
+        config = file.FileCollectConfig(plugin="file", paths=paths, watch=watch)
+        config._name = "bench"  # noqa: SLF001
+        events = file.collect(ctx=PipelineRunContext(config=config))
+        next_event = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(1)
+        cpu_start = time.process_time()
+        await asyncio.sleep(idle)
+        cpu_usage = (time.process_time() - cpu_start) / idle
+        latencies = []
+        for idx in range(lines):
+            start = time.perf_counter()
+            with paths[idx * len(paths) // lines].open("a") as wfh:
+                wfh.write("line\n")
+            await next_event
+            latencies.append(time.perf_counter() - start)
+            next_event = asyncio.ensure_future(events.__anext__())
+        next_event.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await next_event
+        await events.aclose()
+        return sum(latencies) / len(latencies), cpu_usage
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        paths = []
+        for idx in range(files):
+            path = pathlib.Path(tempdir) / f"{idx}.log"
+            path.touch()
+            paths.append(path)
+        for watch in file.FileWatchMode:
+            latency, cpu_usage = asyncio.run(_run(paths, watch))
+            ctx.info(
+                f"{watch.value:>8}: {latency * 1000:>8.2f}ms mean latency, "
+                f"{cpu_usage:>6.1%} idle CPU usage tailing {files} files"
+            )
+
+
+@cgroup.command(
+    name="file-backfill",
+    arguments={
+        "size": {
+            "help": "The size, in megabytes, of the file to backfill.",
+        },
+    },
+)
+def file_backfill(ctx: Context, size: int = 100):
+    """
+    Measure the lines per second read by the file collector when backfilling a file.
+
+    The ``readline`` implementation is how files were read before reading them in chunks,
+    and the ``mmap`` implementations backfill the file mapped in memory.
+    """
+    # Imported here to not slow down other commands
+    import aiofiles
+
+    from saf.collect import file
+    from saf.models import PipelineRunContext
+
+    line = "2023-01-01 00:00:00,000 [salt.minion][INFO] Returning information for job: 1\n"
+    line_count = size * 1024 * 1024 // len(line)
+
+    async def _readline(path: pathlib.Path) -> int:
+        lines = 0
+        async with aiofiles.open(path) as rfh:
+            async for read_line in rfh:
+                file.CollectedLineEvent(
+                    data=file.CollectedLineData(line=read_line, source=path), backfill=True
+                )
+                lines += 1
+                if lines == line_count:
+                    break
+        return lines
+
+    async def _chunked(
+        path: pathlib.Path, lines_per_event: int | None, *, mmap_backfill: bool = False
+    ) -> int:
+        config = file.FileCollectConfig(
+            plugin="file",
+            paths=[path],
+            backfill=True,
+            watch=file.FileWatchMode.POLL,
+            lines_per_event=lines_per_event,
+            mmap_backfill=mmap_backfill,
+        )
+        config._name = "bench"  # noqa: SLF001
+        lines = 0
+        events = file.collect(ctx=PipelineRunContext(config=config))
+        async for event in events:
+            lines += len(event.data["lines"]) if "lines" in event.data else 1
+            if lines == line_count:
+                break
+        await events.aclose()
+        return lines
+
+    implementations: dict[str, Callable[[pathlib.Path], Any]] = {
+        "readline": _readline,
+        "chunked": functools.partial(_chunked, lines_per_event=1),
+        "chunked, 100 lines per event": functools.partial(_chunked, lines_per_event=100),
+        "chunked, one event per chunk": functools.partial(_chunked, lines_per_event=None),
+        "mmap": functools.partial(_chunked, lines_per_event=1, mmap_backfill=True),
+        "mmap, 100 lines per event": functools.partial(
+            _chunked, lines_per_event=100, mmap_backfill=True
+        ),
+        "mmap, one event per chunk": functools.partial(
+            _chunked, lines_per_event=None, mmap_backfill=True
+        ),
+    }
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "backfill.log"
+        path.write_text(line * line_count)
+        ctx.info(f"Backfilling {size}MB, {line_count:,} lines")
+        for name, backfill in implementations.items():
+            start = time.perf_counter()
+            lines = asyncio.run(backfill(path))
+            duration = time.perf_counter() - start
+            ctx.info(
+                f"{name:>30}: {lines / duration:>12,.0f} lines/sec, "
+                f"{size / duration:>8.1f}MB/sec"
+            )
+
+
+@cgroup.command(
+    name="file-restart",
+    arguments={
+        "size": {
+            "help": "The size, in megabytes, of the file read before restarting.",
+        },
+        "lines": {
+            "help": "The number of lines written while not running.",
+        },
+    },
+)
+def file_restart(ctx: Context, size: int = 100, lines: int = 1000):
+    """
+    Measure how long the file collector takes to collect the lines written while not running.
+
+    Without checkpoints, the only way not to lose those lines is to backfill the whole file.
+    """
+    # Imported here to not slow down other commands
+    from saf.collect import file
+    from saf.models import PipelineRunContext
+
+    line = "2023-01-01 00:00:00,000 [salt.minion][INFO] Returning information for job: 1\n"
+    line_count = size * 1024 * 1024 // len(line)
+
+    async def _collect(config: file.FileCollectConfig, count: int) -> float:
+        start = time.perf_counter()
+        collected = 0
+        events = file.collect(ctx=PipelineRunContext(config=config))
+        async for event in events:
+            collected += len(event.data["lines"])
+            if collected >= count:
+                break
+        await events.aclose()
+        return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "restart.log"
+        path.write_text(line * line_count)
+        checkpoints = pathlib.Path(tempdir) / "checkpoints.json"
+        backfill_config = file.FileCollectConfig(
+            plugin="file", paths=[path], backfill=True, lines_per_event=None
+        )
+        checkpoints_config = file.FileCollectConfig(
+            plugin="file",
+            paths=[path],
+            backfill=True,
+            lines_per_event=None,
+            checkpoints=checkpoints,
+        )
+        backfill_config._name = checkpoints_config._name = "bench"  # noqa: SLF001
+        # The first run, before restarting, reads the whole file
+        asyncio.run(_collect(checkpoints_config, line_count))
+        with path.open("a") as wfh:
+            wfh.write(line * lines)
+        durations = {
+            # Everything is read again to get to the new lines
+            "backfill": asyncio.run(_collect(backfill_config, line_count + lines)),
+            "checkpoints": asyncio.run(_collect(checkpoints_config, lines)),
+        }
+        for name, duration in durations.items():
+            ctx.info(f"{name:>12}: {duration:.3f} seconds to collect the {lines} new lines")
+
+
+@cgroup.command(
+    name="file-multiline",
+    arguments={
+        "records": {
+            "help": "The number of log records, a fifth of them with a 20 lines traceback.",
+        },
+    },
+)
+def file_multiline(ctx: Context, records: int = 100000):
+    """
+    Measure the events generated by the file collector, with and without multiline assembly.
+    """
+    # Imported here to not slow down other commands
+    from saf.collect import file
+    from saf.models import PipelineRunContext
+
+    record = "2023-01-01 00:00:00,000 [salt.minion][INFO] Returning information for job: 1\n"
+    traceback = "2023-01-01 00:00:00,000 [salt.minion][ERROR] Failed\n" + (
+        '  File "/usr/lib/python3/dist-packages/salt/minion.py", line 1, in _thread_return\n' * 20
+    )
+
+    async def _collect(config: file.FileCollectConfig) -> tuple[int, float]:
+        count = 0
+        start = time.perf_counter()
+        events = file.collect(ctx=PipelineRunContext(config=config))
+        async for event in events:
+            count += 1
+            if event.data["line"].startswith("END"):
+                break
+        await events.aclose()
+        return count, time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "multiline.log"
+        with path.open("w") as wfh:
+            for idx in range(records):
+                wfh.write(traceback if idx % 5 == 0 else record)
+            wfh.write("END\n")
+        configs = {
+            "line": file.FileCollectConfig(plugin="file", paths=[path], backfill=True),
+            "multiline": file.FileCollectConfig(
+                plugin="file",
+                paths=[path],
+                backfill=True,
+                multiline_start=r"^(\d{4}-\d{2}-\d{2} |END)",
+                multiline_timeout=0.1,
+            ),
+        }
+        for name, config in configs.items():
+            config._name = "bench"  # noqa: SLF001
+            count, duration = asyncio.run(_collect(config))
+            ctx.info(
+                f"{name:>10}: {count:>10,} events in {duration:.3f} seconds, "
+                f"{records / duration:>10,.0f} records/sec"
+            )
+
+
+@cgroup.command(
+    name="salt-exec",
+    arguments={
+        "runs": {
+            "help": "The number of times to run the function.",
+        },
+        "duration": {
+            "help": "How long, in seconds, the function takes to run.",
+        },
+    },
+)
+def salt_exec(ctx: Context, runs: int = 10, duration: float = 0.2):
+    """
+    Measure how much the salt_exec collector blocks the event loop, and drifts, per run.
+    """
+    # Imported here to not slow down other commands
+    from unittest import mock
+
+    from saf.collect import salt_exec
+    from saf.models import AnalyticsConfig
+    from saf.models import PipelineRunContext
+
+    interval = duration * 2
+
+    async def _run() -> tuple[float, float]:
+        config = salt_exec.SaltExecConfig(plugin="salt_exec", fn="test.sleep", interval=interval)
+        config._name = "bench"  # noqa: SLF001
+        config._parent = AnalyticsConfig.model_construct(  # noqa: SLF001
+            collectors={}, processors={}, forwarders={}, pipelines={}, salt_config={}
+        )
+        loop = asyncio.get_running_loop()
+        max_lag = 0.0
+
+        async def _ticker() -> None:
+            nonlocal max_lag
+            while True:
+                start = loop.time()
+                await asyncio.sleep(0.01)
+                max_lag = max(max_lag, loop.time() - start - 0.01)
+
+        ticker = asyncio.ensure_future(_ticker())
+        events = salt_exec.collect(ctx=PipelineRunContext(config=config))
+        await events.__anext__()
+        start = loop.time()
+        for _ in range(runs):
+            await events.__anext__()
+        drift = (loop.time() - start - runs * interval) / runs
+        await events.aclose()
+        ticker.cancel()
+        return max_lag, drift
+
+    minion_mods = {"test.sleep": lambda: time.sleep(duration)}
+    with mock.patch.object(salt_exec, "get_minion_mods", return_value=minion_mods):
+        max_lag, drift = asyncio.run(_run())
+    ctx.info(
+        f"{duration}s function every {interval}s: {max_lag * 1000:.1f}ms max event loop lag, "
+        f"{drift * 1000:.1f}ms drift per run"
+    )
+
+
+@cgroup.command(
+    name="salt-loader",
+    arguments={
+        "collectors": {
+            "help": "The number of salt_exec collectors loading the salt execution modules.",
+        },
+    },
+)
+def salt_loader(ctx: Context, collectors: int = 5):
+    """
+    Measure the time, and memory, to load the execution modules for collectors and a client.
+
+    Each ``salt_exec`` collector, and a ``MinionClient``, load the execution modules and call a
+    few functions. The ``per user`` implementation is how each one loaded its own modules.
+    """
+    # Imported here to not slow down other commands
+    import salt.config
+    import salt.loader
+    import salt.minion
+
+    from saf.utils import salt as salt_utils
+
+    # Functions which don't need the grains, which the collectors don't load
+    functions = ("test.ping", "test.version", "status.uptime", "saltutil.running")
+
+    def _per_user(opts: dict[str, Any]) -> list[Any]:
+        loaded = [salt.loader.minion_mods(opts) for _ in range(collectors)]
+        loaded.append(salt.minion.SMinion(dict(opts, file_client="local")).functions)
+        for loader in loaded:
+            for function in functions:
+                loader[function]()
+        return loaded
+
+    def _shared(opts: dict[str, Any]) -> list[Any]:
+        loaded = [salt_utils.get_minion_mods(opts) for _ in range(collectors)]
+        loaded.append(salt_utils.get_sminion(dict(opts, file_client="local")).functions)
+        for loader in loaded:
+            for function in functions:
+                loader[function]()
+        return loaded
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        root_dir = pathlib.Path(tempdir)
+        opts = salt.config.DEFAULT_MINION_OPTS.copy()
+        opts["__role"] = "minion"
+        opts["root_dir"] = str(root_dir)
+        for name in ("cachedir", "pki_dir", "sock_dir", "conf_dir"):
+            dirpath = root_dir / name
+            dirpath.mkdir(parents=True)
+            opts[name] = str(dirpath)
+        opts["log_file"] = "logs/minion.log"
+        implementations: dict[str, Callable[[dict[str, Any]], list[Any]]] = {
+            "per user": _per_user,
+            "shared": _shared,
+        }
+        # Import everything the loaders import before measuring
+        _per_user(opts)
+        salt_utils._MINION_MODS.clear()  # noqa: SLF001
+        salt_utils._SMINIONS.clear()  # noqa: SLF001
+        for name, load in implementations.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            loaded = load(opts)
+            duration = time.perf_counter() - start
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            ctx.info(
+                f"{name:>9}: {duration:.3f} seconds, {current / 1024 / 1024:>6.1f}MB retained, "
+                f"{collectors} collectors and a client"
+            )
+            del loaded